@@ -1,11 +1,16 @@
 import streamlit as st
-import time
+import os
+import subprocess
+import sys
+import tempfile
 import json
 from datetime import datetime
 from book_summarizer import file_processor
-from book_summarizer.providers import GemmaBookSumProvider, GeminiProvider
-from book_summarizer.summarizer import generate_summary_incremental
 from book_summarizer.database import SummaryDatabase
+from book_summarizer.job_queue import DEFAULT_MAX_RUNNING, JobQueue
+from book_summarizer.generation_cache import GenerationCache
+from book_summarizer.document_cache import DocumentCache, document_key
+from book_summarizer.providers import PRECISIONS
 
 st.set_page_config(
     page_title="Resumen de Textos",
@@ -13,18 +18,112 @@ st.set_page_config(
     layout="wide",
 )
 
-@st.cache_resource
-def get_provider(provider_type="Gemma (Local)", api_key=None):
-    if provider_type == "Gemini 3 Pro (Cloud)":
-        if not api_key:
-            return None
-        return GeminiProvider(api_key=api_key)
-    return GemmaBookSumProvider()
+PROVIDER_NAMES = {"Gemma (Local)": "gemma", "Gemma (Servidor local)": "server", "Gemini 3 Pro (Cloud)": "gemini"}
+JOB_PRIORITIES = {"Alta": 10, "Normal": 0, "Baja": -10}
+PRECISION_LABELS = {"fp32": "fp32 (completa)", "bf16": "bf16 (media memoria)", "int8": "int8 (cuantizado, CPU)"}
 
 @st.cache_resource
 def get_database():
     return SummaryDatabase()
 
+@st.cache_resource
+def get_generation_cache():
+    return GenerationCache(get_database().db_path)
+
+@st.cache_resource
+def get_job_queue():
+    max_running = int(os.environ.get("BOOK_SUMMARIZER_MAX_RUNNING", DEFAULT_MAX_RUNNING))
+    return JobQueue(get_database().db_path, max_running=max_running)
+
+def server_api_key():
+    """API key de Gemini del propio servidor (secrets o entorno), nunca la de un usuario."""
+    try:
+        api_key = st.secrets.get("GOOGLE_API_KEY")
+    except FileNotFoundError:
+        # Sin secrets.toml
+        api_key = None
+    return api_key or os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
+
+@st.cache_resource
+def start_local_worker():
+    """
+    Lanza un worker en segundo plano sobre la base de datos de la app.
+
+    El worker es uno solo para todas las sesiones: sólo recibe la API key de
+    Gemini del servidor, así que atiende Gemini únicamente si ésta existe.
+    """
+    env = dict(os.environ)
+    api_key = server_api_key()
+    if api_key:
+        env["GOOGLE_API_KEY"] = api_key
+    return subprocess.Popen([sys.executable, "-m", "book_summarizer.worker", "--db", get_database().db_path], env=env)
+
+def ensure_worker(provider_name):
+    """
+    Comprueba que algún worker atiende `provider_name` y, si no, lanza uno
+    local. Con BOOK_SUMMARIZER_LOCAL_WORKER=0 (workers dedicados), o si es
+    Gemini y el servidor no tiene API key, no lanza ninguno y devuelve False
+    si no hay worker activo.
+    """
+    if any(provider_name in worker["providers"] for worker in get_job_queue().active_workers()):
+        return True
+    if os.environ.get("BOOK_SUMMARIZER_LOCAL_WORKER", "1") == "0":
+        return False
+    if provider_name == "gemini" and not server_api_key():
+        return False
+    if start_local_worker().poll() is not None:
+        # El worker anterior terminó: lanzar otro
+        start_local_worker.clear()
+        start_local_worker()
+    return True
+
+@st.fragment(run_every=1.0)
+def render_job_status():
+    """Muestra el progreso del trabajo en curso; al terminar carga el resumen."""
+    queue = get_job_queue()
+    job = queue.get_job(st.session_state.job_id)
+    if job is None:
+        st.session_state.job_id = None
+        return
+    
+    if job["status"] == "queued":
+        position = queue.queue_position(job["id"])
+        st.info(f"⏳ En cola: {position} trabajo(s) por delante" if position else "⏳ En cola: será el siguiente")
+    elif job["status"] == "running":
+        st.progress(int(job["progress"] * 100))
+        st.info(f"🔄 {job['message'] or 'Procesando...'}")
+        if job["partial_text"]:
+            st.markdown(job["partial_text"])
+    elif job["status"] == "done":
+        item = get_database().get_summary_by_id(job["summary_id"])
+        st.session_state.job_id = None
+        if item:
+            st.session_state.summary = item["summary"]
+            st.session_state.chunks = json.loads(item["chunks_data"]) if item.get("chunks_data") else []
+            st.session_state.summary_tags = item["tags"]
+            st.session_state.reduce_levels = (job["result"] or {}).get("reduce_levels", [])
+            st.session_state.telemetry = (job["result"] or {}).get("telemetry")
+            st.session_state.reused = {name: (job["result"] or {}).get(name) for name in ("reused_chunks", "time_saved")}
+            st.session_state.text_stats["processing_time"] = item["processing_time"]
+        # Recargar para mostrar el resultado limpio
+        st.rerun(scope="app")
+    elif job["status"] == "failed":
+        st.session_state.job_id = None
+        st.error(f"Ocurrió un error: {job['error']}")
+        return
+    else:
+        st.session_state.job_id = None
+        st.warning("Trabajo cancelado.")
+        return
+    
+    if st.button("Cancelar", icon=":material/cancel:", key=f"cancel_job_{job['id']}"):
+        queue.cancel(job["id"])
+
+@st.cache_resource
+def get_document_cache():
+    # Compartida entre sesiones: el mismo archivo sólo se extrae una vez
+    return DocumentCache(spill_dir=os.path.join(tempfile.gettempdir(), "book_summarizer_documents"))
+
 def render_tags(tags_str):
     """Renderiza etiquetas usando badges nativos de Streamlit."""
     if not tags_str:
@@ -39,8 +138,42 @@ def render_tags(tags_str):
     return " ".join(badges)
 
 
+def format_seconds(value):
+    return f"{value:.2f}s" if value is not None else "—"
+
+def render_telemetry(item, metrics):
+    """Totales de las llamadas al modelo de un resumen y el detalle por llamada."""
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Llamadas al modelo", item.get('model_calls') or len(metrics))
+    col2.metric("Tokens prompt / generados", f"{item.get('prompt_tokens') or 0:,} / {item.get('generated_tokens') or 0:,}")
+    col3.metric("TTFT medio", format_seconds(item.get('ttft_seconds')))
+    decode = item.get('decode_tokens_per_second')
+    col4.metric("Decodificación", f"{decode:.1f} tok/s" if decode else "—")
+    acceptance = item.get('acceptance_rate')
+    st.caption(f"⏱️ Tiempo de modelo {format_seconds(item.get('generation_seconds'))} de "
+               f"{format_seconds(item.get('processing_time'))} de procesamiento"
+               f"{f' | borrador aceptado {acceptance:.0%}' if acceptance is not None else ''}")
+    st.dataframe(
+        [{
+            "Etapa": m['stage'] or "",
+            "Chunk": m['chunk_number'],
+            "Tokens prompt": m['prompt_tokens'],
+            "Tokens generados": m['generated_tokens'],
+            "Tokenización (s)": m['tokenize_seconds'],
+            "TTFT (s)": m['ttft_seconds'],
+            "tok/s": m['decode_tokens_per_second'],
+            "Aceptación": m.get('acceptance_rate'),
+            "Total (s)": m['wall_seconds'],
+            "Caché": "✓" if m['cached'] else "",
+        } for m in metrics],
+        hide_index=True,
+        use_container_width=True
+    )
+
 @st.dialog("Detalles del Resumen", width="large")
 def show_summary_details(item):
+    # Los listados sólo traen metadatos; el resumen y el texto se cargan al abrirlo
+    item = get_database().get_summary_by_id(item['id']) or item
     st.subheader(item.get('title', 'Resumen sin título'))
     st.write(f"**Fecha:** {item['timestamp']}")
     st.write(f"**Método:** {item['method']}")
@@ -83,6 +216,11 @@ def show_summary_details(item):
                     st.markdown("---")
         except:
             pass
+
+    metrics = get_database().get_summary_metrics(item['id'])
+    if metrics:
+        with st.expander("⏱️ Ver Telemetría", expanded=False):
+            render_telemetry(item, metrics)
         
     with st.expander("📝 Ver Texto Original", expanded=False):
         st.markdown(item['original_text'])
@@ -100,18 +238,29 @@ def render_sidebar():
     
     provider_type = st.sidebar.selectbox(
         "Selecciona el modelo:",
-        ("Gemma (Local)", "Gemini 3 Pro (Cloud)")
+        tuple(PROVIDER_NAMES)
     )
     
-    api_key = None
-    if provider_type == "Gemini 3 Pro (Cloud)":
-        # Intentar obtener API Key de secrets
-        api_key = st.secrets.get("GOOGLE_API_KEY")
-        
-        if not api_key:
-            api_key = st.sidebar.text_input("API Key de Google:", type="password")
-            if not api_key:
-                st.sidebar.warning("⚠️ Ingresa tu API Key para usar Gemini.")
+    precision = None
+    if provider_type == "Gemma (Local)":
+        precision = st.sidebar.selectbox(
+            "Precisión del modelo:",
+            PRECISIONS,
+            format_func=PRECISION_LABELS.get,
+            help="bf16 e int8 reducen la memoria; int8 (cuantización dinámica) suele ser el más rápido en CPU, con resúmenes algo distintos."
+        )
+        # El borrador lo elige el servidor: los workers son compartidos por todas las sesiones
+        if os.environ.get("BOOK_SUMMARIZER_DRAFT_MODEL"):
+            st.sidebar.caption("Decodificación asistida con el modelo borrador del servidor (BOOK_SUMMARIZER_DRAFT_MODEL).")
+    elif provider_type == "Gemma (Servidor local)":
+        st.sidebar.caption(
+            "Un único Gemma compartido por todas las sesiones y workers; la precisión y el borrador se eligen al arrancarlo: "
+            "`python -m book_summarizer.model_server --precision int8`"
+        )
+    elif provider_type == "Gemini 3 Pro (Cloud)":
+        # Los workers son compartidos: la API key es la del servidor, no se pide en la interfaz
+        if not server_api_key():
+            st.sidebar.warning("⚠️ Configura GOOGLE_API_KEY en los secrets o el entorno del servidor para usar Gemini.")
     
     st.sidebar.markdown("---")
     st.sidebar.subheader("🌐 Idioma / Language")
@@ -138,6 +287,12 @@ def render_sidebar():
     elif focus_option == "Personalizado":
         focus_instruction = st.sidebar.text_area("Instrucción personalizada:", placeholder="Ej: Resume como si fueras un pirata...")
     
+    use_cache = st.sidebar.checkbox(
+        "♻️ Reutilizar resúmenes en caché",
+        value=True,
+        help="Reutiliza los chunks ya resumidos con el mismo modelo y configuración. Desactívalo para obtener resultados nuevos."
+    )
+    
     # Botón para limpiar cache si hay problemas
     if st.sidebar.button("🔄 Reiniciar Modelo", help="Limpia el cache y recarga el modelo"):
         st.cache_resource.clear()
@@ -153,6 +308,10 @@ def render_sidebar():
         {f'⏱️ **{stats["processing_time"]:.1f}s** procesamiento' if "processing_time" in stats else ''}
         """, help="Estadísticas del último texto procesado")
     
+    cache_stats = get_generation_cache().stats()
+    if cache_stats['hits'] or cache_stats['misses']:
+        st.sidebar.caption(f"♻️ Caché: {cache_stats['hits']} aciertos / {cache_stats['misses']} fallos ({cache_stats['entries']} entradas)")
+    
     st.sidebar.markdown("---")
     st.sidebar.subheader("📚 Historial")
     
@@ -193,11 +352,60 @@ def render_sidebar():
         st.sidebar.metric("Palabras procesadas", f"{stats['total_words']:,}")
         st.sidebar.metric("Tiempo promedio", f"{stats['avg_processing_time']:.1f}s")
     
-    return method, focus_instruction, provider_type, api_key, language
-def get_text_input() -> str:
+    return method, focus_instruction, provider_type, language, use_cache, precision
+def render_performance():
+    """Vista global de la telemetría: dónde se va el tiempo de modelo en todo el historial."""
+    st.header("📊 Rendimiento")
+    stats = get_database().get_telemetry_statistics()
+    if not stats['model_calls']:
+        st.info("Todavía no hay resúmenes con telemetría.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Resúmenes medidos", stats['measured_summaries'])
+    col2.metric("Tiempo de modelo", format_seconds(stats['generation_seconds']))
+    col3.metric("TTFT medio", format_seconds(stats['ttft_seconds']))
+    decode = stats['decode_tokens_per_second']
+    col4.metric("Decodificación", f"{decode:.1f} tok/s" if decode else "—")
+    acceptance = stats['acceptance_rate']
+    st.caption(f"{stats['model_calls']} llamadas ({stats['cached_calls'] or 0} desde caché) | "
+               f"{stats['prompt_tokens'] or 0:,} tokens de prompt | {stats['generated_tokens'] or 0:,} tokens generados"
+               f"{f' | borrador aceptado {acceptance:.0%}' if acceptance is not None else ''}")
+
+    st.subheader("Por etapa")
+    st.dataframe(
+        [{
+            "Etapa": row['stage'],
+            "Llamadas": row['calls'],
+            "Tiempo (s)": row['seconds'],
+            "Tokens prompt": row['prompt_tokens'],
+            "Tokens generados": row['generated_tokens'],
+            "TTFT medio (s)": row['ttft_seconds'],
+            "Aceptación borrador": row['acceptance_rate'],
+        } for row in stats['stages']],
+        hide_index=True,
+        use_container_width=True
+    )
+
+    st.subheader("Resúmenes más lentos")
+    for item in stats['slowest']:
+        col_a, col_b = st.columns([3, 1])
+        with col_a:
+            decode = item['decode_tokens_per_second']
+            st.markdown(f"**{item.get('title') or 'Sin título'}**")
+            st.caption(f"⏱️ {format_seconds(item['generation_seconds'])} de modelo | {item['model_calls']} llamadas | "
+                       f"{item['generated_tokens'] or 0:,} tokens | {f'{decode:.1f} tok/s' if decode else '—'} | {item['method']}")
+        with col_b:
+            if st.button("Ver Detalles", key=f"perf_btn_{item['id']}", use_container_width=True):
+                show_summary_details(item)
+
+def get_text_input() -> tuple:
+    """
+    Devuelve el texto del archivo subido, sus estadísticas (extraídos una sola
+    vez por archivo) y su origen: {'source_name', 'document_hash'}.
+    """
     st.header("1. Sube el Archivo")
     
-    text = ""
     uploaded_file = st.file_uploader(
         "Sube un archivo (.txt, .pdf, .docx, .epub)",
         type=["txt", "pdf", "docx", "epub"],
@@ -205,17 +413,30 @@ def get_text_input() -> str:
     )
     
     if uploaded_file:
-        with st.spinner(f"Procesando archivo '{uploaded_file.name}'..."):
-            file_extension = uploaded_file.name.split('.')[-1].lower()
-            text_extractors = {
-                "txt": file_processor.get_text_from_txt,
-                "pdf": file_processor.get_text_from_pdf,
-                "docx": file_processor.get_text_from_docx,
-                "epub": file_processor.get_text_from_epub,
-            }
-            if file_extension in text_extractors:
-                text = text_extractors[file_extension](uploaded_file)
-    return text
+        file_extension = uploaded_file.name.split('.')[-1].lower()
+        text_extractors = {
+            "txt": file_processor.get_text_from_txt,
+            "pdf": file_processor.get_text_from_pdf,
+            "docx": file_processor.get_text_from_docx,
+            "epub": file_processor.get_text_from_epub,
+        }
+        if file_extension in text_extractors:
+            # Texto completo: se muestra, se cachea y se encola tal cual (el streaming es sólo de la librería)
+            def extract():
+                with st.spinner(f"Procesando archivo '{uploaded_file.name}'..."):
+                    uploaded_file.seek(0)
+                    return text_extractors[file_extension](uploaded_file)
+            
+            # El hash del contenido se calcula una vez por archivo subido, no en cada rerun
+            keys = st.session_state.setdefault("document_keys", {})
+            if uploaded_file.file_id not in keys:
+                keys[uploaded_file.file_id] = document_key(uploaded_file.getvalue(), file_extension)
+            key = keys[uploaded_file.file_id]
+            
+            cache = get_document_cache()
+            document = cache.get(key) or cache.put(key, extract())
+            return document['text'], document['stats'], {"source_name": uploaded_file.name, "document_hash": key}
+    return "", {}, {}
 
 def main():
     st.title("📚 Resumen de Textos con IA")
@@ -228,175 +449,54 @@ def main():
     if "text_stats" not in st.session_state:
         st.session_state.text_stats = {}
 
-    method, focus_instruction, provider_type, api_key, language = render_sidebar()
+    method, focus_instruction, provider_type, language, use_cache, precision = render_sidebar()
     
-    tab1, tab2 = st.tabs(["✨ Generar Resumen", "📚 Biblioteca"])
+    tab1, tab2, tab3 = st.tabs(["✨ Generar Resumen", "📚 Biblioteca", "📊 Rendimiento"])
     
     with tab1:
-        user_text = get_text_input()
+        user_text, text_stats, source = get_text_input()
     
-        # Calcular estadísticas del texto
+        # Estadísticas calculadas al extraer el archivo (cacheadas con el texto)
         if user_text:
-            st.session_state.text_stats = {
-                "words": len(user_text.split()),
-                "chars": len(user_text),
-                "lines": len(user_text.split('\n'))
-            }
+            # Copia: los tiempos que se añaden después no deben ir a la caché de documentos
+            st.session_state.text_stats = dict(text_stats)
     
         st.header("2. Genera el Resumen")
+        priority_option = st.radio("Prioridad:", ("Normal", "Alta", "Baja"), horizontal=True)
         if st.button("Generar Resumen", type="primary"):
             if not user_text.strip():
                 st.warning("Por favor, ingresa texto o sube un archivo.")
                 return
             
-            try:
-                start_time = time.time()
-                
-                # Crear placeholder para la barra de progreso
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                provider = get_provider(provider_type, api_key)
-                
-                if not provider:
-                    st.error("❌ Error: No se pudo inicializar el proveedor. Verifica la API Key.")
-                    progress_bar.empty()
-                    status_text.empty()
+            provider_name = PROVIDER_NAMES[provider_type]
+            # El resumen lo hace un worker: cerrar la pestaña o recargar no pierde el trabajo
+            if not ensure_worker(provider_name):
+                if provider_name == "gemini":
+                    st.error("❌ Error: Ningún worker atiende Gemini. Configura GOOGLE_API_KEY en el servidor.")
                     return
-                
-                if method == "Iterativo":
-                    if hasattr(provider, 'summarize_iterative'):
-                        # Calcular chunks para estimar progreso
-                        # Usar chunks mucho más grandes para Gemini (50k caracteres) vs Gemma (4k)
-                        chunk_size = 50000 if provider_type == "Gemini 3 Pro (Cloud)" else 4000
-                        estimated_chunks = max(1, len(user_text) // chunk_size + (1 if len(user_text) % chunk_size else 0))
-                        
-                        status_text.info(f"📊 Procesando texto en ~{estimated_chunks} chunks. Tiempo estimado: ~{estimated_chunks * 15}s")
-                        progress_bar.progress(5)
-                        
-                        # Función callback para actualizar progreso
-                        def update_progress(current, total):
-                            progress_percent = int((current / total) * 85) + 10  # 10-95%
-                            progress_bar.progress(progress_percent)
-                            status_text.info(f"🔄 Procesando chunk {current}/{total}... ({progress_percent}%)")
-                        
-                        # Intentar usar progress_callback si está disponible
-                        try:
-                            # Contenedor para el streaming
-                            stream_container = st.empty()
-                            
-                            with stream_container:
-                                result = provider.summarize_iterative(
-                                    user_text, 
-                                    chunk_size=chunk_size, 
-                                    progress_callback=update_progress, 
-                                    focus_instruction=focus_instruction, 
-                                    language=language,
-                                    stream=True
-                                )
-                                
-                                # Detectar si es un generador (streaming)
-                                if hasattr(result, '__iter__') and not isinstance(result, (str, dict, list)):
-                                    status_text.text("✍️ Escribiendo resumen...")
-                                    summary = st.write_stream(result)
-                                    chunks = []
-                                elif isinstance(result, dict):
-                                    summary = result['summary']
-                                    chunks = result.get('chunks', [])
-                                    # Si no fue streaming, mostrar el resultado en el contenedor temporalmente
-                                    st.markdown(summary)
-                                else:
-                                    summary = result
-                                    chunks = []
-                                    st.markdown(summary)
-                                    
-                        except TypeError as e:
-                            # Fallback para versiones antiguas o errores de argumentos
-                            print(f"Streaming error or legacy: {e}")
-                            result = provider.summarize_iterative(user_text, chunk_size=chunk_size, focus_instruction=focus_instruction, language=language)
-                            
-                            if isinstance(result, dict):
-                                summary = result['summary']
-                                chunks = result.get('chunks', [])
-                            else:
-                                summary = result
-                                chunks = []
-                        
-                        progress_bar.progress(95)
-                        status_text.info("✨ Finalizando resumen...")
-                    else:
-                        st.error("El método iterativo no está disponible. Presiona 🔄 Reiniciar Modelo en el sidebar.")
-                        progress_bar.empty()
-                        status_text.empty()
-                        return
-                else:
-                    status_text.info("🔄 Procesando con método Map-Reduce...")
-                    progress_bar.progress(20)
-                    result = generate_summary_incremental(provider, user_text, focus_instruction=focus_instruction, language=language)
-                    
-                    if isinstance(result, dict):
-                        summary = result['summary']
-                        chunks = result.get('chunks', [])
-                    else:
-                        summary = result
-                        chunks = []
-                        
-                    progress_bar.progress(90)
-                
-                # Completar progreso
-                progress_bar.progress(98)
-                status_text.info("🏷️ Generando título...")
-                
-                try:
-                    title = provider.generate_title(user_text)
-                except Exception:
-                    title = f"Resumen {datetime.now().strftime('%H:%M')}"
-                
-                status_text.info("🏷️ Generando etiquetas...")
-                try:
-                    tags_list = provider.generate_tags(user_text)
-                    tags = ",".join(tags_list)
-                except Exception:
-                    tags = ""
-                
-                progress_bar.progress(100)
-                status_text.success("✅ ¡Resumen completado!")
-                time.sleep(0.5)  # Breve pausa para mostrar el 100%
-                
-                # Limpiar indicadores
-                progress_bar.empty()
-                status_text.empty()
-                
-                processing_time = time.time() - start_time
-                st.session_state.text_stats["processing_time"] = processing_time
-                st.session_state.summary = summary
-                st.session_state.chunks = chunks
-                st.session_state.summary_tags = tags
-                
-                # Guardar en base de datos SQLite
-                db = get_database()
-                summary_id = db.save_summary(
-                    original_text=user_text,
-                    summary=summary,
-                    word_count=st.session_state.text_stats.get('words', 0),
-                    char_count=st.session_state.text_stats.get('chars', 0),
-                    processing_time=processing_time,
-                    method=method,
-                    chunks_data=json.dumps(chunks) if chunks else None,
-                    title=title,
-                    tags=tags
-                )
-                
-                
-                # Limpiar resúmenes antiguos (mantener últimos 100)
-                db.cleanup_old_summaries(keep_last=100)
-                
-                # Recargar para mostrar el resultado limpio
-                st.rerun()
-                    
-            except Exception as e:
-                st.error(f"Ocurrió un error: {e}")
-                st.exception(e)
+                st.warning("⚠️ No hay ningún worker activo. Lanza `python -m book_summarizer.worker` para procesar la cola.")
+            st.session_state.job_id = get_job_queue().submit(
+                user_text,
+                {
+                    "method": method,
+                    "provider": provider_name,
+                    "focus_instruction": focus_instruction,
+                    "language": language,
+                    "use_cache": use_cache,
+                    "precision": precision,
+                    **source,
+                },
+                priority=JOB_PRIORITIES[priority_option],
+                source_name=source.get("source_name")
+            )
+            st.session_state.summary = ""
+            st.session_state.chunks = []
+            st.session_state.reduce_levels = []
+            st.session_state.reused = {}
+            st.session_state.telemetry = None
+        
+        if st.session_state.get("job_id"):
+            render_job_status()
 
     if st.session_state.summary:
         st.header("✅ Resumen Generado")
@@ -445,6 +545,8 @@ def main():
             if st.button("Limpiar", icon=":material/clear_all:", help="Limpiar el resumen actual"):
                 st.session_state.summary = ""
                 st.session_state.chunks = []
+                st.session_state.reduce_levels = []
+                st.session_state.reused = {}
                 st.rerun()
         
         # Botón para exportar historial completo
@@ -476,17 +578,44 @@ def main():
             stats_text = f"📝 <strong>{st.session_state.text_stats.get('words', 0)}</strong> palabras originales | 📄 <strong>{summary_words}</strong> palabras resumen | ⏱️ <strong>{processing_time:.1f}s</strong> procesamiento"
             st.markdown(f"<div style='text-align: center; color: #666; font-size: 0.9em; margin: 10px 0;'>{stats_text}</div>", unsafe_allow_html=True)
 
+            reduce_levels = st.session_state.get('reduce_levels')
+            if reduce_levels:
+                levels_text = " | ".join(
+                    f"{'map' if level['level'] == 0 else 'nivel ' + str(level['level'])}: "
+                    f"{level['inputs']} → {level['outputs']} en {level['seconds']:.1f}s"
+                    for level in reduce_levels
+                )
+                st.caption(f"🌳 {levels_text}")
+
+            reused = st.session_state.get('reused') or {}
+            if reused.get('reused_chunks'):
+                st.caption(f"♻️ {reused['reused_chunks']} chunks reutilizados de la versión anterior del archivo "
+                           f"(~{reused['time_saved'] or 0:.1f}s ahorrados)")
+
+            telemetry = st.session_state.get('telemetry')
+            if telemetry and telemetry['model_calls']:
+                stages_text = " | ".join(f"{name}: {seconds:.1f}s" for name, seconds in telemetry['stage_seconds'].items())
+                decode = telemetry['decode_tokens_per_second']
+                acceptance = telemetry.get('acceptance_rate')
+                st.caption(f"⏱️ {telemetry['model_calls']} llamadas al modelo, {telemetry['generated_tokens']:,} tokens generados"
+                           f"{f' a {decode:.1f} tok/s' if decode else ''}"
+                           f"{f' (borrador aceptado {acceptance:.0%})' if acceptance is not None else ''} | {stages_text}")
+
     with tab2:
         st.header("📚 Biblioteca de Resúmenes")
         
         db = get_database()
-        all_tags = db.get_all_tags()
+        tag_counts = db.get_tag_counts()
         
         col1, col2 = st.columns([2, 1])
         with col1:
             search_query = st.text_input("🔍 Buscar:", placeholder="Título, contenido o tags...")
         with col2:
-            selected_tags = st.multiselect("🏷️ Filtrar por etiquetas:", all_tags)
+            selected_tags = st.multiselect(
+                "🏷️ Filtrar por etiquetas:",
+                list(tag_counts),
+                format_func=lambda tag: f"{tag} ({tag_counts[tag]})"
+            )
             
         results = db.filter_summaries(query=search_query, tags=selected_tags, limit=20)
         
@@ -500,11 +629,16 @@ def main():
                         st.caption(f"📅 {item['timestamp']} | ⏱️ {item['processing_time']:.1f}s | 📝 {item['word_count']} palabras")
                         if item.get('tags'):
                             st.markdown(render_tags(item['tags']))
+                        if item.get('snippet'):
+                            st.markdown(f"> {item['snippet']}")
                     with col_b:
                         if st.button("Ver Detalles", key=f"lib_btn_{item['id']}", use_container_width=True):
                             show_summary_details(item)
         else:
             st.info("No se encontraron resúmenes que coincidan con tu búsqueda.")
 
+    with tab3:
+        render_performance()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
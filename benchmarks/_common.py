@@ -0,0 +1,45 @@
+import resource
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def timed(results: dict, name: str):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    """Mejor tiempo de `repeat` ejecuciones de `fn`."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def max_rss_mb() -> float:
+    """Pico de memoria residente del proceso actual, en MB."""
+    # VmHWM es el pico del proceso actual; ru_maxrss heredaría el del padre tras el exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rss_mb() -> float:
+    """Memoria residente actual del proceso, en MB (0 si no hay /proc)."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
@@ -0,0 +1,115 @@
+"""
+Decodificación asistida (especulativa) frente a muestreo normal en los chunks
+de `summarize_iterative`: tiempo por chunk, tasa de aceptación del borrador y
+aceleración, con los mismos parámetros de muestreo que el método iterativo.
+
+Con `--model` y `--draft` se miden checkpoints reales. Sin ellos no hay un
+borrador sintético realista (con pesos aleatorios la aceptación no depende de
+lo parecidos que sean los modelos), así que se miden los dos extremos:
+- mejor caso: Gemma aleatorio con embeddings atados, que repite el último
+  token, y de borrador su primera capa: el borrador siempre acierta;
+- peor caso: Gemma aleatorio sin atar y un borrador aleatorio independiente:
+  casi nunca acierta y sólo queda el coste de proponer y verificar.
+La aceleración de un borrador real cae entre ambos según su aceptación.
+
+Uso:
+    python -m benchmarks.bench_assisted_decoding [--model ruta --draft ruta] [--chunks 3] [--new-tokens 128]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import torch
+
+from book_summarizer.gemma_provider import GemmaBookSumProvider
+from book_summarizer.telemetry import TelemetryRecorder
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_causal_lm, synthetic_draft_lm
+from book_summarizer.text_splitter import TokenTextSplitter
+
+
+def chunk_prompts(provider: GemmaBookSumProvider, chunks: list, language: str) -> list:
+    """Prompt de cada chunk como en `summarize_iterative`, con un contexto fijo."""
+    context = synthetic_book(1000, seed=99)[:1000]
+    prompts = []
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            prompts.append(provider._get_initial_prompt(chunk, language))
+        else:
+            prompts.append(provider._get_incremental_prompt(chunk, context, language))
+    return prompts
+
+
+def run_chunks(provider: GemmaBookSumProvider, prompts: list, new_tokens: int) -> list:
+    provider.telemetry = TelemetryRecorder()
+    times = []
+    for i, prompt in enumerate(prompts):
+        torch.manual_seed(i)
+        start = time.perf_counter()
+        provider._generate(prompt, max_new_tokens=new_tokens, min_new_tokens=new_tokens,
+                           temperature=0.4, repetition_penalty=1.2)
+        times.append(time.perf_counter() - start)
+    calls, provider.telemetry = provider.telemetry.calls, None
+    return [dict(call, seconds=seconds) for call, seconds in zip(calls, times)]
+
+
+def compare(name: str, model: str, draft: str, args):
+    GemmaBookSumProvider._tokenizer = None  # cada escenario trae su tokenizer
+    plain = GemmaBookSumProvider(model)
+    assisted = GemmaBookSumProvider(model, draft_model=draft)
+    book = synthetic_book(args.chunks * args.chunk_tokens * 8)
+    chunks = TokenTextSplitter(args.chunk_tokens, tokenizer=plain.tokenizer).split_text(book)[:args.chunks]
+    prompts = chunk_prompts(plain, chunks, args.language)
+    # Calentamiento de ambos caminos
+    run_chunks(plain, prompts[:1], 4)
+    run_chunks(assisted, prompts[:1], 4)
+    plain_calls = run_chunks(plain, prompts, args.new_tokens)
+    assisted_calls = run_chunks(assisted, prompts, args.new_tokens)
+
+    print(f"\n{name}: {os.path.basename(model.rstrip('/'))} con borrador {os.path.basename(draft.rstrip('/'))}")
+    print(f"{'chunk':>6}{'muestreo':>11}{'asistida':>11}{'aceptación':>12}{'aceleración':>13}")
+    for i, (normal, fast) in enumerate(zip(plain_calls, assisted_calls), 1):
+        print(f"{i:>6}{normal['seconds']:>10.2f}s{fast['seconds']:>10.2f}s"
+              f"{fast['acceptance_rate'] * 100:>11.1f}%{normal['seconds'] / fast['seconds']:>12.2f}x")
+    plain_total = sum(c["seconds"] for c in plain_calls)
+    assisted_total = sum(c["seconds"] for c in assisted_calls)
+    accepted = sum(c["accepted_tokens"] for c in assisted_calls) / sum(c["draft_tokens"] for c in assisted_calls)
+    print(f"{'total':>6}{plain_total:>10.2f}s{assisted_total:>10.2f}s{accepted * 100:>11.1f}%"
+          f"{plain_total / assisted_total:>12.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="Checkpoint principal (por defecto, escenarios sintéticos)")
+    parser.add_argument("--draft", default=None, help="Checkpoint de borrador con el mismo vocabulario")
+    parser.add_argument("--hidden-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--chunks", type=int, default=3)
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--new-tokens", type=int, default=128)
+    parser.add_argument("--language", default="es")
+    parser.add_argument("--threads", type=int, default=None, help="Hilos de torch (por defecto, los de la máquina)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    print(f"{args.chunks} chunks de {args.chunk_tokens} tokens, {args.new_tokens} tokens por resumen, "
+          f"{torch.get_num_threads()} hilos")
+    if args.model:
+        if not args.draft:
+            parser.error("--model necesita --draft")
+        compare("Checkpoints", args.model, args.draft, args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scenarios = [("Mejor caso", True, dict(layers=1)),
+                     ("Peor caso", False, dict(layers=1, independent=True, hidden_size=256))]
+        for n, (name, tied, draft_options) in enumerate(scenarios):
+            model, draft = os.path.join(tmp, f"modelo{n}"), os.path.join(tmp, f"borrador{n}")
+            synthetic_causal_lm(model, hidden_size=args.hidden_size, layers=args.layers, tie_word_embeddings=tied)
+            synthetic_draft_lm(model, draft, **draft_options)
+            compare(name, model, draft, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Throughput y latencias de la fase map contra un servidor Gemini simulado
+(latencia variable, 429 por cuota y 503 aleatorios).
+
+Compara el camino anterior (GeminiProvider.summarize en un ThreadPool de 5
+hilos, sin reintentos) con AsyncGeminiProvider a distintas concurrencias.
+
+Uso:
+    python -m benchmarks.bench_async_gemini [--chunks 200] [--latency 0.3]
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from book_summarizer import gemini_provider
+from book_summarizer.gemini_provider import AsyncGeminiProvider, GeminiProvider
+from book_summarizer.rate_limiting import retry_async
+from book_summarizer.testing.fake_gemini import FakeGeminiServer
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_threaded(server, texts):
+    provider = GeminiProvider("clave", model_name="gemini-bench", http_options={
+        "base_url": server.url, "retry_options": {"attempts": 1}})
+    latencies, failures = [], 0
+
+    def one(text):
+        start = time.perf_counter()
+        try:
+            provider.summarize(text, max_length=150)
+            return time.perf_counter() - start, True
+        except Exception:
+            return time.perf_counter() - start, False
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        for latency, ok in executor.map(one, texts):
+            latencies.append(latency)
+            failures += not ok
+    return latencies, failures, 0
+
+
+def run_async(server, texts, concurrency, rpm):
+    provider = AsyncGeminiProvider("clave", model_name="gemini-bench", base_url=server.url,
+                                   max_concurrency=concurrency, requests_per_minute=rpm,
+                                   base_delay=0.2, max_delay=5.0, max_retries=8)
+    latencies = []
+
+    async def timed_retry(fn, *args, **kwargs):
+        # Latencia de cada chunk desde que obtiene hueco en el semáforo, reintentos incluidos
+        start = time.perf_counter()
+        try:
+            return await retry_async(fn, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    gemini_provider.retry_async = timed_retry
+    try:
+        summaries = provider.summarize_batch(texts, max_length=150)
+    finally:
+        gemini_provider.retry_async = retry_async
+    return latencies, sum(1 for s in summaries if not s), provider.retries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.3, help="Latencia media del servidor (s)")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--server-rpm", type=int, default=1200, help="Cuota del servidor simulado")
+    args = parser.parse_args()
+
+    texts = [f"Fragmento {i}. " + "palabra " * 400 for i in range(args.chunks)]
+    # La cuota del cliente un 10% por debajo de la del servidor
+    client_rpm = args.server_rpm * 0.9
+    print(f"{args.chunks} chunks, latencia {args.latency}±{args.latency / 2:.2f} s, "
+          f"{args.error_rate:.0%} de 503, cuota {args.server_rpm} peticiones/min\n")
+    print(f"{'modo':<20}{'total (s)':>10}{'chunks/s':>10}{'p50 (s)':>9}{'p95 (s)':>9}{'p99 (s)':>9}"
+          f"{'fallidos':>10}{'reintentos':>12}")
+
+    modes = [("hilos x5 (antes)", lambda s: run_threaded(s, texts))]
+    for concurrency in (8, 16, 32):
+        modes.append((f"async x{concurrency}", lambda s, c=concurrency: run_async(s, texts, c, client_rpm)))
+
+    for name, run in modes:
+        with FakeGeminiServer(latency=args.latency, jitter=args.latency / 2, error_rate=args.error_rate,
+                              requests_per_minute=args.server_rpm) as server:
+            start = time.perf_counter()
+            latencies, failures, retries = run(server)
+            total = time.perf_counter() - start
+        print(f"{name:<20}{total:>10.1f}{args.chunks / total:>10.1f}{statistics.median(latencies):>9.2f}"
+              f"{percentile(latencies, 0.95):>9.2f}{percentile(latencies, 0.99):>9.2f}{failures:>10}{retries:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Mide chunks/segundo del map de Gemma con distintos tamaños de batch en CPU.
+
+Uso:
+    python -m benchmarks.bench_batch_generation [--model croko22/gemma-booksum-lora-v1] [--batch-sizes 1 4 8]
+"""
+import argparse
+import time
+
+import torch
+
+from book_summarizer.gemma_provider import GemmaBookSumProvider
+from book_summarizer.testing.synthetic import synthetic_book
+from book_summarizer.text_splitter import TokenTextSplitter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="croko22/gemma-booksum-lora-v1")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--chunks", type=int, default=16, help="Número de chunks a resumir por medición")
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None, help="Hilos de torch (por defecto, los de la máquina)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    provider = GemmaBookSumProvider(args.model, max_batch_size=max(args.batch_sizes))
+    splitter = TokenTextSplitter(args.chunk_tokens, tokenizer=provider.tokenizer)
+    chunks = splitter.split_text(synthetic_book(200_000))[:args.chunks]
+
+    # Calentamiento para no medir la inicialización perezosa de torch
+    provider.summarize_batch(chunks[:1], max_length=4, min_length=1, batch_size=1)
+    print(f"{len(chunks)} chunks de ~{args.chunk_tokens} tokens, {args.new_tokens} tokens nuevos, {torch.get_num_threads()} hilos")
+    print(f"(tamaño automático para esta máquina: {provider._auto_batch_size(args.chunk_tokens + 20, args.new_tokens)})\n")
+
+    baseline = None
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        # min_length == max_length para que todos los tamaños generen lo mismo
+        provider.summarize_batch(chunks, max_length=args.new_tokens, min_length=args.new_tokens, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        rate = len(chunks) / elapsed
+        baseline = baseline or rate
+        print(f"batch={batch_size:<3d} {rate:7.3f} chunks/s  {elapsed:7.1f} s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Simula varias sesiones de Streamlit guardando y navegando el historial a la vez.
+
+Compara la capa de conexiones persistentes en modo WAL con el esquema
+anterior: una conexión nueva por consulta y el journal por defecto (DELETE).
+
+Uso:
+    python -m benchmarks.bench_concurrent_sessions [--sessions 8] [--ops 50]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from book_summarizer.database import SummaryDatabase, decompress_text
+from book_summarizer.testing.synthetic import synthetic_book
+
+
+class PerCallDatabase(SummaryDatabase):
+    """Una conexión por llamada, sin WAL ni pragmas: el comportamiento anterior."""
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("decompress_text", 1, decompress_text, deterministic=True)
+        return conn
+
+
+def run(db: SummaryDatabase, sessions: int, ops: int, text: str) -> dict:
+    latencies = {"read": [], "write": []}
+    errors = []
+    lock = threading.Lock()
+
+    def session(n):
+        for i in range(ops):
+            kind = "write" if i % 5 == 0 else "read"
+            start = time.perf_counter()
+            try:
+                if kind == "write":
+                    db.save_summary(text, text[:2000], len(text.split()), len(text), 1.0,
+                                    title=f"Sesión {n} libro {i}", tags="novela")
+                else:
+                    db.get_recent_summaries(limit=5)
+                    db.filter_summaries(limit=20)
+            except sqlite3.OperationalError as exc:
+                with lock:
+                    errors.append(str(exc))
+            with lock:
+                latencies[kind].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    reads = sorted(latencies["read"])
+    writes = sorted(latencies["write"])
+    return {
+        "ops_s": (len(reads) + len(writes)) / elapsed,
+        "read_p50_ms": reads[len(reads) // 2] * 1000,
+        "read_p99_ms": reads[int(len(reads) * 0.99)] * 1000,
+        "write_p50_ms": writes[len(writes) // 2] * 1000,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=50, help="Operaciones por sesión (1 de cada 5 guarda)")
+    parser.add_argument("--size", type=int, default=200_000, help="Caracteres por libro guardado")
+    args = parser.parse_args()
+
+    text = synthetic_book(args.size)
+    print(f"{args.sessions} sesiones x {args.ops} operaciones, libros de ~{args.size:,} caracteres\n")
+    print(f"{'conexiones':<14}{'ops/s':>9}{'lect. p50':>11}{'lect. p99':>11}{'escr. p50':>11}{'locked':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cls in (("por llamada", PerCallDatabase), ("WAL por hilo", SummaryDatabase)):
+            path = os.path.join(tmp, f"{cls.__name__}.db")
+            db = cls(path)
+            if cls is PerCallDatabase:
+                # Las migraciones dejan la base en WAL; volver al journal clásico
+                db.close()
+                with sqlite3.connect(path) as conn:
+                    conn.execute("PRAGMA journal_mode = DELETE")
+            result = run(db, args.sessions, args.ops, text)
+            print(f"{name:<14}{result['ops_s']:>9.0f}{result['read_p50_ms']:>11.2f}{result['read_p99_ms']:>11.2f}"
+                  f"{result['write_p50_ms']:>11.2f}{result['errors']:>8}")
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Coste de un rerun de Streamlit con un archivo subido: extracción y
+estadísticas en cada rerun (comportamiento anterior) frente a la caché de
+documentos, en memoria y desde disco.
+
+Uso:
+    python -m benchmarks.bench_document_cache [--pdf-pages 400] [--txt-mb 20]
+"""
+import argparse
+import io
+import os
+import tempfile
+
+from book_summarizer import file_processor
+from book_summarizer.document_cache import DocumentCache, document_key
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_pdf
+from ._common import best_of
+
+
+def legacy_rerun(data: bytes, extractor):
+    text = extractor(io.BytesIO(data))
+    return {"words": len(text.split()), "chars": len(text), "lines": len(text.split('\n'))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf-pages", type=int, default=400)
+    parser.add_argument("--txt-mb", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "libro.pdf")
+        synthetic_pdf(pdf_path, pages=args.pdf_pages)
+        with open(pdf_path, "rb") as f:
+            documents = [("pdf", f.read(), file_processor.get_text_from_pdf)]
+        txt = synthetic_book(args.txt_mb * 1_000_000).encode("utf-8")
+        documents.append(("txt", txt, file_processor.get_text_from_txt))
+
+        print(f"{'archivo':<12}{'sin caché (ms)':>16}{'memoria (ms)':>14}{'disco (ms)':>12}")
+        for extension, data, extractor in documents:
+            key = document_key(data, extension)
+            memory = DocumentCache()
+            memory.put(key, extractor(io.BytesIO(data)))
+            # spill_bytes=0: todo va a disco, como los libros más grandes
+            disk = DocumentCache(spill_dir=os.path.join(tmp, "spill"), spill_bytes=0)
+            disk.put(key, extractor(io.BytesIO(data)))
+
+            legacy = best_of(lambda: legacy_rerun(data, extractor), args.repeat)
+            cached = best_of(lambda: memory.get(key), args.repeat)
+            spilled = best_of(lambda: disk.get(key), args.repeat)
+            label = f"{len(data) / 1e6:.0f} MB {extension}"
+            print(f"{label:<12}{legacy * 1000:>16.1f}{cached * 1000:>14.3f}{spilled * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compara el extractor de EPUB anterior (archivo temporal + EbookLib +
+html.parser de BeautifulSoup) con el lector en memoria basado en zipfile/lxml.
+
+EbookLib ya no es una dependencia del proyecto: instálalo aparte
+(`pip install EbookLib`) para medir el extractor anterior.
+
+Uso:
+    python -m benchmarks.bench_epub_extraction [--books 3] [--chapters 60]
+"""
+import argparse
+import importlib.util
+import io
+import os
+import tempfile
+
+from book_summarizer import file_processor
+from book_summarizer.testing.synthetic import synthetic_epub
+from ._common import best_of
+
+
+def legacy_get_text_from_epub(file) -> str:
+    import ebooklib
+    from bs4 import BeautifulSoup
+    from ebooklib import epub
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.epub') as tmp_file:
+        tmp_file.write(file.read())
+        tmp_path = tmp_file.name
+    try:
+        book = epub.read_epub(tmp_path)
+        text = ""
+        for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
+            soup = BeautifulSoup(item.get_content(), 'html.parser')
+            text += soup.get_text() + "\n"
+        return text
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=3)
+    parser.add_argument("--chapters", type=int, default=60)
+    parser.add_argument("--chapter-size", type=int, default=50_000, help="Caracteres por capítulo")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if importlib.util.find_spec("ebooklib") is None:
+        parser.exit(1, "Falta EbookLib para el extractor anterior: pip install EbookLib\n")
+
+    print(f"{'libro':<22}{'anterior (s)':>14}{'nuevo (s)':>11}{'aceleración':>13}{'capítulos':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.books):
+            # Libros cada vez más grandes: 1x, 2x, 3x... el número de capítulos
+            chapters = args.chapters * (i + 1)
+            path = os.path.join(tmp, f"libro_{i}.epub")
+            synthetic_epub(path, chapters=chapters, chars_per_chapter=args.chapter_size, seed=i)
+            with open(path, "rb") as f:
+                data = f.read()
+
+            legacy = best_of(lambda: legacy_get_text_from_epub(io.BytesIO(data)), args.repeat)
+            new = best_of(lambda: file_processor.get_chapters_from_epub(io.BytesIO(data)), args.repeat)
+            found = len(file_processor.get_chapters_from_epub(io.BytesIO(data)))
+            label = f"{len(data) / 1e6:.1f} MB, {chapters} cap."
+            print(f"{label:<22}{legacy:>14.2f}{new:>11.2f}{legacy / new:>12.1f}x{found:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compara el pico de memoria (RSS) al extraer y trocear un libro grande con los
+extractores anteriores (todo el texto en un str construido con `+=` y la
+lista completa de chunks) frente a los generadores de `file_processor` y
+`TokenTextSplitter.split_stream`.
+
+Cada variante corre en un subproceso.
+
+Uso:
+    python -m benchmarks.bench_extraction_memory [--txt-mb 200] [--pdf-pages 2000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pypdf
+
+from book_summarizer import file_processor
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_pdf
+from book_summarizer.text_splitter import TokenTextSplitter
+from ._common import max_rss_mb
+
+CHUNK_TOKENS = 1024
+
+
+def legacy_txt(path: str) -> list:
+    with open(path, "rb") as file:
+        text = file.read().decode("utf-8", errors="ignore")
+    return TokenTextSplitter(CHUNK_TOKENS).split_text(text)
+
+
+def legacy_pdf(path: str) -> list:
+    with open(path, "rb") as file:
+        pdf_reader = pypdf.PdfReader(file)
+        text = ""
+        for page in pdf_reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+    return TokenTextSplitter(CHUNK_TOKENS).split_text(text)
+
+
+def streaming(path: str) -> int:
+    extension = os.path.splitext(path)[1]
+    with open(path, "rb") as file:
+        chunks = TokenTextSplitter(CHUNK_TOKENS).split_stream(file_processor.iter_text(file, extension))
+        # Cada chunk se procesa y se descarta, como en la fase map
+        return sum(1 for _ in chunks)
+
+
+def run_child(mode: str, path: str):
+    start = time.perf_counter()
+    if mode == "legacy":
+        chunks = len(legacy_pdf(path) if path.endswith(".pdf") else legacy_txt(path))
+    else:
+        chunks = streaming(path)
+    print(json.dumps({"seconds": time.perf_counter() - start, "chunks": chunks, "max_rss_mb": max_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--txt-mb", type=int, default=200)
+    parser.add_argument("--pdf-pages", type=int, default=2000)
+    parser.add_argument("--child", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        txt_path = os.path.join(tmp, "libro.txt")
+        with open(txt_path, "w", encoding="utf-8") as txt:
+            # Se escribe por partes para que el proceso padre no infle la medición
+            for seed in range(args.txt_mb):
+                txt.write(synthetic_book(1_000_000, seed) + "\n\n")
+        pdf_path = os.path.join(tmp, "libro.pdf")
+        synthetic_pdf(pdf_path, pages=args.pdf_pages)
+
+        print(f"{'archivo':<12}{'extractor':<12}{'tiempo (s)':>12}{'chunks':>9}{'RSS máx (MB)':>15}")
+        for path in (txt_path, pdf_path):
+            size = f"{os.path.getsize(path) / 1e6:.0f} MB {os.path.splitext(path)[1][1:]}"
+            for mode in ("legacy", "streaming"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_extraction_memory", "--child", mode, "--path", path],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(out)
+                print(f"{size:<12}{mode:<12}{result['seconds']:>12.1f}{result['chunks']:>9}{result['max_rss_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
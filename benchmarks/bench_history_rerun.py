@@ -0,0 +1,129 @@
+"""
+Mide lo que cuesta, en cada rerun de Streamlit, cargar el historial lateral
+(5 resúmenes) y la biblioteca (20 tarjetas), antes y después de separar el
+texto original y los chunks en `summary_documents`.
+
+Cada variante corre en un subproceso para que el RSS máximo sea comparable.
+
+Uso:
+    python -m benchmarks.bench_history_rerun [--rows 200] [--size 1000000]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from book_summarizer.testing.synthetic import synthetic_book
+from ._common import max_rss_mb
+
+LEGACY_SCHEMA = """
+    CREATE TABLE summaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        original_text TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        word_count INTEGER,
+        char_count INTEGER,
+        processing_time REAL,
+        method TEXT DEFAULT 'unknown',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        chunks_data TEXT,
+        title TEXT,
+        tags TEXT
+    )
+"""
+
+
+def build_legacy(path: str, rows: int, size: int):
+    """Crea una base con el esquema anterior: todo en la fila de `summaries`."""
+    book = synthetic_book(size)
+    chunks = json.dumps([
+        {"chunk_number": i + 1, "text_preview": book[i * 100:i * 100 + 100], "summary": book[:1500]}
+        for i in range(100)
+    ], ensure_ascii=False)
+    with sqlite3.connect(path) as conn:
+        conn.execute(LEGACY_SCHEMA)
+        conn.executemany("""
+            INSERT INTO summaries (timestamp, original_text, summary, word_count, char_count,
+                                   processing_time, method, chunks_data, title, tags)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            ("2024-01-01 00:00:00", f"libro{i} " + book, book[:3000], len(book.split()), len(book),
+             1.0, "Iterativo", chunks, f"Libro {i}", "novela,historia")
+            for i in range(rows)
+        ])
+
+
+def rerun_legacy(path: str):
+    # Las consultas que hacía la app con el esquema anterior
+    with sqlite3.connect(path) as conn:
+        conn.row_factory = sqlite3.Row
+        sidebar = [dict(r) for r in conn.execute("SELECT * FROM summaries ORDER BY created_at DESC LIMIT 5")]
+        library = [dict(r) for r in conn.execute("SELECT * FROM summaries ORDER BY created_at DESC LIMIT 20")]
+    return sidebar, library
+
+
+def rerun_split(db):
+    return db.get_recent_summaries(limit=5), db.filter_summaries(limit=20)
+
+
+def run_child(mode: str, path: str, repeat: int):
+    if mode == "legacy":
+        rerun = lambda: rerun_legacy(path)
+    else:
+        from book_summarizer.database import SummaryDatabase
+        db = SummaryDatabase(path)
+        rerun = lambda: rerun_split(db)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rerun()
+        times.append(time.perf_counter() - start)
+    print(json.dumps({"rerun_ms": min(times) * 1000, "max_rss_mb": max_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--size", type=int, default=1_000_000, help="Caracteres por libro")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", choices=["legacy", "split"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        split_path = os.path.join(tmp, "split.db")
+        build_legacy(legacy_path, args.rows, args.size)
+        shutil.copy(legacy_path, split_path)
+
+        start = time.perf_counter()
+        from book_summarizer.database import SummaryDatabase
+        SummaryDatabase(split_path)
+        migration = time.perf_counter() - start
+        print(f"{args.rows} libros de ~{args.size:,} caracteres; migración en {migration:.1f} s")
+        print(f"Tamaño en disco: {os.path.getsize(legacy_path) / 1e6:.0f} MB -> {os.path.getsize(split_path) / 1e6:.0f} MB\n")
+
+        print(f"{'esquema':<10}{'rerun (ms)':>12}{'RSS máx (MB)':>15}")
+        for mode, path in (("legacy", legacy_path), ("split", split_path)):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_history_rerun", "--child", mode,
+                 "--db", path, "--repeat", str(args.repeat)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(out)
+            print(f"{mode:<10}{result['rerun_ms']:>12.2f}{result['max_rss_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
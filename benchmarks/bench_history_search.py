@@ -0,0 +1,68 @@
+"""
+Compara la búsqueda del historial con FTS5 frente a LIKE sobre miles de libros.
+
+Uso:
+    python -m benchmarks.bench_history_search [--rows 2000] [--size 100000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from book_summarizer.database import SummaryDatabase
+from book_summarizer.testing.synthetic import synthetic_book
+
+# Términos presentes en todos los libros, en ~1% de ellos, en uno solo y en ninguno
+QUERIES = ["rey", "filósofo memoria", "vocablo42", "vocablo42 vocablo7", "libro17", "zanahoria"]
+
+
+def populate(db: SummaryDatabase, rows: int, size: int):
+    rng = random.Random(0)
+    base = synthetic_book(size)
+    for i in range(rows):
+        # Cada libro es una ventana distinta del texto base, con vocabulario
+        # poco frecuente repartido al azar y una palabra propia
+        offset = rng.randint(0, len(base) // 2)
+        rare = " ".join(f"vocablo{rng.randint(0, 5000)}" for _ in range(50))
+        text = base[offset:] + base[:offset] + f" {rare} libro{i}"
+        db.save_summary(text, base[offset:offset + 1500], len(text.split()), len(text), 1.0,
+                        title=f"Libro {i}", tags="novela,historia" if i % 2 else "ensayo")
+
+
+def measure(db: SummaryDatabase, repeat: int) -> dict:
+    results = {}
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            db.search_summaries(query, limit=5)
+        results[query] = (time.perf_counter() - start) / repeat
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=100_000, help="Caracteres por libro")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SummaryDatabase(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        populate(db, args.rows, args.size)
+        print(f"{args.rows} libros de ~{args.size:,} caracteres insertados en {time.perf_counter() - start:.1f} s "
+              f"({os.path.getsize(db.db_path) / 1e6:.0f} MB, FTS5={'sí' if db.fts_enabled else 'no'})\n")
+
+        fts = measure(db, args.repeat) if db.fts_enabled else {}
+        db.fts_enabled = False
+        like = measure(db, 1)
+
+        print(f"{'consulta':<28} {'LIKE':>10} {'FTS5':>10}")
+        for query in QUERIES:
+            fts_ms = f"{fts[query] * 1000:8.1f}ms" if query in fts else "       n/a"
+            print(f"{query:<28} {like[query] * 1000:8.1f}ms {fts_ms}")
+
+
+if __name__ == "__main__":
+    main()
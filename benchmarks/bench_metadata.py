@@ -0,0 +1,99 @@
+"""
+Título y etiquetas al final del resumen iterativo: antes, dos generaciones
+(`generate_title` y `generate_tags`) sobre el texto original una vez
+terminado el resumen; ahora, una sola (`generate_metadata`) sobre los
+primeros resúmenes de chunk, lanzada mientras se resumen los demás.
+
+Se mide la cola: el tiempo entre el último trozo del resumen y tener título
+y etiquetas, además del total y de las llamadas y tokens de prompt de ambos.
+
+Sin `--model` se usa `FakeIterativeProvider` con las plantillas reales de
+Gemma y latencias simuladas; el solapamiento supone que el modelo atiende dos
+peticiones a la vez (servidor de modelo, GPU o Gemini). Con un modelo local
+en una sola CPU ambas generaciones compiten por el mismo núcleo.
+
+Uso:
+    python -m benchmarks.bench_metadata [--model ruta] [--size 40000] [--decode-ms 20]
+"""
+import argparse
+import time
+
+from book_summarizer.gemma_prompts import GemmaPromptMixin
+from book_summarizer.pipeline import ITERATIVE_CHUNK_TOKENS, METHOD_ITERATIVE, summarize_document
+from book_summarizer.telemetry import TelemetryRecorder, stage
+from book_summarizer.testing.fake_provider import FakeIterativeProvider
+from book_summarizer.testing.synthetic import synthetic_book
+
+
+class PromptFakeProvider(FakeIterativeProvider):
+    """`FakeIterativeProvider` con los prompts de título y etiquetas de Gemma."""
+    generate_title = GemmaPromptMixin.generate_title
+    generate_tags = GemmaPromptMixin.generate_tags
+    generate_metadata = GemmaPromptMixin.generate_metadata
+
+
+def sequential(provider, text: str) -> dict:
+    """El camino anterior: resumen completo y después título y etiquetas del texto original."""
+    provider.telemetry = TelemetryRecorder()
+    start = time.perf_counter()
+    with stage(provider, "summary"):
+        for _ in provider.summarize_iterative(text, chunk_size=ITERATIVE_CHUNK_TOKENS["gemma"], stream=True):
+            pass
+    summary_done = time.perf_counter()
+    with stage(provider, "title"):
+        provider.generate_title(text)
+    with stage(provider, "tags"):
+        provider.generate_tags(text)
+    end = time.perf_counter()
+    calls, provider.telemetry = provider.telemetry.calls, None
+    return stats(calls, ("title", "tags"), end - start, end - summary_done)
+
+
+def overlapped(provider, text: str) -> dict:
+    last_text = [0.0]
+
+    def mark(_):
+        last_text[0] = time.perf_counter()
+
+    start = time.perf_counter()
+    result = summarize_document(provider, text, METHOD_ITERATIVE, text_callback=mark)
+    end = time.perf_counter()
+    return stats(result["metrics"], ("metadata",), end - start, end - last_text[0])
+
+
+def stats(calls: list, stages: tuple, total: float, tail: float) -> dict:
+    metadata_calls = [c for c in calls if c["stage"] in stages]
+    return {
+        "total": total,
+        "tail": tail,
+        "calls": len(metadata_calls),
+        "prompt_tokens": sum(c.get("prompt_tokens") or 0 for c in metadata_calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="Checkpoint de Gemma (por defecto, proveedor simulado)")
+    parser.add_argument("--size", type=int, default=40_000, help="Caracteres del libro sintético")
+    parser.add_argument("--prefill-ms", type=float, default=0.5, help="Latencia simulada por token de prompt")
+    parser.add_argument("--decode-ms", type=float, default=20, help="Latencia simulada por token generado")
+    args = parser.parse_args()
+
+    if args.model:
+        from book_summarizer.gemma_provider import GemmaBookSumProvider
+        provider = GemmaBookSumProvider(args.model)
+    else:
+        provider = PromptFakeProvider(prefill_seconds_per_token=args.prefill_ms / 1000,
+                                      decode_seconds_per_token=args.decode_ms / 1000)
+    text = synthetic_book(args.size)
+    results = {"antes (2 llamadas, al final)": sequential(provider, text),
+               "ahora (1 llamada, solapada)": overlapped(provider, text)}
+
+    print(f"{args.size} caracteres\n")
+    print(f"{'camino':<30}{'total':>9}{'cola':>9}{'llamadas':>10}{'tokens prompt':>15}")
+    for name, r in results.items():
+        print(f"{name:<30}{r['total']:>8.2f}s{r['tail']:>8.2f}s{r['calls']:>10}{r['prompt_tokens']:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Varias sesiones resumiendo a la vez contra el servidor de modelo compartido:
+con batching (hasta `--max-batch-size` peticiones por `generate`) frente a
+una petición cada vez, que es lo que hacía cada proceso con su propio modelo.
+
+Cada sesión es un cliente `ModelServerProvider` que pide `--requests`
+resúmenes de chunk seguidos. Se mide el throughput total (tokens/s), la
+latencia media por petición, el TTFT medio y el tamaño medio de los batches.
+
+Sin `--model` se usa un Gemma con pesos aleatorios del tamaño indicado.
+
+Uso:
+    python -m benchmarks.bench_model_server [--model ruta] [--sessions 4] [--requests 3] [--new-tokens 32]
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+import torch
+
+from book_summarizer.gemma_provider import GemmaBookSumProvider
+from book_summarizer.model_server import ModelServer
+from book_summarizer.server_provider import ModelServerProvider
+from book_summarizer.telemetry import TelemetryRecorder
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_causal_lm
+
+
+def run_sessions(provider: GemmaBookSumProvider, max_batch_size: int, args) -> dict:
+    server = ModelServer(provider, port=0, max_batch_size=max_batch_size).start()
+    clients = [ModelServerProvider(server.url, client_id=f"sesión {i}") for i in range(args.sessions)]
+    prompts = [[clients[0]._get_summary_prompt(synthetic_book(args.chunk_chars, seed=i * 100 + n))
+                for n in range(args.requests)] for i in range(args.sessions)]
+    params = dict(max_new_tokens=args.new_tokens, min_new_tokens=args.new_tokens, temperature=0.6)
+
+    def session(i):
+        clients[i].telemetry = TelemetryRecorder()
+        for prompt in prompts[i]:
+            clients[i]._generate(prompt, **params)
+
+    try:
+        start = time.perf_counter()
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    calls = [call for client in clients for call in client.telemetry.calls]
+    return {
+        "seconds": elapsed,
+        "tokens_per_second": sum(c["generated_tokens"] for c in calls) / elapsed,
+        "latency": sum(c["wall_seconds"] for c in calls) / len(calls),
+        "ttft": sum(c["ttft_seconds"] for c in calls) / len(calls),
+        "batch_size": sum(c["batch_size"] for c in calls) / len(calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="Checkpoint a servir (por defecto, uno sintético)")
+    parser.add_argument("--hidden-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=3, help="Peticiones seguidas de cada sesión")
+    parser.add_argument("--chunk-chars", type=int, default=1500)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=None, help="Hilos de torch (por defecto, los de la máquina)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model
+        if model is None:
+            synthetic_causal_lm(tmp, hidden_size=args.hidden_size, layers=args.layers)
+            model = tmp
+        provider = GemmaBookSumProvider(model)
+        provider._generate(provider._get_summary_prompt("Hola"), max_new_tokens=2)  # calentamiento
+        results = {"una a una": run_sessions(provider, 1, args),
+                   f"batch ≤{args.max_batch_size}": run_sessions(provider, args.max_batch_size, args)}
+
+    print(f"{args.sessions} sesiones x {args.requests} peticiones de {args.new_tokens} tokens, "
+          f"{torch.get_num_threads()} hilos\n")
+    print(f"{'modo':<12}{'total':>9}{'tok/s':>9}{'latencia':>11}{'TTFT':>9}{'batch medio':>13}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['seconds']:>8.1f}s{r['tokens_per_second']:>9.1f}{r['latency']:>10.2f}s"
+              f"{r['ttft']:>8.2f}s{r['batch_size']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Escalado de la extracción de texto de PDF con 1..N procesos (páginas/segundo).
+
+Uso:
+    python -m benchmarks.bench_pdf_extraction [--pages 800] [--max-workers 8]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from book_summarizer import file_processor
+from book_summarizer.testing.synthetic import synthetic_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=800)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "libro.pdf")
+        synthetic_pdf(path, pages=args.pages)
+        print(f"{args.pages} páginas, {os.path.getsize(path) / 1e6:.1f} MB; {os.cpu_count()} núcleos\n")
+        print(f"{'procesos':>9}{'tiempo (s)':>12}{'páginas/s':>11}{'aceleración':>13}")
+
+        reference = None
+        baseline = None
+        workers = 1
+        while workers <= args.max_workers:
+            with open(path, "rb") as file:
+                start = time.perf_counter()
+                text = "".join(file_processor.iter_text_from_pdf(file, workers=workers))
+                elapsed = time.perf_counter() - start
+            # El orden de las páginas debe ser idéntico al de la extracción en serie
+            reference = reference or text
+            assert text == reference
+            baseline = baseline or elapsed
+            print(f"{workers:>9}{elapsed:>12.2f}{args.pages / elapsed:>11.0f}{baseline / elapsed:>12.2f}x")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Compara las precisiones de `GemmaBookSumProvider` (fp32, bf16, int8 dinámico)
+sobre un mismo fragmento de libro: tokens/s de decodificación, TTFT, RSS con
+el modelo cargado, pico de RSS y deriva respecto a fp32.
+
+Cada precisión corre en un proceso aparte para que el pico de RSS sea sólo
+suyo. La deriva se mide de dos formas:
+- acuerdo top-1: fracción de posiciones del fragmento en las que el token más
+  probable coincide con el de fp32 (forzando el texto real como entrada);
+- similitud del resumen: `difflib` entre el resumen voraz (top_k=1) y el de
+  fp32, y primer token en que divergen.
+
+Sin `--model` se usa un Gemma con pesos aleatorios del tamaño indicado: los
+tiempos y la memoria son representativos, la deriva sólo orientativa.
+
+Uso:
+    python -m benchmarks.bench_quantization [--model ruta] [--text libro.txt] [--new-tokens 64]
+"""
+import argparse
+import difflib
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_causal_lm
+from ._common import max_rss_mb, rss_mb
+
+MODES = ["fp32", "bf16", "int8"]
+
+
+def run_mode(args):
+    """Proceso hijo: carga el modelo con una precisión, resume el fragmento y emite JSON."""
+    import torch
+
+    from book_summarizer.gemma_provider import GemmaBookSumProvider
+    from book_summarizer.telemetry import TelemetryRecorder, aggregate
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    start = time.perf_counter()
+    provider = GemmaBookSumProvider(args.model, precision=args.child)
+    load_seconds = time.perf_counter() - start
+    loaded_rss_mb = rss_mb()
+    excerpt = load_excerpt(args)
+
+    # Predicción top-1 en cada posición del fragmento real
+    ids = provider.tokenizer(excerpt, return_tensors="pt")["input_ids"][:, :args.max_positions]
+    with torch.no_grad():
+        top1 = provider._model(input_ids=ids).logits[0].argmax(-1).tolist()
+
+    prompt = provider._get_summary_prompt(excerpt, language="es")
+    params = dict(max_new_tokens=args.new_tokens, min_new_tokens=args.new_tokens, top_k=1)
+    provider._generate(prompt, max_new_tokens=2, min_new_tokens=2)  # calentamiento
+    provider.telemetry = TelemetryRecorder()
+    summary = provider._generate(prompt, **params)
+    telemetry = aggregate(provider.telemetry.calls)
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "ttft_seconds": telemetry["ttft_seconds"],
+        "decode_tokens_per_second": telemetry["decode_tokens_per_second"],
+        "loaded_rss_mb": loaded_rss_mb,
+        "rss_mb": max_rss_mb(),
+        "top1": top1,
+        "summary": summary,
+        "summary_tokens": provider.tokenizer(summary, add_special_tokens=False)["input_ids"],
+    }))
+
+
+def load_excerpt(args) -> str:
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            return f.read()[:args.excerpt_chars]
+    return synthetic_book(args.excerpt_chars, seed=7)
+
+
+def measure(mode: str, model: str, args) -> dict:
+    command = [sys.executable, "-m", "benchmarks.bench_quantization", "--child", mode, "--model", model,
+               "--new-tokens", str(args.new_tokens), "--excerpt-chars", str(args.excerpt_chars),
+               "--max-positions", str(args.max_positions)]
+    if args.text:
+        command += ["--text", args.text]
+    if args.threads:
+        command += ["--threads", str(args.threads)]
+    process = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def drift(result: dict, reference: dict) -> dict:
+    agree = sum(a == b for a, b in zip(result["top1"], reference["top1"])) / max(len(reference["top1"]), 1)
+    tokens, expected = result["summary_tokens"], reference["summary_tokens"]
+    diverge = next((i for i, (a, b) in enumerate(zip(tokens, expected)) if a != b), min(len(tokens), len(expected)))
+    similarity = difflib.SequenceMatcher(None, result["summary"], reference["summary"]).ratio()
+    return {"top1_agreement": agree, "summary_similarity": similarity, "first_divergence": diverge}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=None, help="Checkpoint a medir (por defecto, uno sintético)")
+    parser.add_argument("--text", default=None, help="Libro del que sale el fragmento (por defecto, texto sintético)")
+    parser.add_argument("--excerpt-chars", type=int, default=3000)
+    parser.add_argument("--max-positions", type=int, default=512, help="Posiciones comparadas en el acuerdo top-1")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--hidden-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--threads", type=int, default=None, help="Hilos de torch (por defecto, los de la máquina)")
+    parser.add_argument("--child", choices=MODES, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model
+        if model is None:
+            synthetic_causal_lm(tmp, hidden_size=args.hidden_size, layers=args.layers)
+            model = tmp
+        modes = ["fp32"] + [mode for mode in args.modes if mode != "fp32"]
+        results = {mode: measure(mode, model, args) for mode in modes}
+
+    reference = results["fp32"]
+    print(f"{args.excerpt_chars} caracteres, {args.new_tokens} tokens de resumen voraz\n")
+    print(f"{'modo':<6}{'carga':>9}{'TTFT':>10}{'tok/s':>9}{'RSS cargado':>13}{'RSS pico':>11}{'acuerdo top-1':>15}"
+          f"{'similitud':>11}{'diverge en':>12}")
+    for mode in modes:
+        result = results[mode]
+        d = drift(result, reference)
+        print(f"{mode:<6}{result['load_seconds']:>8.1f}s{result['ttft_seconds'] * 1000:>8.0f}ms"
+              f"{result['decode_tokens_per_second']:>9.1f}{result['loaded_rss_mb']:>11.0f}MB{result['rss_mb']:>9.0f}MB"
+              f"{d['top1_agreement'] * 100:>14.1f}%{d['summary_similarity'] * 100:>10.1f}%{d['first_divergence']:>12}")
+
+
+if __name__ == "__main__":
+    main()
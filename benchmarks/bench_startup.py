@@ -0,0 +1,95 @@
+"""
+Coste de importar cada módulo de entrada de la app, medido con `python -X importtime`
+en un proceso nuevo: tiempo de importación, pico de memoria y dependencias
+pesadas (torch, transformers, genai, extractores) cargadas sin usarse.
+
+Uso:
+    python -m benchmarks.bench_startup [--budget-ms 200] [--repeat 3]
+
+Sale con 1 si algún módulo supera el presupuesto o carga una dependencia pesada.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Lo que importa la app al arrancar, la CLI, los workers y quien sólo consulta el historial
+MODULES = [
+    "book_summarizer.database",
+    "book_summarizer.job_queue",
+    "book_summarizer.file_processor",
+    "book_summarizer.providers",
+    "book_summarizer.summarizer",
+    "book_summarizer.pipeline",
+    "book_summarizer.cli",
+    "book_summarizer.worker",
+    "book_summarizer.server_provider",
+]
+
+# Se cargan sólo al crear un proveedor o al extraer un formato concreto
+HEAVY_MODULES = ["torch", "transformers", "google.genai", "httpx", "pypdf", "docx", "ebooklib", "bs4", "lxml"]
+
+_PROBE = """
+import json, sys
+import {module}
+from benchmarks._common import max_rss_mb
+print(json.dumps({{"rss_mb": max_rss_mb(), "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def import_cost(module: str) -> Dict:
+    """Importa `module` en un proceso nuevo y devuelve tiempo (ms), pico de RSS y módulos pesados cargados."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             capture_output=True, text=True, cwd=root, check=True)
+    # Líneas "import time: self [us] | cumulative | paquete"; se suman las de primer
+    # nivel del paquete (book_summarizer y sus módulos), que incluyen todo lo que arrastran
+    micros = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2][1:].rstrip()
+        if name.startswith("book_summarizer") and not name.startswith(" "):
+            micros += int(fields[1])
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["import_ms"] = micros / 1000
+    return result
+
+
+def measure(modules: List[str], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for module in modules:
+        runs = [import_cost(module) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r["import_ms"])
+        results[module] = best
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=200, help="Tiempo máximo de importación por módulo")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = measure(MODULES, args.repeat)
+    failures = []
+    print(f"{'módulo':<32} {'importación':>12} {'RSS pico':>10}  pesados")
+    for module, result in results.items():
+        over = result["import_ms"] > args.budget_ms
+        if over or result["heavy"]:
+            failures.append(module)
+        print(f"{module:<32} {result['import_ms']:>10.0f}ms {result['rss_mb']:>8.0f}MB  "
+              f"{', '.join(result['heavy']) or '-'}{'   FUERA DE PRESUPUESTO' if over else ''}")
+
+    if failures:
+        print(f"\n{len(failures)} módulos superan {args.budget_ms:.0f} ms o cargan dependencias pesadas")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compara TokenTextSplitter con los divisores anteriores sobre un libro de ~1 MB.
+
+Uso:
+    python -m benchmarks.bench_text_splitter [--tokenizer croko22/gemma-booksum-lora-v1]
+"""
+import argparse
+import statistics
+
+from book_summarizer.testing.synthetic import synthetic_book
+from book_summarizer.text_splitter import TokenTextSplitter
+from ._common import best_of
+
+
+def legacy_gemma_split(text: str, chunk_size: int) -> list[str]:
+    """Divisor por caracteres que usaba GemmaBookSumProvider."""
+    if len(text) <= chunk_size: return [text]
+    chunks = []
+    current_chunk = ""
+    for para in text.split('\n\n'):
+        if len(current_chunk) + len(para) + 2 <= chunk_size:
+            current_chunk += ("\n\n" + para) if current_chunk else para
+        else:
+            if current_chunk: chunks.append(current_chunk)
+            current_chunk = para
+            if len(para) > chunk_size:
+                while len(current_chunk) > chunk_size:
+                    chunks.append(current_chunk[:chunk_size])
+                    current_chunk = current_chunk[chunk_size:]
+    if current_chunk: chunks.append(current_chunk)
+    return chunks
+
+
+def legacy_gemini_split(text: str, chunk_size: int) -> list[str]:
+    """Divisor por caracteres que usaba GeminiProvider."""
+    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def describe(name: str, seconds: float, chunks: list[str], counter: TokenTextSplitter, budget: int):
+    sizes = [counter.count_tokens(chunk) for chunk in chunks]
+    over = sum(1 for size in sizes if size > budget)
+    print(
+        f"{name:<28} {seconds * 1000:9.1f} ms  chunks={len(chunks):5d}  "
+        f"tokens min/med/max={min(sizes)}/{int(statistics.median(sizes))}/{max(sizes)}  "
+        f"sobre presupuesto={over}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000, help="Tamaño del libro sintético en bytes")
+    parser.add_argument("--tokens", type=int, default=1024, help="Presupuesto de tokens por chunk")
+    parser.add_argument("--chars", type=int, default=4000, help="Tamaño por caracteres de los divisores anteriores")
+    parser.add_argument("--tokenizer", default=None, help="Tokenizer de Hugging Face (por defecto, aproximación)")
+    args = parser.parse_args()
+
+    tokenizer = None
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    text = synthetic_book(args.size)
+    splitter = TokenTextSplitter(max_tokens=args.tokens, tokenizer=tokenizer)
+    print(f"Libro sintético: {len(text):,} caracteres, {splitter.count_tokens(text):,} tokens\n")
+
+    candidates = [
+        ("TokenTextSplitter", lambda: splitter.split_text(text)),
+        ("TokenTextSplitter (overlap)", lambda: TokenTextSplitter(args.tokens, args.tokens // 20, tokenizer).split_text(text)),
+        ("Gemma _split_text (chars)", lambda: legacy_gemma_split(text, args.chars)),
+        ("Gemini _split_text (chars)", lambda: legacy_gemini_split(text, args.chars)),
+    ]
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        langchain_splitter = RecursiveCharacterTextSplitter(chunk_size=args.chars, chunk_overlap=args.chars // 20)
+        candidates.append(("langchain Recursive (chars)", lambda: langchain_splitter.split_text(text)))
+    except ImportError:
+        pass
+
+    for name, fn in candidates:
+        seconds = best_of(fn)
+        describe(name, seconds, fn(), splitter, args.tokens)
+
+
+if __name__ == "__main__":
+    main()
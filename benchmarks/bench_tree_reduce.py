@@ -0,0 +1,67 @@
+"""
+Compara el reduce plano (todos los resúmenes parciales en un único prompt
+final, `max_levels=0`) con el reduce jerárquico de
+`generate_summary_map_reduce`, mostrando los tiempos de cada nivel.
+
+Sin `--model` se usa un Gemma con pesos aleatorios del tamaño indicado.
+
+Uso:
+    python -m benchmarks.bench_tree_reduce [--model ruta] [--chunks 48] [--fan-in 8]
+"""
+import argparse
+import tempfile
+import time
+
+import torch
+
+from book_summarizer.gemma_provider import GemmaBookSumProvider
+from book_summarizer.summarizer import REDUCE_MAX_TOKENS, generate_summary_map_reduce
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_causal_lm
+from book_summarizer.text_splitter import TokenTextSplitter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=None, help="Checkpoint a medir (por defecto, uno sintético)")
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--chunks", type=int, default=48)
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--fan-in", type=int, default=8)
+    parser.add_argument("--reduce-max-tokens", type=int, default=REDUCE_MAX_TOKENS)
+    parser.add_argument("--threads", type=int, default=None, help="Hilos de torch (por defecto, los de la máquina)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model
+        if model is None:
+            synthetic_causal_lm(tmp, hidden_size=args.hidden_size, layers=args.layers)
+            model = tmp
+        provider = GemmaBookSumProvider(model)
+        splitter = TokenTextSplitter(args.chunk_tokens, tokenizer=provider.tokenizer)
+        chunks = splitter.split_text(synthetic_book(args.chunks * args.chunk_tokens * 6))[:args.chunks]
+        text = "\n\n".join(chunks)
+        print(f"{len(chunks)} chunks de ~{args.chunk_tokens} tokens, fan-in {args.fan_in}, "
+              f"{args.reduce_max_tokens} tokens por grupo, {torch.get_num_threads()} hilos\n")
+
+        for name, max_levels in (("plano", 0), ("jerárquico", None)):
+            # Misma semilla: la fase map genera lo mismo en las dos variantes
+            torch.manual_seed(0)
+            timings = []
+            start = time.perf_counter()
+            generate_summary_map_reduce(provider, text, chunk_size=args.chunk_tokens, chunk_overlap=0,
+                                        reduce_fan_in=args.fan_in, reduce_max_tokens=args.reduce_max_tokens,
+                                        max_levels=max_levels, level_timings=timings)
+            total = time.perf_counter() - start
+            print(f"{name}: {total:.1f} s")
+            for timing in timings:
+                label = "map" if timing["level"] == 0 else f"nivel {timing['level']}"
+                print(f"  {label:<10}{timing['inputs']:>5} -> {timing['outputs']:<5}{timing['seconds']:>8.1f} s")
+            reduce_seconds = sum(t["seconds"] for t in timings[1:])
+            print(f"  {'reduce':<10}{'':>14}{reduce_seconds:>8.1f} s\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Suite de rendimiento sin modelo ni red: divide texto, extrae cada formato,
+orquesta los resúmenes con `FakeProvider` y mide cada consulta de
+`SummaryDatabase` con 10, 1.000 y 10.000 filas.
+
+Los resultados se guardan en JSON (por defecto benchmarks/results/<commit>.json)
+para comparar commits:
+
+    python -m benchmarks.suite [--quick] [--only db/] [--decode-ms 0]
+    python -m benchmarks.suite --compare benchmarks/results/abc1234.json
+
+Con `--compare` se marca como regresión todo caso más lento que la
+referencia en más de `--threshold` (y más de 1 ms), y la salida es 1.
+Con latencias 0 (por defecto) el proveedor falso no duerme: se mide sólo
+el coste de la orquestación.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from book_summarizer import file_processor
+from book_summarizer.database import SummaryDatabase
+from book_summarizer.summarizer import generate_summary_incremental, generate_summary_map_reduce
+from book_summarizer.telemetry import call_metrics
+from book_summarizer.testing.fake_provider import FakeIterativeProvider, FakeProvider
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_docx, synthetic_epub, synthetic_pdf
+from book_summarizer.text_splitter import TokenTextSplitter
+
+ROW_COUNTS = [10, 1_000, 10_000]
+QUICK_ROW_COUNTS = [10, 1_000]
+GROUPS = ("split/", "extract/", "summarizer/", "db/")
+# Diferencias menores que esto son ruido aunque superen el umbral relativo
+MIN_REGRESSION_SECONDS = 0.001
+
+Case = Callable[[], None]
+
+
+def measure(fn: Case, repeat: int) -> Dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def splitter_cases(book: str) -> Dict[str, Case]:
+    splitter = TokenTextSplitter(1024, 50)
+    pieces = [book[i:i + 65536] for i in range(0, len(book), 65536)]
+    return {
+        "split/split_text": lambda: splitter.split_text(book),
+        "split/split_stream": lambda: list(splitter.split_stream(pieces)),
+    }
+
+
+def extractor_cases(tmp: str, scale: int) -> Dict[str, Case]:
+    txt = synthetic_book(1_000_000 * scale).encode("utf-8")
+    pdf_path = os.path.join(tmp, "libro.pdf")
+    synthetic_pdf(pdf_path, pages=50 * scale)
+    docx_path = os.path.join(tmp, "libro.docx")
+    synthetic_docx(docx_path, paragraphs=1000 * scale)
+    epub_path = os.path.join(tmp, "libro.epub")
+    synthetic_epub(epub_path, chapters=10 * scale, chars_per_chapter=50_000)
+
+    def extract(data: bytes, extension: str) -> Case:
+        return lambda: "".join(file_processor.iter_text(io.BytesIO(data), extension))
+
+    cases = {"extract/txt": extract(txt, "txt")}
+    for extension, path in [("pdf", pdf_path), ("docx", docx_path), ("epub", epub_path)]:
+        with open(path, "rb") as f:
+            cases[f"extract/{extension}"] = extract(f.read(), extension)
+    return cases
+
+
+def summarizer_cases(book: str, tmp: str, provider_kwargs: Dict) -> Dict[str, Case]:
+    checkpoints = SummaryDatabase(os.path.join(tmp, "checkpoints.db"))
+
+    def iterative(**kwargs) -> Case:
+        def run():
+            result = FakeIterativeProvider(**provider_kwargs).summarize_iterative(book, **kwargs)
+            if not isinstance(result, dict):
+                "".join(result)
+        return run
+
+    return {
+        "summarizer/map_reduce": lambda: generate_summary_map_reduce(FakeProvider(**provider_kwargs), book),
+        "summarizer/map_reduce_batched": lambda: generate_summary_map_reduce(
+            FakeProvider(supports_batching=True, **provider_kwargs), book),
+        "summarizer/incremental": lambda: generate_summary_incremental(FakeProvider(**provider_kwargs), book),
+        "summarizer/iterative": iterative(),
+        "summarizer/iterative_stream": iterative(stream=True),
+        # Coste de guardar un checkpoint por chunk (se borran al terminar)
+        "summarizer/iterative_checkpoints": iterative(checkpoint_db=checkpoints),
+    }
+
+
+def populate(db: SummaryDatabase, rows: int, size: int = 5_000):
+    """Inserta `rows` libros de ~`size` caracteres, con etiquetas repetidas y una palabra propia."""
+    base = synthetic_book(size * 4)
+    tag_sets = ["novela,historia", "ensayo", "novela,aventura", "poesía,historia"]
+    metrics = [dict(call_metrics(900, 150, 3.0, 0.01, 0.4), stage="chunk", chunk_number=n) for n in range(1, 6)]
+    metrics += [dict(call_metrics(300, 12, 0.5, 0.01, 0.2), stage=name) for name in ("title", "tags")]
+    for i in range(rows):
+        offset = (i * 7919) % (len(base) - size)
+        text = base[offset:offset + size] + f" libro{i}"
+        db.save_summary(text, base[offset:offset + 800] + f" libro{i}", len(text.split()), len(text), 1.0,
+                        method="Iterativo" if i % 2 else "Map Reduce", title=f"Libro {i}",
+                        tags=tag_sets[i % len(tag_sets)], source_name=f"libro{i}.txt",
+                        document_hash=f"hash{i}", metrics=metrics)
+
+
+def database_cases(db: SummaryDatabase, rows: int, tmp: str) -> Dict[str, Case]:
+    prefix = f"db/{rows}"
+    text = synthetic_book(5_000, seed=1)
+    csv_path = os.path.join(tmp, f"export_{rows}.csv")
+    middle = max(1, rows // 2)
+    checkpoint_runs = iter(range(1_000_000))
+
+    def delete_newest():
+        newest = db.get_recent_summaries(limit=1)
+        if newest:
+            db.delete_summary(newest[0]["id"])
+
+    def checkpoint_cycle():
+        key = f"bench-{rows}-{next(checkpoint_runs)}"
+        db.start_checkpoint(key, 20)
+        for index in range(20):
+            db.save_checkpoint_chunk(key, index, "resumen " * 50, "contexto " * 100, "vista previa")
+        db.get_checkpoint_chunks(key)
+        db.finish_checkpoint(key)
+
+    return {
+        # Las escrituras primero: save añade filas y delete/cleanup las vuelven a quitar
+        f"{prefix}/save_summary": lambda: db.save_summary(text, text[:800], len(text.split()), len(text), 1.0,
+                                                          title="Nuevo", tags="novela"),
+        f"{prefix}/get_recent_summaries": lambda: db.get_recent_summaries(limit=10),
+        f"{prefix}/search_summaries": lambda: db.search_summaries("filósofo memoria", limit=20),
+        f"{prefix}/search_summaries_rare": lambda: db.search_summaries(f"libro{middle}", limit=20),
+        f"{prefix}/get_summary_by_id": lambda: db.get_summary_by_id(middle),
+        f"{prefix}/find_by_document_hash": lambda: db.find_by_document_hash(f"hash{middle}", "Iterativo"),
+        f"{prefix}/filter_summaries": lambda: db.filter_summaries("rey", tags=["historia"], limit=50),
+        f"{prefix}/filter_summaries_tags": lambda: db.filter_summaries(tags=["novela", "historia"], limit=50),
+        f"{prefix}/get_all_tags": db.get_all_tags,
+        f"{prefix}/get_tag_counts": db.get_tag_counts,
+        f"{prefix}/get_statistics": db.get_statistics,
+        f"{prefix}/get_summary_metrics": lambda: db.get_summary_metrics(middle),
+        f"{prefix}/get_telemetry_statistics": db.get_telemetry_statistics,
+        f"{prefix}/export_to_csv": lambda: db.export_to_csv(csv_path),
+        f"{prefix}/checkpoint_cycle": checkpoint_cycle,
+        f"{prefix}/delete_summary": delete_newest,
+        f"{prefix}/cleanup_old_summaries": lambda: db.cleanup_old_summaries(keep_last=rows),
+    }
+
+
+def run_cases(cases: Dict[str, Case], repeat: int, only: Optional[str], results: Dict):
+    for name, fn in cases.items():
+        if only and only not in name:
+            continue
+        results[name] = measure(fn, repeat)
+        print(f"{name:<45} {results[name]['best'] * 1000:>10.2f} ms  (mediana {results[name]['median'] * 1000:.2f} ms)",
+              flush=True)
+
+
+def run_suite(quick: bool = False, only: Optional[str] = None, repeat: int = None,
+              provider_kwargs: Optional[Dict] = None) -> Dict:
+    scale = 1 if quick else 4
+    repeat = repeat or (1 if quick else 3)
+    provider_kwargs = provider_kwargs or {}
+    results: Dict[str, Dict] = {}
+
+    def wanted(group: str) -> bool:
+        # Los grupos con preparación cara se saltan si `only` apunta claramente a otro
+        if not only or not only.startswith(GROUPS):
+            return True
+        return only.startswith(group) or group.startswith(only)
+
+    book = synthetic_book(250_000 * scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        run_cases(splitter_cases(book), repeat, only, results)
+        if wanted("extract/"):
+            run_cases(extractor_cases(tmp, scale), repeat, only, results)
+        run_cases(summarizer_cases(book, tmp, provider_kwargs), repeat, only, results)
+        for rows in QUICK_ROW_COUNTS if quick else ROW_COUNTS:
+            if not wanted(f"db/{rows}/"):
+                continue
+            db = SummaryDatabase(os.path.join(tmp, f"history_{rows}.db"))
+            populate(db, rows)
+            run_cases(database_cases(db, rows, tmp), repeat, only, results)
+            db.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": quick,
+        "provider": provider_kwargs,
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Imprime la comparación caso a caso y devuelve los casos que empeoran."""
+    regressions = []
+    print(f"\n{'caso':<45} {'antes':>10} {'ahora':>10} {'cambio':>8}   ({baseline.get('commit')} -> {current.get('commit')})")
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<45} {'-':>10} {result['best'] * 1000:>8.2f}ms {'nuevo':>8}")
+            continue
+        change = result["best"] / old["best"] - 1 if old["best"] else 0.0
+        regressed = change > threshold and result["best"] - old["best"] > MIN_REGRESSION_SECONDS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<45} {old['best'] * 1000:>8.2f}ms {result['best'] * 1000:>8.2f}ms {change:>+8.0%}"
+              f"{'   REGRESIÓN' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Tamaños pequeños, sin 10.000 filas y una repetición")
+    parser.add_argument("--only", default=None, help="Sólo los casos cuyo nombre contenga este texto")
+    parser.add_argument("--repeat", type=int, default=None)
+    parser.add_argument("--prefill-us", type=float, default=0.0, help="Latencia simulada por token de prompt (µs)")
+    parser.add_argument("--decode-ms", type=float, default=0.0, help="Latencia simulada por token generado (ms)")
+    parser.add_argument("--output", default=None, help="JSON de resultados (por defecto benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de referencia con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento relativo que cuenta como regresión")
+    args = parser.parse_args()
+
+    provider_kwargs = {"prefill_seconds_per_token": args.prefill_us / 1e6,
+                       "decode_seconds_per_token": args.decode_ms / 1e3}
+    current = run_suite(args.quick, args.only, args.repeat, provider_kwargs)
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"{current['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
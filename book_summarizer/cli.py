@@ -0,0 +1,261 @@
+"""
+Resume por lotes todos los libros de uno o varios directorios (o globs).
+
+La extracción del siguiente archivo se solapa con el resumen del actual. Cada
+resumen se guarda en la base de datos de la app y como Markdown en
+`--output-dir`; los archivos cuyo contenido ya se resumió con el mismo método
+se saltan (salvo con `--force`).
+
+Uso:
+    python -m book_summarizer libros/ "otros/**/*.epub" [--provider gemma] [--method iterativo] [--precision int8]
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from . import file_processor
+from .database import SummaryDatabase
+from .document_cache import document_key
+from .incremental import find_previous
+from .pipeline import METHOD_ITERATIVE, METHOD_MAP_REDUCE, create_provider, method_label, summarize_document, summary_markdown
+from .providers import DEFAULT_PRECISION, PRECISIONS, provider_names
+from .text_splitter import estimate_tokens
+
+METHODS = {"iterativo": METHOD_ITERATIVE, "map-reduce": METHOD_MAP_REDUCE}
+# Documentos extraídos esperando a ser resumidos
+DEFAULT_PREFETCH = 2
+
+
+def collect_files(patterns: List[str]) -> List[str]:
+    """Archivos soportados de los directorios, globs o rutas dados, sin repetir y en orden."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, names in os.walk(pattern):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        elif glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            files.append(pattern)
+    seen = set()
+    result = []
+    for path in files:
+        extension = os.path.splitext(path)[1].lower().lstrip(".")
+        real = os.path.realpath(path)
+        if extension in file_processor.TEXT_ITERATORS and os.path.isfile(path) and real not in seen:
+            seen.add(real)
+            result.append(path)
+    return result
+
+
+def iter_documents(paths: List[str], database: SummaryDatabase, method: str, force: bool = False) -> Iterator[Dict]:
+    """
+    Lee, identifica y extrae cada archivo.
+
+    Produce un dict con 'path', 'key' y, según el caso, 'text' y
+    'extract_seconds' (pendiente), 'done' (fila ya guardada) o 'error'.
+    """
+    for path in paths:
+        document = {"path": path}
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            extension = os.path.splitext(path)[1].lower().lstrip(".")
+            document["key"] = document_key(data, extension)
+            done = None if force else database.find_by_document_hash(document["key"], method)
+            if done:
+                document["done"] = done
+            else:
+                start = time.perf_counter()
+                # El texto completo hace falta igualmente: se guarda en el historial, alinea el
+                # resumen incremental y cuenta los tokens. Extraer y dividir en streaming
+                # (`iter_text` directo a `generate_summary_map_reduce`) es sólo de la librería
+                document["text"] = "".join(file_processor.iter_text(io.BytesIO(data), extension))
+                document["extract_seconds"] = time.perf_counter() - start
+        except Exception as e:
+            document["error"] = f"{type(e).__name__}: {e}"
+        yield document
+
+
+def prefetch(documents: Iterator[Dict], size: int) -> Iterator[Dict]:
+    """Consume `documents` en un hilo aparte, con como mucho `size` documentos por delante."""
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, size))
+    end = object()
+
+    def produce():
+        try:
+            for document in documents:
+                buffer.put(document)
+        finally:
+            buffer.put(end)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        document = buffer.get()
+        if document is end:
+            return
+        yield document
+
+
+def output_path(output_dir: str, source_path: str, used: set) -> str:
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    path = os.path.join(output_dir, f"{stem}.md")
+    suffix = 2
+    while path in used:
+        path = os.path.join(output_dir, f"{stem}-{suffix}.md")
+        suffix += 1
+    used.add(path)
+    return path
+
+
+def write_markdown(path: str, item: Dict):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(summary_markdown(item))
+
+
+def print_report(stats: Dict, elapsed: float, out=sys.stdout):
+    hours = elapsed / 3600
+    print("\n=== Informe ===", file=out)
+    print(f"Resumidos: {stats['done']}  Saltados: {stats['skipped']}  Fallidos: {stats['failed']}", file=out)
+    print(f"Tiempo total: {elapsed:.1f} s (extracción {stats['extract_seconds']:.1f} s, "
+          f"resumen {stats['summary_seconds']:.1f} s)", file=out)
+    # Suma de las llamadas al modelo: con llamadas en paralelo puede superar el tiempo de resumen
+    print(f"Tiempo de modelo: {stats['model_seconds']:.1f} s, {stats['generated_tokens']} tokens generados", file=out)
+    if stats.get("reused_chunks"):
+        print(f"Chunks reutilizados de versiones anteriores: {stats['reused_chunks']} "
+              f"(~{stats['time_saved']:.1f} s ahorrados)", file=out)
+    if elapsed > 0:
+        print(f"Documentos/hora: {stats['done'] / hours:.1f}", file=out)
+        print(f"Chunks/segundo: {stats['chunks'] / elapsed:.2f}", file=out)
+        print(f"Tokens/segundo: {stats['tokens'] / elapsed:.0f}", file=out)
+
+
+def run(paths: List[str],
+        provider,
+        database: SummaryDatabase,
+        output_dir: str,
+        method: str = METHOD_ITERATIVE,
+        provider_name: str = "gemma",
+        focus_instruction: Optional[str] = None,
+        language: str = "es",
+        force: bool = False,
+        prefetch_size: int = DEFAULT_PREFETCH,
+        incremental: bool = True,
+        out=sys.stdout) -> Dict:
+    """
+    Resume `paths` en orden y devuelve las estadísticas del lote. Con
+    `incremental`, un archivo editado desde su último resumen reutiliza los
+    chunks que no cambiaron.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stats = {"done": 0, "skipped": 0, "failed": 0, "chunks": 0, "tokens": 0, "reused_chunks": 0, "time_saved": 0.0,
+             "extract_seconds": 0.0, "summary_seconds": 0.0, "model_seconds": 0.0, "generated_tokens": 0}
+    used_outputs = set()
+    # Lo que se guarda (y se busca para saltar archivos) lleva la precisión del modelo
+    stored_method = method_label(method, provider)
+    documents = prefetch(iter_documents(paths, database, stored_method, force), prefetch_size)
+    for n, document in enumerate(documents, 1):
+        path = document["path"]
+        target = output_path(output_dir, path, used_outputs)
+        prefix = f"[{n}/{len(paths)}] {path}"
+        if "error" in document:
+            stats["failed"] += 1
+            print(f"{prefix}: error al leer ({document['error']})", file=out)
+            continue
+        if "done" in document:
+            stats["skipped"] += 1
+            if not os.path.exists(target):
+                # Ya resumido pero sin Markdown: se exporta desde la base de datos
+                write_markdown(target, database.get_summary_by_id(document["done"]["id"]))
+            print(f"{prefix}: ya resumido (#{document['done']['id']}), se salta", file=out)
+            continue
+
+        text = document["text"]
+        stats["extract_seconds"] += document["extract_seconds"]
+        if not text.strip():
+            stats["failed"] += 1
+            print(f"{prefix}: sin texto extraíble", file=out)
+            continue
+        try:
+            previous = find_previous(database, os.path.basename(path), stored_method) if incremental else None
+            result = summarize_document(provider, text, method, provider_name=provider_name,
+                                        focus_instruction=focus_instruction, language=language,
+                                        checkpoint_db=database, previous=previous)
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"{prefix}: error al resumir ({type(e).__name__}: {e})", file=out)
+            continue
+        summary_id = database.save_summary(
+            original_text=text,
+            summary=result["summary"],
+            word_count=len(text.split()),
+            char_count=len(text),
+            processing_time=result["processing_time"],
+            method=stored_method,
+            chunks_data=json.dumps(result["chunks"]) if result["chunks"] else None,
+            title=result["title"],
+            tags=result["tags"],
+            source_name=os.path.basename(path),
+            document_hash=document["key"],
+            metrics=result["metrics"]
+        )
+        write_markdown(target, database.get_summary_by_id(summary_id))
+        tokens = estimate_tokens(text, provider.tokenizer)
+        stats["done"] += 1
+        stats["chunks"] += result["chunk_count"]
+        stats["tokens"] += tokens
+        stats["summary_seconds"] += result["processing_time"]
+        stats["model_seconds"] += result["telemetry"]["generation_seconds"]
+        stats["generated_tokens"] += result["telemetry"]["generated_tokens"]
+        stats["reused_chunks"] += result["reused_chunks"]
+        stats["time_saved"] += result["time_saved"]
+        reused = (f" ({result['reused_chunks']} reutilizados de #{previous['id']}, ~{result['time_saved']:.1f} s ahorrados)"
+                  if result["reused_chunks"] else "")
+        print(f"{prefix}: {result['chunk_count']} chunks{reused}, {tokens} tokens en {result['processing_time']:.1f} s -> {target}",
+              file=out)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m book_summarizer", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Directorios, globs o archivos (.txt, .pdf, .docx, .epub)")
+    parser.add_argument("--provider", choices=provider_names(), default="gemma")
+    parser.add_argument("--method", choices=sorted(METHODS), default="iterativo")
+    parser.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION,
+                        help="Precisión del modelo local (int8: cuantización dinámica en CPU)")
+    parser.add_argument("--draft-model", default=None,
+                        help="Modelo pequeño con el mismo vocabulario para la decodificación asistida del modelo local")
+    parser.add_argument("--language", choices=["es", "en"], default="es")
+    parser.add_argument("--focus", default=None, help="Instrucción de enfoque del resumen")
+    parser.add_argument("--output-dir", default="resumenes")
+    parser.add_argument("--db", default="summary_history.db")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="No reutilizar generaciones en caché ni chunks de versiones anteriores del archivo")
+    parser.add_argument("--force", action="store_true", help="Resumir también los archivos ya resumidos")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH,
+                        help="Documentos extraídos por delante del que se está resumiendo")
+    args = parser.parse_args(argv)
+
+    paths = collect_files(args.paths)
+    if not paths:
+        parser.error("no se encontraron archivos .txt, .pdf, .docx o .epub")
+    api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
+    database = SummaryDatabase(args.db)
+    provider = create_provider(args.provider, args.db, not args.no_cache, api_key, args.precision, args.draft_model)
+
+    print(f"{len(paths)} archivos, proveedor {args.provider}, método {method_label(METHODS[args.method], provider)}")
+    start = time.perf_counter()
+    stats = run(paths, provider, database, args.output_dir, METHODS[args.method], args.provider,
+                args.focus, args.language, args.force, args.prefetch, not args.no_cache)
+    print_report(stats, time.perf_counter() - start)
+    database.close()
+    return 1 if stats["failed"] else 0
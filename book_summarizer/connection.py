@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Ajustes aplicados a cada conexión nueva. WAL permite que las lecturas de
+# otras sesiones no bloqueen (ni esperen) a la que está guardando.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",       # seguro con WAL; sólo se sincroniza en los checkpoints
+    "cache_size": -16000,          # ~16 MB de caché de páginas por conexión
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,          # esperar al escritor en vez de fallar con "database is locked"
+}
+
+# Sentencias preparadas que sqlite3 reutiliza por conexión
+CACHED_STATEMENTS = 256
+
+Migration = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+
+class ConnectionManager:
+    """
+    Conexiones SQLite persistentes, una por hilo.
+
+    Streamlit ejecuta cada sesión en su propio hilo; cada hilo reutiliza su
+    conexión (y las sentencias ya preparadas) en vez de abrir una por consulta.
+    Streamlit también usa un hilo nuevo en cada rerun: al abrir una conexión
+    se cierran las de los hilos que ya terminaron, para que no se acumulen.
+    """
+
+    def __init__(self, db_path: str, functions: Dict[str, Callable] = None, pragmas: Dict = None):
+        self.db_path = db_path
+        self.functions = functions or {}
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+
+    def connection(self) -> sqlite3.Connection:
+        """Devuelve la conexión del hilo actual, abriéndola si hace falta."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._close_dead_threads()
+                self._connections[threading.current_thread()] = conn
+        return conn
+
+    def open_connections(self) -> int:
+        """Conexiones abiertas por este gestor (una por hilo vivo, más las aún no recogidas)."""
+        with self._lock:
+            return len(self._connections)
+
+    def _close_dead_threads(self):
+        # Llamado con self._lock: nadie más usa ya la conexión de un hilo terminado
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+
+    def _open(self, isolation_level: Optional[str] = "") -> sqlite3.Connection:
+        # check_same_thread=False sólo para poder cerrarlas desde close_all()
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas["busy_timeout"] / 1000,
+            isolation_level=isolation_level,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        for name, fn in self.functions.items():
+            conn.create_function(name, 1, fn, deterministic=True)
+        return conn
+
+    def migrate(self, migrations: List[Migration], optional: Iterable[int] = ()) -> List[int]:
+        """
+        Aplica, en orden, las migraciones que aún no figuran en `schema_migrations`.
+
+        Cada migración corre en su propia transacción (BEGIN IMMEDIATE), de
+        modo que dos procesos arrancando a la vez no la aplican dos veces.
+        Si falla una de las versiones `optional` (p. ej. el índice FTS5 cuando
+        SQLite no incluye el módulo) con OperationalError, se deja pendiente y
+        se reintenta en el próximo arranque; cualquier otro fallo se propaga
+        para no seguir con el esquema a medias. Devuelve las versiones aplicadas.
+        """
+        conn = self._open(isolation_level=None)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+            for version, name, migration in sorted(migrations, key=lambda m: m[0]):
+                if version in applied:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Otro proceso pudo aplicarla mientras esperábamos el bloqueo
+                    if not conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                        migration(conn)
+                        conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name))
+                    conn.execute("COMMIT")
+                    applied.add(version)
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    if version not in optional:
+                        raise
+            return sorted(applied)
+        finally:
+            conn.close()
+
+    def close_all(self):
+        """Cierra todas las conexiones abiertas por este gestor."""
+        with self._lock:
+            connections, self._connections = list(self._connections.values()), {}
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+def execute_script(conn: sqlite3.Connection, script: str):
+    """
+    Ejecuta varias sentencias dentro de la transacción actual.
+
+    `executescript` hace COMMIT antes de empezar, lo que rompería la
+    atomicidad de las migraciones; aquí se separan las sentencias (incluidos
+    los triggers con BEGIN ... END) con `sqlite3.complete_statement`.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
@@ -1,53 +1,313 @@
 import sqlite3
 import os
+import zlib
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from .connection import ConnectionManager, execute_script
+from .telemetry import METRIC_FIELDS, aggregate
+
+# Columnas ligeras para listados (historial, biblioteca); el texto original y
+# los chunks se cargan aparte, sólo al abrir un resumen.
+LIST_COLUMNS = "s.id, s.timestamp, s.title, s.tags, s.word_count, s.char_count, s.processing_time, s.method, s.created_at"
+
+# Totales de telemetría guardados en cada fila de `summaries` (ver `telemetry.aggregate`)
+TELEMETRY_COLUMNS = ["model_calls", "prompt_tokens", "generated_tokens", "generation_seconds",
+                     "ttft_seconds", "decode_tokens_per_second", "acceptance_rate"]
+
+# Migración del índice FTS5: es la única que puede fallar (SQLite sin FTS5) sin
+# impedir el arranque; las búsquedas usan entonces LIKE
+FTS_MIGRATION = 4
+
+def compress_text(text: Optional[str]) -> Optional[bytes]:
+    return zlib.compress(text.encode("utf-8"), 6) if text is not None else None
+
+def decompress_text(data: Optional[bytes]) -> Optional[str]:
+    return zlib.decompress(data).decode("utf-8") if data is not None else None
+
 class SummaryDatabase:
     def __init__(self, db_path: str = "summary_history.db"):
         self.db_path = db_path
+        self.fts_enabled = False
+        # La vista de búsqueda y los triggers del índice FTS descomprimen el texto original
+        self.connections = ConnectionManager(db_path, functions={"decompress_text": decompress_text})
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Conexión persistente del hilo actual (ver `ConnectionManager`)."""
+        return self.connections.connection()
+
+    def close(self):
+        """Cierra las conexiones abiertas por esta instancia."""
+        self.connections.close_all()
+
     def init_database(self):
-        """Inicializa la base de datos y crea las tablas necesarias."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS summaries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    original_text TEXT NOT NULL,
-                    summary TEXT NOT NULL,
-                    word_count INTEGER,
-                    char_count INTEGER,
-                    processing_time REAL,
-                    method TEXT DEFAULT 'unknown',
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Crear índices para búsquedas rápidas
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON summaries(timestamp)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_method ON summaries(method)")
-            
-            # Intentar añadir columna chunks_data si no existe (migración simple)
-            try:
-                conn.execute("ALTER TABLE summaries ADD COLUMN chunks_data TEXT")
-            except sqlite3.OperationalError:
-                pass
-            
-            # Intentar añadir columna title si no existe
-            try:
-                conn.execute("ALTER TABLE summaries ADD COLUMN title TEXT")
-            except sqlite3.OperationalError:
-                pass
-            
-            # Intentar añadir columna tags si no existe
-            try:
-                conn.execute("ALTER TABLE summaries ADD COLUMN tags TEXT")
-            except sqlite3.OperationalError:
-                pass
-                
-            conn.commit()
+        """Aplica las migraciones pendientes del esquema."""
+        applied = self.connections.migrate([
+            (1, "summaries", self._migration_summaries),
+            (2, "checkpoints", self._migration_checkpoints),
+            (3, "tags", self._migration_tags),
+            (FTS_MIGRATION, "fts", self._migration_fts),
+            (5, "sources", self._migration_sources),
+            (6, "metrics", self._migration_metrics),
+            (7, "draft_metrics", self._migration_draft_metrics),
+            (8, "source_index", self._migration_source_index),
+        ], optional=[FTS_MIGRATION])
+        self.fts_enabled = FTS_MIGRATION in applied
+
+    def _migration_summaries(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                word_count INTEGER,
+                char_count INTEGER,
+                processing_time REAL,
+                method TEXT DEFAULT 'unknown',
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                title TEXT,
+                tags TEXT
+            )
+        """)
+        
+        # Bases creadas antes de que existieran las columnas title y tags
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(summaries)")]
+        for column in ("title", "tags"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE summaries ADD COLUMN {column} TEXT")
+        
+        # Texto original y chunks, comprimidos y fuera de la fila del resumen
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS summary_documents (
+                summary_id INTEGER PRIMARY KEY,
+                original_text BLOB NOT NULL,
+                chunks_data BLOB
+            )
+        """)
+        self._migrate_documents(conn)
+        
+        execute_script(conn, """
+            CREATE INDEX IF NOT EXISTS idx_timestamp ON summaries(timestamp);
+            CREATE INDEX IF NOT EXISTS idx_method ON summaries(method);
+            CREATE INDEX IF NOT EXISTS idx_created_at ON summaries(created_at);
+            CREATE VIEW IF NOT EXISTS summaries_search AS
+                SELECT s.id, s.title, s.summary, s.tags, decompress_text(d.original_text) AS original_text
+                FROM summaries s LEFT JOIN summary_documents d ON d.summary_id = s.id;
+            CREATE TRIGGER IF NOT EXISTS summary_documents_delete AFTER DELETE ON summaries BEGIN
+                DELETE FROM summary_documents WHERE summary_id = old.id;
+            END;
+        """)
+
+    def _migration_checkpoints(self, conn: sqlite3.Connection):
+        # Checkpoints de resúmenes iterativos en curso, para poder reanudarlos
+        execute_script(conn, """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job_key TEXT PRIMARY KEY,
+                total_chunks INTEGER NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint_chunks (
+                job_key TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                text_preview TEXT,
+                summary TEXT NOT NULL,
+                context TEXT,
+                PRIMARY KEY (job_key, chunk_index)
+            );
+        """)
+
+    def _migrate_documents(self, conn: sqlite3.Connection):
+        """
+        Mueve `original_text` y `chunks_data` de bases antiguas a `summary_documents`.
+
+        SQLite no permite quitar columnas NOT NULL de forma portable, así que
+        la tabla `summaries` se recrea sin ellas.
+        """
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(summaries)")]
+        if "original_text" not in columns:
+            return
+        
+        # El índice FTS y sus triggers apuntaban a las columnas antiguas
+        execute_script(conn, """
+            DROP TRIGGER IF EXISTS summaries_fts_insert;
+            DROP TRIGGER IF EXISTS summaries_fts_delete;
+            DROP TRIGGER IF EXISTS summaries_fts_update;
+            DROP TABLE IF EXISTS summaries_fts;
+        """)
+        chunks_column = "chunks_data" if "chunks_data" in columns else "NULL"
+        rows = conn.execute(f"SELECT id, original_text, {chunks_column} FROM summaries").fetchall()
+        conn.executemany(
+            "INSERT OR REPLACE INTO summary_documents (summary_id, original_text, chunks_data) VALUES (?, ?, ?)",
+            [(summary_id, compress_text(original_text), compress_text(chunks_data))
+             for summary_id, original_text, chunks_data in rows]
+        )
+        
+        kept_columns = ", ".join(c for c in ("id", "timestamp", "summary", "word_count", "char_count",
+                                             "processing_time", "method", "created_at", "title", "tags")
+                                 if c in columns)
+        execute_script(conn, f"""
+            CREATE TABLE summaries_migrated (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                word_count INTEGER,
+                char_count INTEGER,
+                processing_time REAL,
+                method TEXT DEFAULT 'unknown',
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                title TEXT,
+                tags TEXT
+            );
+            INSERT INTO summaries_migrated ({kept_columns}) SELECT {kept_columns} FROM summaries;
+            DROP TABLE summaries;
+            ALTER TABLE summaries_migrated RENAME TO summaries;
+        """)
+
+    def _migration_tags(self, conn: sqlite3.Connection):
+        """
+        Crea las tablas normalizadas de etiquetas.
+
+        La columna `summaries.tags` se conserva como texto para mostrar y buscar;
+        los filtros y recuentos se resuelven con `tags`/`summary_tags`.
+        """
+        execute_script(conn, """
+            CREATE TABLE IF NOT EXISTS tags (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE COLLATE NOCASE
+            );
+            CREATE TABLE IF NOT EXISTS summary_tags (
+                summary_id INTEGER NOT NULL,
+                tag_id INTEGER NOT NULL,
+                PRIMARY KEY (summary_id, tag_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_summary_tags_tag ON summary_tags(tag_id, summary_id);
+            CREATE TRIGGER IF NOT EXISTS summary_tags_delete AFTER DELETE ON summaries BEGIN
+                DELETE FROM summary_tags WHERE summary_id = old.id;
+            END;
+        """)
+        # Migrar las etiquetas guardadas como texto separado por comas
+        rows = conn.execute("SELECT id, tags FROM summaries WHERE tags IS NOT NULL AND tags != ''").fetchall()
+        for summary_id, tags in rows:
+            self._set_tags(conn, summary_id, tags)
+
+    @staticmethod
+    def _split_tags(tags: str) -> List[str]:
+        unique = {}
+        for tag in (tags or "").split(','):
+            tag = tag.strip()
+            if tag and tag.lower() not in unique:
+                unique[tag.lower()] = tag
+        return list(unique.values())
+
+    def _set_tags(self, conn: sqlite3.Connection, summary_id: int, tags: str):
+        names = self._split_tags(tags)
+        conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(name,) for name in names])
+        conn.executemany("""
+            INSERT OR IGNORE INTO summary_tags (summary_id, tag_id)
+            SELECT ?, id FROM tags WHERE name = ?
+        """, [(summary_id, name) for name in names])
+
+    def _migration_fts(self, conn: sqlite3.Connection):
+        """
+        Crea el índice FTS5 sobre los resúmenes y los triggers que lo sincronizan.
+
+        El índice lee su contenido de la vista `summaries_search`, que
+        descomprime el texto original, así que no guarda una segunda copia.
+        Si SQLite no incluye FTS5 la migración falla, queda pendiente y las
+        búsquedas usan LIKE.
+        """
+        execute_script(conn, """
+            CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+                title, summary, tags, original_text,
+                content='summaries_search', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+            -- save_summary inserta primero el resumen y después su documento
+            CREATE TRIGGER IF NOT EXISTS summaries_fts_insert AFTER INSERT ON summary_documents BEGIN
+                INSERT INTO summaries_fts (rowid, title, summary, tags, original_text)
+                SELECT s.id, s.title, s.summary, s.tags, decompress_text(new.original_text)
+                FROM summaries s WHERE s.id = new.summary_id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS summaries_fts_delete BEFORE DELETE ON summaries BEGIN
+                INSERT INTO summaries_fts (summaries_fts, rowid, title, summary, tags, original_text)
+                SELECT 'delete', v.id, v.title, v.summary, v.tags, v.original_text
+                FROM summaries_search v WHERE v.id = old.id;
+            END;
+            CREATE TRIGGER IF NOT EXISTS summaries_fts_update AFTER UPDATE OF title, summary, tags ON summaries BEGIN
+                INSERT INTO summaries_fts (summaries_fts, rowid, title, summary, tags, original_text)
+                SELECT 'delete', old.id, old.title, old.summary, old.tags, v.original_text
+                FROM summaries_search v WHERE v.id = old.id;
+                INSERT INTO summaries_fts (rowid, title, summary, tags, original_text)
+                SELECT v.id, v.title, v.summary, v.tags, v.original_text
+                FROM summaries_search v WHERE v.id = new.id;
+            END;
+            -- Ranking por defecto: bm25 con más peso para título y etiquetas
+            INSERT INTO summaries_fts (summaries_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 5.0, 1.0)');
+            -- Indexar los resúmenes guardados antes de que existiera el índice
+            INSERT INTO summaries_fts (summaries_fts) VALUES ('rebuild');
+        """)
+
+    def _migration_sources(self, conn: sqlite3.Connection):
+        """Archivo de origen y hash de su contenido, para no volver a resumir el mismo documento."""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(summaries)")]
+        for column in ("source_name", "document_hash"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE summaries ADD COLUMN {column} TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_document_hash ON summaries(document_hash, method)")
+
+    def _migration_metrics(self, conn: sqlite3.Connection):
+        """Métricas de cada llamada al modelo y sus totales por resumen."""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(summaries)")]
+        for column in TELEMETRY_COLUMNS:
+            if column not in columns:
+                kind = "INTEGER" if column in ("model_calls", "prompt_tokens", "generated_tokens") else "REAL"
+                conn.execute(f"ALTER TABLE summaries ADD COLUMN {column} {kind}")
+        execute_script(conn, """
+            CREATE TABLE IF NOT EXISTS summary_metrics (
+                summary_id INTEGER NOT NULL,
+                call_index INTEGER NOT NULL,
+                stage TEXT,
+                chunk_number INTEGER,
+                prompt_tokens INTEGER,
+                generated_tokens INTEGER,
+                tokenize_seconds REAL,
+                ttft_seconds REAL,
+                decode_tokens_per_second REAL,
+                wall_seconds REAL NOT NULL,
+                batch_size INTEGER DEFAULT 1,
+                cached INTEGER DEFAULT 0,
+                PRIMARY KEY (summary_id, call_index)
+            );
+            CREATE TRIGGER IF NOT EXISTS summary_metrics_delete AFTER DELETE ON summaries BEGIN
+                DELETE FROM summary_metrics WHERE summary_id = old.id;
+            END;
+        """)
+
+    def _migration_draft_metrics(self, conn: sqlite3.Connection):
+        """Tokens propuestos y aceptados del modelo de borrador (decodificación asistida)."""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(summary_metrics)")]
+        for column, kind in (("draft_tokens", "INTEGER"), ("accepted_tokens", "INTEGER"), ("acceptance_rate", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE summary_metrics ADD COLUMN {column} {kind}")
+        if "acceptance_rate" not in [row[1] for row in conn.execute("PRAGMA table_info(summaries)")]:
+            conn.execute("ALTER TABLE summaries ADD COLUMN acceptance_rate REAL")
+
+    def _migration_source_index(self, conn: sqlite3.Connection):
+        """Versiones anteriores de un archivo (resumen incremental de documentos editados)."""
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_source_name ON summaries(source_name, method)")
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """
+        Convierte la búsqueda del usuario en una consulta MATCH.
+
+        Cada término se busca como prefijo (para buscar mientras se escribe) y
+        todos deben aparecer, igual que en la búsqueda con LIKE.
+        """
+        terms = query.strip().split()
+        return " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
     
     def save_summary(self, 
                     original_text: str, 
@@ -58,28 +318,66 @@ class SummaryDatabase:
                     method: str = 'unknown',
                     chunks_data: str = None,
                     title: str = None,
-                    tags: str = None) -> int:
-        """Guarda un resumen en la base de datos."""
+                    tags: str = None,
+                    source_name: str = None,
+                    document_hash: str = None,
+                    metrics: List[Dict] = None) -> int:
+        """
+        Guarda un resumen en la base de datos.
+
+        `document_hash` es el hash del archivo de origen (ver
+        `document_cache.document_key`) y permite saber si ya se resumió.
+        `metrics` son las llamadas al modelo registradas por `telemetry`: se
+        guardan una a una y sus totales en la fila del resumen.
+        """
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # Si no hay título, usar timestamp como fallback
         if not title:
             title = f"Resumen {timestamp}"
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("""
                 INSERT INTO summaries 
-                (timestamp, original_text, summary, word_count, char_count, processing_time, method, chunks_data, title, tags)
+                (timestamp, summary, word_count, char_count, processing_time, method, title, tags, source_name, document_hash)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (timestamp, original_text, summary, word_count, char_count, processing_time, method, chunks_data, title, tags))
-            return cursor.lastrowid
+            """, (timestamp, summary, word_count, char_count, processing_time, method, title, tags, source_name, document_hash))
+            summary_id = cursor.lastrowid
+            conn.execute(
+                "INSERT INTO summary_documents (summary_id, original_text, chunks_data) VALUES (?, ?, ?)",
+                (summary_id, compress_text(original_text), compress_text(chunks_data))
+            )
+            self._set_tags(conn, summary_id, tags)
+            if metrics:
+                self._save_metrics(conn, summary_id, metrics)
+            return summary_id
+
+    def _save_metrics(self, conn: sqlite3.Connection, summary_id: int, metrics: List[Dict]):
+        fields = ["stage", "chunk_number"] + METRIC_FIELDS
+        conn.executemany(
+            f"INSERT INTO summary_metrics (summary_id, call_index, {', '.join(fields)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(fields))})",
+            [(summary_id, index, *(call.get(field) for field in fields)) for index, call in enumerate(metrics)]
+        )
+        totals = aggregate(metrics)
+        conn.execute(
+            f"UPDATE summaries SET {', '.join(f'{column} = ?' for column in TELEMETRY_COLUMNS)} WHERE id = ?",
+            [totals[column] for column in TELEMETRY_COLUMNS] + [summary_id]
+        )
+
+    def get_summary_metrics(self, summary_id: int) -> List[Dict]:
+        """Llamadas al modelo de un resumen, en el orden en que se hicieron."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM summary_metrics WHERE summary_id = ? ORDER BY call_index", (summary_id,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
     
     def get_recent_summaries(self, limit: int = 10) -> List[Dict]:
-        """Obtiene los resúmenes más recientes."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("""
-                SELECT * FROM summaries 
+        """Obtiene los resúmenes más recientes (sin texto original ni chunks)."""
+        with self._connect() as conn:
+            cursor = conn.execute(f"""
+                SELECT {LIST_COLUMNS} FROM summaries s
                 ORDER BY created_at DESC 
                 LIMIT ?
             """, (limit,))
@@ -93,46 +391,112 @@ class SummaryDatabase:
         terms = query.strip().split()
         if not terms:
             return []
+        
+        if self.fts_enabled:
+            return self._search_fts(query, limit=limit)
             
         conditions = []
         params = []
         
         for term in terms:
             # Cada término debe estar presente en al menos uno de los campos
-            conditions.append("(title LIKE ? OR original_text LIKE ? OR summary LIKE ? OR tags LIKE ?)")
+            conditions.append("(v.title LIKE ? OR v.original_text LIKE ? OR v.summary LIKE ? OR v.tags LIKE ?)")
             like_term = f"%{term}%"
             params.extend([like_term, like_term, like_term, like_term])
             
         where_clause = " AND ".join(conditions)
         params.append(limit)
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             cursor = conn.execute(f"""
-                SELECT * FROM summaries 
+                SELECT {LIST_COLUMNS} FROM summaries s
+                JOIN summaries_search v ON v.id = s.id
                 WHERE {where_clause}
-                ORDER BY created_at DESC 
+                ORDER BY s.created_at DESC 
                 LIMIT ?
             """, params)
             return [dict(row) for row in cursor.fetchall()]
     
+    def _search_fts(self, query: str, conditions: List[str] = None, params: List = None, limit: int = 20) -> List[Dict]:
+        """
+        Búsqueda ordenada por relevancia (bm25) en el índice FTS5.
+
+        Cada resultado incluye un 'snippet' con los términos resaltados en Markdown.
+        """
+        where_clause = " AND ".join(["summaries_fts MATCH ?"] + (conditions or []))
+        fts_query = self._fts_query(query)
+        with self._connect() as conn:
+            # Primero se eligen los mejores ids y sólo para ellos se calcula el snippet,
+            # que tiene que volver a leer y tokenizar el texto de cada fila
+            cursor = conn.execute(f"""
+                SELECT {LIST_COLUMNS}, snippet(summaries_fts, -1, '**', '**', '…', 16) AS snippet
+                FROM summaries_fts
+                JOIN summaries s ON s.id = summaries_fts.rowid
+                WHERE summaries_fts MATCH ? AND summaries_fts.rowid IN (
+                    SELECT summaries_fts.rowid FROM summaries_fts
+                    JOIN summaries s ON s.id = summaries_fts.rowid
+                    WHERE {where_clause}
+                    ORDER BY summaries_fts.rank
+                    LIMIT ?
+                )
+                ORDER BY summaries_fts.rank
+            """, [fts_query, fts_query] + (params or []) + [limit])
+            return [dict(row) for row in cursor.fetchall()]
+
     def get_summary_by_id(self, summary_id: int) -> Optional[Dict]:
-        """Obtiene un resumen específico por ID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("SELECT * FROM summaries WHERE id = ?", (summary_id,))
+        """Obtiene un resumen completo por ID, incluidos el texto original y los chunks."""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT s.*, d.original_text, d.chunks_data FROM summaries s
+                LEFT JOIN summary_documents d ON d.summary_id = s.id
+                WHERE s.id = ?
+            """, (summary_id,))
             row = cursor.fetchone()
+            return self._with_documents(row) if row else None
+
+    def find_by_document_hash(self, document_hash: str, method: str = None) -> Optional[Dict]:
+        """Resumen más reciente de un documento (opcionalmente, con un método dado), sin el texto."""
+        query = f"SELECT {LIST_COLUMNS}, s.source_name, s.document_hash FROM summaries s WHERE s.document_hash = ?"
+        params = [document_hash]
+        if method:
+            query += " AND s.method = ?"
+            params.append(method)
+        query += " ORDER BY s.id DESC LIMIT 1"
+        with self._connect() as conn:
+            row = conn.execute(query, params).fetchone()
             return dict(row) if row else None
+
+    def find_previous_version(self, source_name: str, method: str) -> Optional[Dict]:
+        """
+        Resumen completo más reciente de un archivo con el mismo método y con
+        chunks guardados, para reutilizarlos si el archivo se editó
+        (ver `incremental.previous_document`).
+        """
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT s.*, d.original_text, d.chunks_data FROM summaries s
+                JOIN summary_documents d ON d.summary_id = s.id
+                WHERE s.source_name = ? AND s.method = ? AND d.chunks_data IS NOT NULL
+                ORDER BY s.id DESC LIMIT 1
+            """, (source_name, method)).fetchone()
+            return self._with_documents(row) if row else None
+
+    @staticmethod
+    def _with_documents(row: sqlite3.Row) -> Dict:
+        item = dict(row)
+        item['original_text'] = decompress_text(item['original_text']) or ""
+        item['chunks_data'] = decompress_text(item['chunks_data'])
+        return item
     
     def delete_summary(self, summary_id: int) -> bool:
         """Elimina un resumen por ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("DELETE FROM summaries WHERE id = ?", (summary_id,))
             return cursor.rowcount > 0
     
     def get_statistics(self) -> Dict:
         """Obtiene estadísticas generales del historial."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("""
                 SELECT 
                     COUNT(*) as total_summaries,
@@ -151,9 +515,57 @@ class SummaryDatabase:
                 'latest_summary': row[4]
             }
     
+    def get_telemetry_statistics(self, slowest: int = 5) -> Dict:
+        """
+        Telemetría de todo el historial: totales, tiempo y tokens por etapa y
+        los resúmenes que más tiempo de modelo necesitaron.
+        """
+        with self._connect() as conn:
+            totals = dict(conn.execute("""
+                SELECT
+                    COUNT(DISTINCT summary_id) AS measured_summaries,
+                    COUNT(*) AS model_calls,
+                    SUM(cached) AS cached_calls,
+                    SUM(prompt_tokens) AS prompt_tokens,
+                    SUM(generated_tokens) AS generated_tokens,
+                    SUM(wall_seconds) AS generation_seconds,
+                    AVG(CASE WHEN cached = 0 THEN ttft_seconds END) AS ttft_seconds,
+                    -- Ponderado por tokens: tokens decodificados / segundos de decodificación
+                    SUM(CASE WHEN decode_tokens_per_second > 0 THEN generated_tokens - batch_size END)
+                        / SUM(CASE WHEN decode_tokens_per_second > 0
+                              THEN (generated_tokens - batch_size) / decode_tokens_per_second END)
+                        AS decode_tokens_per_second,
+                    SUM(accepted_tokens) * 1.0 / SUM(draft_tokens) AS acceptance_rate
+                FROM summary_metrics
+            """).fetchone())
+            # "reduce 1", "reduce 2"... se agrupan como "reduce"
+            stages = [dict(row) for row in conn.execute("""
+                SELECT
+                    CASE WHEN stage LIKE 'reduce %' THEN 'reduce' ELSE COALESCE(stage, 'other') END AS stage,
+                    COUNT(*) AS calls,
+                    SUM(prompt_tokens) AS prompt_tokens,
+                    SUM(generated_tokens) AS generated_tokens,
+                    SUM(wall_seconds) AS seconds,
+                    AVG(CASE WHEN cached = 0 THEN ttft_seconds END) AS ttft_seconds,
+                    SUM(accepted_tokens) * 1.0 / SUM(draft_tokens) AS acceptance_rate
+                FROM summary_metrics
+                GROUP BY 1
+                ORDER BY seconds DESC
+            """)]
+            slowest_rows = [dict(row) for row in conn.execute(f"""
+                SELECT {LIST_COLUMNS}, {', '.join('s.' + column for column in TELEMETRY_COLUMNS)}
+                FROM summaries s
+                WHERE s.generation_seconds IS NOT NULL
+                ORDER BY s.generation_seconds DESC
+                LIMIT ?
+            """, (slowest,))]
+        totals["stages"] = stages
+        totals["slowest"] = slowest_rows
+        return totals
+
     def cleanup_old_summaries(self, keep_last: int = 100):
         """Mantiene solo los últimos N resúmenes."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 DELETE FROM summaries 
                 WHERE id NOT IN (
@@ -166,16 +578,20 @@ class SummaryDatabase:
     
     def get_all_tags(self) -> List[str]:
         """Obtiene todas las etiquetas únicas usadas en los resúmenes."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT tags FROM summaries WHERE tags IS NOT NULL AND tags != ''")
-            all_tags = set()
-            for row in cursor:
-                tags_str = row[0]
-                if tags_str:
-                    # Separar por comas y limpiar espacios
-                    tags = [t.strip() for t in tags_str.split(',')]
-                    all_tags.update(tags)
-            return sorted(list(all_tags))
+        return list(self.get_tag_counts())
+
+    def get_tag_counts(self) -> Dict[str, int]:
+        """Número de resúmenes por etiqueta, en orden alfabético."""
+        with self._connect() as conn:
+            # Agrupa sobre el índice (tag_id, summary_id) sin leer las filas de summaries
+            cursor = conn.execute("""
+                SELECT t.name, counts.total FROM (
+                    SELECT tag_id, COUNT(*) AS total FROM summary_tags GROUP BY tag_id
+                ) counts
+                JOIN tags t ON t.id = counts.tag_id
+                ORDER BY t.name
+            """)
+            return dict(cursor.fetchall())
 
     def filter_summaries(self, query: str = None, tags: List[str] = None, limit: int = 50) -> List[Dict]:
         """
@@ -183,30 +599,40 @@ class SummaryDatabase:
         """
         conditions = []
         params = []
+        use_fts = self.fts_enabled and query and query.strip()
         
         # Filtro de texto
-        if query:
+        if query and not use_fts:
             terms = query.strip().split()
             for term in terms:
-                conditions.append("(title LIKE ? OR original_text LIKE ? OR summary LIKE ? OR tags LIKE ?)")
+                conditions.append("(v.title LIKE ? OR v.original_text LIKE ? OR v.summary LIKE ? OR v.tags LIKE ?)")
                 like_term = f"%{term}%"
                 params.extend([like_term, like_term, like_term, like_term])
         
         # Filtro de etiquetas (AND logic: debe tener TODAS las etiquetas seleccionadas)
         if tags:
             for tag in tags:
-                conditions.append("tags LIKE ?")
-                params.append(f"%{tag}%")
+                conditions.append("""s.id IN (
+                    SELECT st.summary_id FROM summary_tags st
+                    JOIN tags t ON t.id = st.tag_id
+                    WHERE t.name = ?
+                )""")
+                params.append(tag.strip())
+        
+        if use_fts:
+            return self._search_fts(query, conditions, params, limit=limit)
         
         where_clause = " AND ".join(conditions) if conditions else "1=1"
         params.append(limit)
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        # La vista (que descomprime el texto) sólo se une si se busca texto con LIKE
+        join = "JOIN summaries_search v ON v.id = s.id" if query and not use_fts else ""
+        with self._connect() as conn:
             cursor = conn.execute(f"""
-                SELECT * FROM summaries 
+                SELECT {LIST_COLUMNS} FROM summaries s
+                {join}
                 WHERE {where_clause}
-                ORDER BY created_at DESC 
+                ORDER BY s.created_at DESC 
                 LIMIT ?
             """, params)
             return [dict(row) for row in cursor.fetchall()]
@@ -215,9 +641,12 @@ class SummaryDatabase:
         """Exporta todos los resúmenes a un archivo CSV."""
         import csv
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("SELECT * FROM summaries ORDER BY created_at DESC")
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT s.*, d.original_text, d.chunks_data FROM summaries s
+                LEFT JOIN summary_documents d ON d.summary_id = s.id
+                ORDER BY s.created_at DESC
+            """)
             
             with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
                 if cursor.description:
@@ -225,4 +654,50 @@ class SummaryDatabase:
                     writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                     writer.writeheader()
                     for row in cursor:
-                        writer.writerow(dict(row))
\ No newline at end of file
+                        writer.writerow(self._with_documents(row))
+
+    def start_checkpoint(self, job_key: str, total_chunks: int):
+        """Registra un resumen iterativo en curso (no hace nada si ya existe)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO checkpoints (job_key, total_chunks) VALUES (?, ?)",
+                (job_key, total_chunks)
+            )
+
+    def save_checkpoint_chunk(self, job_key: str, chunk_index: int, summary: str, context: str = None, text_preview: str = None):
+        """Guarda el resumen de un chunk terminado y el contexto acumulado tras él."""
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO checkpoint_chunks (job_key, chunk_index, text_preview, summary, context)
+                VALUES (?, ?, ?, ?, ?)
+            """, (job_key, chunk_index, text_preview, summary, context))
+            conn.execute(
+                "UPDATE checkpoints SET updated_at = CURRENT_TIMESTAMP WHERE job_key = ?",
+                (job_key,)
+            )
+
+    def get_checkpoint_chunks(self, job_key: str) -> List[Dict]:
+        """
+        Devuelve los chunks ya terminados de un resumen en curso.
+
+        Sólo incluye el tramo continuo desde el primer chunk, que es lo que
+        se puede reutilizar al reanudar.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT chunk_index, text_preview, summary, context FROM checkpoint_chunks
+                WHERE job_key = ?
+                ORDER BY chunk_index
+            """, (job_key,))
+            chunks = []
+            for row in cursor:
+                if row['chunk_index'] != len(chunks):
+                    break
+                chunks.append(dict(row))
+            return chunks
+
+    def finish_checkpoint(self, job_key: str):
+        """Elimina el checkpoint de un resumen que ya terminó."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM checkpoint_chunks WHERE job_key = ?", (job_key,))
+            conn.execute("DELETE FROM checkpoints WHERE job_key = ?", (job_key,))
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from .text_splitter import TokenTextSplitter, estimate_tokens
+
+
+def document_key(data: bytes, extension: str = "") -> str:
+    """Hash del contenido subido; el mismo archivo con otro nombre reutiliza la entrada."""
+    return hashlib.sha256(extension.lower().encode("utf-8") + b"\0" + data).hexdigest()
+
+
+def text_stats(text: str) -> Dict:
+    return {
+        "words": len(text.split()),
+        "chars": len(text),
+        "lines": text.count("\n") + 1,
+        "tokens": estimate_tokens(text),
+    }
+
+
+class DocumentCache:
+    """
+    Caché de documentos ya extraídos, por hash del archivo subido.
+
+    Guarda el texto, sus estadísticas y, opcionalmente, sus chunks. Las
+    entradas viven en memoria hasta `max_memory_bytes` (LRU); las que no
+    caben, y los libros más grandes que `spill_bytes`, se guardan
+    comprimidos en `spill_dir` y se vuelven a leer al pedirlos.
+    """
+
+    def __init__(self,
+                 max_memory_bytes: int = 256 * 1024 * 1024,
+                 spill_dir: Optional[str] = None,
+                 spill_bytes: int = 32 * 1024 * 1024,
+                 max_disk_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def get_or_extract(self, data: bytes, extension: str, extractor: Callable[[], str]) -> Dict:
+        """
+        Devuelve {'key', 'text', 'stats'} del documento, extrayéndolo sólo la primera vez.
+
+        `extractor` se llama sin argumentos y debe devolver el texto completo.
+        """
+        key = document_key(data, extension)
+        entry = self.get(key)
+        if entry is None:
+            entry = self.put(key, extractor())
+        return entry
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._public(key, entry)
+        entry = self._load_spilled(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, entry)
+            return self._public(key, entry)
+
+    def put(self, key: str, text: str) -> Dict:
+        entry = {"text": text, "stats": text_stats(text), "chunks": {}}
+        with self._lock:
+            self._store(key, entry)
+            return self._public(key, entry)
+
+    def get_chunks(self, key: str, splitter: TokenTextSplitter) -> Optional[List[str]]:
+        """Chunks del documento para la configuración de `splitter` (calculados una vez)."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        tokenizer = getattr(splitter.tokenizer, "name_or_path", None)
+        chunk_key = json.dumps([splitter.max_tokens, splitter.overlap_tokens, tokenizer])
+        with self._lock:
+            cached = self._entries.get(key, {}).get("chunks", {}).get(chunk_key)
+        if cached is not None:
+            return cached
+        chunks = splitter.split_text(entry["text"])
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                stored["chunks"][chunk_key] = chunks
+                self._resize(key, stored)
+        return chunks
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": sum(size for _, size, _ in self._spilled_files()),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            for path, _, _ in self._spilled_files():
+                os.unlink(path)
+
+    @staticmethod
+    def _public(key: str, entry: Dict) -> Dict:
+        return {"key": key, "text": entry["text"], "stats": entry["stats"]}
+
+    @staticmethod
+    def _size(entry: Dict) -> int:
+        # Tamaño real de los str en memoria (1, 2 o 4 bytes por carácter)
+        size = sys.getsizeof(entry["text"])
+        for chunks in entry["chunks"].values():
+            size += sum(sys.getsizeof(chunk) for chunk in chunks)
+        return size
+
+    def _store(self, key: str, entry: Dict):
+        size = self._size(entry)
+        if self.spill_dir and (size > self.spill_bytes or size > self.max_memory_bytes):
+            # Libros enormes: directamente a disco, sin desalojar media caché
+            self._spill(key, entry)
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old["size"]
+        entry["size"] = size
+        self._entries[key] = entry
+        self._memory_bytes += size
+        self._evict()
+
+    def _resize(self, key: str, entry: Dict):
+        size = self._size(entry)
+        self._memory_bytes += size - entry["size"]
+        entry["size"] = size
+        self._evict(keep=key)
+
+    def _evict(self, keep: str = None):
+        while self._memory_bytes > self.max_memory_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            entry = self._entries.pop(key)
+            self._memory_bytes -= entry["size"]
+            if self.spill_dir:
+                self._spill(key, entry)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.json.z")
+
+    def _spill(self, key: str, entry: Dict):
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            # La clave es el hash del contenido: el archivo ya guardado es idéntico
+            os.utime(path)
+            return
+        # Los chunks no se guardan: se recalculan si vuelven a hacer falta
+        payload = json.dumps({"text": entry["text"], "stats": entry["stats"]}, ensure_ascii=False)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(payload.encode("utf-8"), 1))
+        os.replace(tmp_path, path)
+        self._trim_disk()
+
+    def _load_spilled(self, key: str) -> Optional[Dict]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            os.utime(path)
+        except (OSError, ValueError, zlib.error):
+            return None
+        return {"text": payload["text"], "stats": payload["stats"], "chunks": {}}
+
+    def _spilled_files(self):
+        if not self.spill_dir:
+            return []
+        files = []
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(".json.z"):
+                path = os.path.join(self.spill_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, st.st_size, st.st_mtime))
+        return files
+
+    def _trim_disk(self):
+        files = sorted(self._spilled_files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.max_disk_bytes:
+                break
+            os.unlink(path)
+            total -= size
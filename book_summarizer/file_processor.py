@@ -1,40 +1,294 @@
-import pypdf
-import docx
-import ebooklib
-from ebooklib import epub
-from bs4 import BeautifulSoup
-from typing import IO
+import codecs
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import io
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from urllib.parse import unquote
+from typing import IO, Dict, Iterator, List, Optional
 import tempfile
 import os
 
-def get_text_from_txt(file: IO[bytes]) -> str:
-    return file.read().decode("utf-8", errors="ignore")
+# Tamaño de los bloques leídos de un TXT
+TXT_BLOCK_SIZE = 1024 * 1024
+
+# Por debajo de estas páginas arrancar procesos cuesta más de lo que se gana
+PARALLEL_PDF_MIN_PAGES = 64
+MAX_PDF_WORKERS = 8
+
+# PdfReader de cada proceso del pool, abierto una sola vez por _init_pdf_worker
+_worker_reader = None
+
+# pypdf, python-docx, lxml y BeautifulSoup se importan dentro de cada extractor:
+# quien no sube ese formato (o sólo consulta el historial) no paga su carga
+_lxml_html = None
+
+_EPUB_NS = {
+    "container": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf",
+    "ncx": "http://www.daisy.org/z3986/2005/ncx/",
+    "xhtml": "http://www.w3.org/1999/xhtml",
+    "epub": "http://www.idpf.org/2007/ops",
+}
+_HTML_MEDIA_TYPES = {"application/xhtml+xml", "text/html"}
+# Elementos cuyo texto no forma parte del contenido
+_SKIPPED_TAGS = {"script", "style", "head", "title"}
+# Elementos de bloque tras los que se deja una línea en blanco, para que el
+# chunker pueda cortar por párrafos
+_BLOCK_TAGS = {"p", "div", "section", "blockquote", "li", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "br"}
+
+def iter_text_from_txt(file: IO[bytes], block_size: int = TXT_BLOCK_SIZE) -> Iterator[str]:
+    # El decodificador incremental no parte caracteres multibyte entre bloques
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    while True:
+        block = file.read(block_size)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def iter_text_from_pdf(file: IO[bytes], workers: Optional[int] = None) -> Iterator[str]:
+    """
+    Extrae el texto página a página, en orden.
+
+    Los PDF grandes se reparten entre `workers` procesos (por defecto uno por
+    núcleo, hasta MAX_PDF_WORKERS); con `workers=1`, pocos núcleos o menos de
+    PARALLEL_PDF_MIN_PAGES páginas se extrae en serie.
+    """
+    import pypdf
 
-def get_text_from_pdf(file: IO[bytes]) -> str:
     pdf_reader = pypdf.PdfReader(file)
-    text = ""
+    num_pages = len(pdf_reader.pages)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, MAX_PDF_WORKERS)
+    if workers > 1 and num_pages >= PARALLEL_PDF_MIN_PAGES:
+        yield from _iter_pdf_pages_parallel(file, num_pages, workers)
+        return
     for page in pdf_reader.pages:
         page_text = page.extract_text()
         if page_text:
-            text += page_text + "\n"
-    return text
-
-def get_text_from_docx(file: IO[bytes]) -> str:
-    doc = docx.Document(file)
-    return "\n".join([para.text for para in doc.paragraphs if para.text])
+            yield page_text + "\n"
 
-def get_text_from_epub(file: IO[bytes]) -> str:
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.epub') as tmp_file:
+def _iter_pdf_pages_parallel(file: IO[bytes], num_pages: int, workers: int) -> Iterator[str]:
+    # Cada proceso abre el PDF desde un archivo temporal en vez de recibir los bytes
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
         tmp_file.write(file.read())
         tmp_path = tmp_file.name
-    
+
+    # Varios rangos por proceso para repartir bien páginas de coste desigual
+    step = max(1, num_pages // (workers * 4))
+    ranges = [(start, min(start + step, num_pages)) for start in range(0, num_pages, step)]
+    done = 0
     try:
-        book = epub.read_epub(tmp_path)
-        text = ""
-        for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
-            soup = BeautifulSoup(item.get_content(), 'html.parser')
-            text += soup.get_text() + "\n"
-        return text
+        # "spawn": hacer fork de un proceso con hilos (Streamlit, torch) no es seguro
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_pdf_worker, initargs=(tmp_path,)) as executor:
+            # map devuelve los resultados en el orden de las páginas
+            for texts in executor.map(_extract_pdf_pages, ranges):
+                for page_text in texts:
+                    if page_text:
+                        yield page_text + "\n"
+                done += 1
+    except (BrokenProcessPool, OSError):
+        # Sin procesos disponibles: seguir en serie desde el primer rango pendiente
+        import pypdf
+
+        pdf_reader = pypdf.PdfReader(tmp_path)
+        first_pending = ranges[done][0] if done < len(ranges) else num_pages
+        for page in pdf_reader.pages[first_pending:]:
+            page_text = page.extract_text()
+            if page_text:
+                yield page_text + "\n"
     finally:
         if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
\ No newline at end of file
+            os.unlink(tmp_path)
+
+def _init_pdf_worker(path: str):
+    global _worker_reader
+    import pypdf
+
+    _worker_reader = pypdf.PdfReader(path)
+
+def _extract_pdf_pages(page_range) -> List[str]:
+    start, end = page_range
+    return [_worker_reader.pages[i].extract_text() for i in range(start, end)]
+
+def iter_text_from_docx(file: IO[bytes]) -> Iterator[str]:
+    import docx
+
+    doc = docx.Document(file)
+    first = True
+    for para in doc.paragraphs:
+        if para.text:
+            yield para.text if first else "\n" + para.text
+            first = False
+
+def get_chapters_from_epub(file: IO[bytes]) -> List[Dict]:
+    """
+    Lee un EPUB directamente de los bytes subidos y devuelve sus capítulos.
+
+    Sigue el orden del spine y toma los títulos del índice (nav de EPUB 3 o
+    NCX de EPUB 2); si un documento no aparece en el índice, usa su primer
+    encabezado. Cada capítulo es un dict con 'title', 'href' y 'text'.
+    """
+    return list(iter_chapters_from_epub(file))
+
+def iter_chapters_from_epub(file: IO[bytes]) -> Iterator[Dict]:
+    data = file.read()
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        opf_path = _epub_rootfile(archive)
+        opf = ET.fromstring(archive.read(opf_path))
+        base = posixpath.dirname(opf_path)
+
+        manifest = {}
+        for item in opf.iterfind("opf:manifest/opf:item", _EPUB_NS):
+            href = posixpath.normpath(posixpath.join(base, unquote(item.get("href", ""))))
+            manifest[item.get("id")] = {
+                "href": href,
+                "media_type": item.get("media-type", ""),
+                "properties": item.get("properties", ""),
+            }
+        spine = opf.find("opf:spine", _EPUB_NS)
+        titles = _epub_toc_titles(archive, manifest, spine)
+
+        for itemref in spine.iterfind("opf:itemref", _EPUB_NS) if spine is not None else []:
+            item = manifest.get(itemref.get("idref"))
+            if not item or item["media_type"] not in _HTML_MEDIA_TYPES or "nav" in item["properties"].split():
+                continue
+            try:
+                content = archive.read(item["href"])
+            except KeyError:
+                continue
+            heading, text = _html_to_text(content)
+            if not text.strip():
+                continue
+            yield {
+                "title": titles.get(item["href"]) or heading or posixpath.basename(item["href"]),
+                "href": item["href"],
+                "text": text,
+            }
+
+def _epub_rootfile(archive: zipfile.ZipFile) -> str:
+    container = ET.fromstring(archive.read("META-INF/container.xml"))
+    rootfile = container.find("container:rootfiles/container:rootfile", _EPUB_NS)
+    return rootfile.get("full-path")
+
+def _epub_toc_titles(archive: zipfile.ZipFile, manifest: Dict, spine) -> Dict[str, str]:
+    """Títulos del índice por documento (sin el #fragmento); gana la primera entrada."""
+    titles = {}
+
+    def add(base: str, href: str, title: str):
+        path = posixpath.normpath(posixpath.join(base, unquote(href.split("#")[0])))
+        title = " ".join(title.split())
+        if title and path not in titles:
+            titles[path] = title
+
+    nav = next((item for item in manifest.values() if "nav" in item["properties"].split()), None)
+    if nav:
+        root = ET.fromstring(archive.read(nav["href"]))
+        base = posixpath.dirname(nav["href"])
+        for toc in root.iter(f"{{{_EPUB_NS['xhtml']}}}nav"):
+            if toc.get(f"{{{_EPUB_NS['epub']}}}type") not in (None, "toc"):
+                continue
+            for link in toc.iter(f"{{{_EPUB_NS['xhtml']}}}a"):
+                add(base, link.get("href", ""), "".join(link.itertext()))
+    elif spine is not None and spine.get("toc") in manifest:
+        ncx_path = manifest[spine.get("toc")]["href"]
+        root = ET.fromstring(archive.read(ncx_path))
+        base = posixpath.dirname(ncx_path)
+        for point in root.iter(f"{{{_EPUB_NS['ncx']}}}navPoint"):
+            label = point.find("ncx:navLabel/ncx:text", _EPUB_NS)
+            content = point.find("ncx:content", _EPUB_NS)
+            if label is not None and content is not None:
+                add(base, content.get("src", ""), label.text or "")
+    return titles
+
+def _lxml():
+    """`lxml.html`, o False si no está instalado (es opcional: sin él se usa el html.parser de BeautifulSoup)."""
+    global _lxml_html
+    if _lxml_html is None:
+        try:
+            from lxml import html
+            _lxml_html = html
+        except ImportError:
+            _lxml_html = False
+    return _lxml_html
+
+def _html_to_text(content: bytes):
+    """Devuelve (primer encabezado, texto) de un documento XHTML."""
+    # Los documentos de un EPUB son XHTML: UTF-8 salvo que la declaración XML diga otra cosa
+    declared = re.match(rb'<\?xml[^>]*encoding=["\']([\w.-]+)', content.lstrip())
+    encoding = declared.group(1).decode("ascii") if declared else "utf-8"
+    lxml_html = _lxml()
+    if lxml_html:
+        root = lxml_html.document_fromstring(content, parser=lxml_html.HTMLParser(encoding=encoding))
+        for element in list(root.iter(*_SKIPPED_TAGS)):
+            if element.getparent() is not None:
+                element.drop_tree()
+        for element in root.iter(*_BLOCK_TAGS):
+            element.tail = "\n\n" + (element.tail or "")
+        heading = next((" ".join(h.text_content().split()) for h in root.iter("h1", "h2", "h3")), None)
+        body = root.find("body")
+        return heading, _normalize_text((body if body is not None else root).text_content())
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "html.parser", from_encoding=encoding)
+    for element in soup.find_all(list(_SKIPPED_TAGS)):
+        element.decompose()
+    for element in soup.find_all(list(_BLOCK_TAGS)):
+        element.insert_after("\n\n")
+    heading = soup.find(["h1", "h2", "h3"])
+    return (" ".join(heading.get_text().split()) if heading else None), _normalize_text(soup.get_text())
+
+def _normalize_text(text: str) -> str:
+    # Quitar la sangría del XHTML y dejar como mucho una línea en blanco seguida
+    lines = (line.strip() for line in text.splitlines())
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+def iter_text_from_epub(file: IO[bytes]) -> Iterator[str]:
+    for chapter in iter_chapters_from_epub(file):
+        yield chapter["text"] + "\n"
+
+# Extractores incrementales por extensión: producen el texto página a página
+# (o sección a sección) para poder trocearlo sin tener el libro entero en memoria
+TEXT_ITERATORS = {
+    "txt": iter_text_from_txt,
+    "pdf": iter_text_from_pdf,
+    "docx": iter_text_from_docx,
+    "epub": iter_text_from_epub,
+}
+
+def iter_text(file: IO[bytes], extension: str) -> Iterator[str]:
+    """
+    Extrae el texto de un archivo de forma incremental según su extensión.
+
+    El generador puede pasarse directamente a `generate_summary_map_reduce`,
+    que divide y resume sin juntar el texto. La CLI, la app y los workers
+    necesitan el texto completo (se guarda en el historial), así que lo unen.
+    """
+    extension = extension.lower().lstrip(".")
+    if extension not in TEXT_ITERATORS:
+        raise ValueError(f"Formato no soportado: {extension}")
+    return TEXT_ITERATORS[extension](file)
+
+def get_text_from_txt(file: IO[bytes]) -> str:
+    return "".join(iter_text_from_txt(file))
+
+def get_text_from_pdf(file: IO[bytes]) -> str:
+    return "".join(iter_text_from_pdf(file))
+
+def get_text_from_docx(file: IO[bytes]) -> str:
+    return "".join(iter_text_from_docx(file))
+
+def get_text_from_epub(file: IO[bytes]) -> str:
+    return "".join(iter_text_from_epub(file))
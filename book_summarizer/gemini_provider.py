@@ -0,0 +1,289 @@
+"""
+Proveedores en la nube: Gemini (google-genai), síncrono y asíncrono.
+
+`providers.get_provider_class("gemini")` sólo carga este módulo (y el SDK de
+genai) al crear el primer proveedor Gemini.
+"""
+from typing import Optional, Generator
+from threading import Lock, Thread
+from google import genai
+from google.genai import errors as genai_errors
+import httpx
+import asyncio
+import time
+from .generation_cache import GenerationCache
+from .incremental import align_chunks, reused_prefix
+from .providers import SummarizationProvider, metadata_source, parse_metadata, split_tags
+from .rate_limiting import RateLimiter, retry_async
+from .telemetry import stage
+from .text_splitter import TokenTextSplitter, estimate_tokens
+
+class GeminiProvider(SummarizationProvider):
+    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash-exp", cache: Optional[GenerationCache] = None, http_options: Optional[dict] = None):
+        super().__init__(model_name, cache)
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+
+    def _generate_content(self, prompt: str, config: dict) -> str:
+        """Llamada a `generate_content` pasando por la caché."""
+        def run():
+            start = time.perf_counter()
+            response = self.client.models.generate_content(model=self.model_name, contents=prompt, config=config)
+            self._record_response(response.usage_metadata, start)
+            return response.text
+        return self._cached_generate(prompt, config, run)
+
+    def _generate_content_stream(self, prompt: str, config: dict) -> Generator[str, None, None]:
+        def run():
+            start = time.perf_counter()
+            first_chunk_at = None
+            usage = None
+            for chunk in self.client.models.generate_content_stream(model=self.model_name, contents=prompt, config=config):
+                # Cada trozo trae el uso acumulado: vale el del último
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    first_chunk_at = first_chunk_at or time.perf_counter()
+                    yield chunk.text
+            self._record_response(usage, start, first_chunk_at)
+        return self._cached_stream(prompt, config, run)
+
+    def _record_response(self, usage, start: float, first_chunk_at: Optional[float] = None):
+        """
+        Métricas de una respuesta de la API. Los tokens salen de `usage_metadata`;
+        la tokenización ocurre en el servidor, y sin streaming el primer token
+        llega con la respuesta completa (TTFT = tiempo total, sin tokens/s).
+        """
+        end = time.perf_counter()
+        self._record_call(
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            generated_tokens=getattr(usage, "candidates_token_count", None),
+            wall_seconds=end - start,
+            ttft_seconds=(first_chunk_at or end) - start,
+        )
+        
+    def _summary_prompt(self, text: str, focus_instruction: str = None, language: str = "es") -> str:
+        base = "Resume el siguiente texto" if language == "es" else "Summarize the following text"
+        if focus_instruction:
+            base += f" {'siguiendo' if language == 'es' else 'following'}: {focus_instruction}"
+        return f"{base}:\n\n{text}"
+
+    def summarize(self, text: str, max_length: int = 2048, min_length: int = 50, focus_instruction: str = None, language: str = "es", stream: bool = False):
+        prompt = self._summary_prompt(text, focus_instruction, language)
+        
+        config = {'max_output_tokens': max_length, 'temperature': 0.3}
+        if stream:
+            return self._generate_content_stream(prompt, config)
+
+        return self._generate_content(prompt, config)
+        
+    def summarize_iterative(self, text: str, chunk_size: int = 125000, max_new_tokens: int = 2048, progress_callback=None, focus_instruction: str = None, delay: int = 0, language: str = "es", stream: bool = False, checkpoint_db=None, chunk_callback=None, previous: dict = None) -> dict:
+        # Cada resumen es el acumulado de todo lo anterior: de un resumen previo
+        # (`previous`) sólo se reutilizan los chunks iniciales que no cambiaron
+        settings = dict(chunk_size=chunk_size, max_new_tokens=max_new_tokens, focus_instruction=focus_instruction, language=language)
+        reusable = 0
+        if previous:
+            chunks, matches = align_chunks(text, previous, lambda part: self._split_text(part, chunk_size),
+                                           lambda chunk: self._checkpoint_key(chunk, **settings))
+            reusable = reused_prefix(matches)
+        else:
+            chunks = self._split_text(text, chunk_size)
+        if not chunks: return ""
+        if len(chunks) == 1:
+            return self.summarize(text, max_length=max_new_tokens, focus_instruction=focus_instruction)
+        
+        chunk_summaries = []
+        accumulated_summary = ""
+        
+        checkpoint_key = None
+        saved_chunks = []
+        if checkpoint_db is not None:
+            aligned = {"previous": previous.get("id")} if previous else {}
+            checkpoint_key = self._checkpoint_key(text, **settings, **aligned)
+            checkpoint_db.start_checkpoint(checkpoint_key, len(chunks))
+            saved_chunks = checkpoint_db.get_checkpoint_chunks(checkpoint_key)
+        
+        for i, chunk in enumerate(chunks):
+            if progress_callback: progress_callback(i + 1, len(chunks))
+            
+            record = {'chunk_number': i + 1, 'text_preview': chunk[:200] + "...", 'chunk_hash': self._checkpoint_key(chunk, **settings)}
+            if i < len(saved_chunks):
+                # Reanudación: el resumen acumulado es el del último chunk guardado
+                chunk_summary = saved_chunks[i]['summary']
+            elif i < reusable:
+                chunk_summary = matches[i][1]['summary']
+                record['reused'] = True
+                if checkpoint_key:
+                    checkpoint_db.save_checkpoint_chunk(checkpoint_key, i, chunk_summary, chunk_summary, chunk[:200] + "...")
+            else:
+                if delay > 0 and i > len(saved_chunks): time.sleep(delay)
+                prompt = self._build_gemini_prompt(i, chunk, accumulated_summary, focus_instruction, language)
+                with stage(self, "chunk", i + 1):
+                    chunk_summary = self._generate_content(prompt, {'max_output_tokens': max_new_tokens, 'temperature': 0.3})
+                if checkpoint_key:
+                    checkpoint_db.save_checkpoint_chunk(checkpoint_key, i, chunk_summary, chunk_summary, chunk[:200] + "...")
+            
+            record['summary'] = chunk_summary
+            chunk_summaries.append(record)
+            accumulated_summary = chunk_summary
+            if chunk_callback: chunk_callback(record)
+        
+        if checkpoint_key:
+            checkpoint_db.finish_checkpoint(checkpoint_key)
+            
+        return {
+            "summary": f"# Resumen Completo\n\n{accumulated_summary}",
+            "chunks": chunk_summaries
+        }
+
+    def _build_gemini_prompt(self, index, chunk, prev_summary, focus, language):
+        focus_text = f" Focus: {focus}" if focus else ""
+        if index == 0:
+            return f"Resume en detalle.{focus_text}\n\nTexto:\n{chunk}"
+        return f"Resumen Actual:\n{prev_summary}\n\nNuevo Texto:\n{chunk}\n\nActualiza el resumen.{focus_text}"
+
+    def generate_title(self, text: str) -> str:
+        prompt = f"Título corto (max 5 palabras):\n\n{text[:2000]}"
+        return self._generate_content(prompt, {'max_output_tokens': 20}).strip().strip('"')
+    
+    def generate_tags(self, text: str) -> list[str]:
+        prompt = f"3-5 etiquetas (csv):\n\n{text[:2000]}"
+        response_text = self._generate_content(prompt, {'max_output_tokens': 40, 'temperature': 0.3})
+        return split_tags(response_text)
+
+    def generate_metadata(self, summaries: list[str], language: str = "es") -> dict:
+        prompt = (f"Título corto (max 5 palabras) y 3-5 etiquetas (csv) del libro que resumen estos fragmentos. "
+                  f"Responde sólo con:\nTítulo: ...\nEtiquetas: ...\n\n{metadata_source(summaries)}")
+        return parse_metadata(self._generate_content(prompt, {'max_output_tokens': 60, 'temperature': 0.3}))
+    
+    def _split_text(self, text: str, chunk_size: int) -> list[str]:
+        # Sin tokenizer local: el presupuesto en tokens se estima
+        return TokenTextSplitter(max_tokens=chunk_size).split_text(text)
+
+class AsyncGeminiProvider(GeminiProvider):
+    """
+    GeminiProvider que lanza las llamadas en paralelo con asyncio.
+
+    Todas las llamadas pasan por un único event loop en un hilo propio (el
+    cliente async de genai queda ligado al loop donde se usó por primera
+    vez), con como mucho `max_concurrency` peticiones en vuelo, un límite de
+    peticiones y tokens por minuto, y reintentos con backoff exponencial y
+    jitter ante 429/5xx. `summarize_batch` reparte la fase map del
+    map-reduce en una sola ronda concurrente.
+    """
+    supports_batching = True
+
+    def __init__(self,
+                 api_key: str,
+                 model_name: str = "gemini-2.0-flash-exp",
+                 cache: Optional[GenerationCache] = None,
+                 max_concurrency: int = 8,
+                 requests_per_minute: Optional[float] = 60,
+                 tokens_per_minute: Optional[float] = 1_000_000,
+                 max_retries: int = 5,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0,
+                 base_url: Optional[str] = None):
+        # Los reintentos los gestiona retry_async, no el cliente
+        http_options = {"retry_options": {"attempts": 1}}
+        if base_url:
+            http_options["base_url"] = base_url
+        super().__init__(api_key, model_name, cache, http_options=http_options)
+        self.max_concurrency = max_concurrency
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._semaphore = None
+        self._event_loop = None
+        self._loop_lock = Lock()
+
+    def _loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._event_loop is None:
+                loop = asyncio.new_event_loop()
+                Thread(target=loop.run_forever, daemon=True, name="gemini-async").start()
+                self._event_loop = loop
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._event_loop
+
+    def _run(self, coro):
+        """Ejecuta una corrutina en el loop del proveedor y espera su resultado."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop()).result()
+
+    async def _agenerate_content(self, prompt: str, config: dict) -> str:
+        start = time.perf_counter()
+        key = self._cache_key(prompt, config)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._record_call(prompt_tokens=None, generated_tokens=None, wall_seconds=time.perf_counter() - start, cached=True)
+                return cached
+
+        # Presupuesto de tokens: el prompt más lo máximo que puede generar
+        tokens = estimate_tokens(prompt) + config.get('max_output_tokens', 0)
+
+        async def attempt():
+            await self.limiter.acquire(tokens)
+            response = await self.client.aio.models.generate_content(model=self.model_name, contents=prompt, config=config)
+            return response
+
+        def count_retry(attempt_number, exc, delay):
+            self.retries += 1
+
+        # El tiempo total incluye la espera por el semáforo, la cuota y los reintentos
+        async with self._semaphore:
+            response = await retry_async(
+                attempt,
+                status_of=_api_error_status,
+                retry_after_of=_api_error_retry_after,
+                max_retries=self.max_retries,
+                base_delay=self.base_delay,
+                max_delay=self.max_delay,
+                on_retry=count_retry,
+            )
+        self._record_response(response.usage_metadata, start)
+        result = response.text
+        if key and result:
+            self.cache.put(key, result, self.model_id)
+        return result
+
+    def _generate_content(self, prompt: str, config: dict) -> str:
+        # summarize, títulos, etiquetas e iterativo también respetan límites y reintentos
+        return self._run(self._agenerate_content(prompt, config))
+
+    async def _summarize_batch(self, texts: list[str], max_length: int, focus_instruction: str, language: str) -> list[str]:
+        config = {'max_output_tokens': max_length, 'temperature': 0.3}
+        prompts = [self._summary_prompt(text, focus_instruction, language) for text in texts]
+        results = await asyncio.gather(*(self._agenerate_content(p, config) for p in prompts), return_exceptions=True)
+        summaries = []
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                print(f"Error processing chunk {index}: {result}")
+                result = ""
+            summaries.append(result or "")
+        return summaries
+
+    def summarize_batch(self, texts: list[str], max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", batch_size: int = None) -> list[str]:
+        """Resume todos los textos de forma concurrente; los que fallan devuelven ""."""
+        return self._run(self._summarize_batch(texts, max_length, focus_instruction, language))
+
+    async def asummarize_batch(self, texts: list[str], max_length: int = 500, focus_instruction: str = None, language: str = "es") -> list[str]:
+        """Igual que `summarize_batch`, para código que ya corre en otro event loop."""
+        future = asyncio.run_coroutine_threadsafe(self._summarize_batch(texts, max_length, focus_instruction, language), self._loop())
+        return await asyncio.wrap_future(future)
+
+def _api_error_status(exc: BaseException) -> Optional[int]:
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code
+    # Errores de red (conexión rechazada, timeouts): se tratan como 503
+    if isinstance(exc, (ConnectionError, TimeoutError, httpx.TransportError)):
+        return 503
+    return None
+
+def _api_error_retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
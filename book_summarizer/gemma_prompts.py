@@ -0,0 +1,251 @@
+"""
+Plantillas de Gemma (BookSum) y el resumen iterativo, sin depender de torch.
+
+`GemmaPromptMixin` sólo necesita que la clase defina `_generate` y
+`_generate_stream` (prompt y parámetros de `generate`); la usan
+`GemmaBookSumProvider`, que genera en local, y `ModelServerProvider`, que
+envía cada generación al servidor de modelo compartido.
+"""
+from typing import Any, Dict, Generator, List, Union
+
+from .incremental import align_chunks, same_context
+from .providers import metadata_source, parse_metadata, split_tags
+from .telemetry import stage
+from .text_splitter import TokenTextSplitter
+
+
+# Caracteres del final de los resúmenes anteriores que recibe cada chunk como contexto
+CONTEXT_CHARS = 1000
+
+
+class GemmaPromptMixin:
+    _METADATA_INSTRUCTIONS = {
+        "es": "Escribe un título muy corto (máximo 5 palabras) y 3-5 etiquetas separadas por comas para el libro "
+              "que resumen estos fragmentos. Responde sólo con:\nTítulo: <título>\nEtiquetas: <etiquetas>\n\n",
+        "en": "Write a very short title (at most 5 words) and 3-5 comma-separated tags for the book summarized "
+              "by these excerpts. Answer only with:\nTitle: <title>\nTags: <tags>\n\n",
+    }
+
+    def summarize(self, text: str, max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", stream: bool = False):
+        prompt = self._get_summary_prompt(text, focus_instruction, language)
+
+        if stream:
+            return self._generate_stream(prompt, max_new_tokens=max_length, min_new_tokens=min_length, temperature=0.6, repetition_penalty=1.3)
+            
+        return self._generate(prompt, max_new_tokens=max_length, min_new_tokens=min_length, temperature=0.6)
+
+    def _get_summary_prompt(self, text: str, focus_instruction: str = None, language: str = "es") -> str:
+        base_instruction = "Resume el siguiente texto" if language == "es" else "Summarize the following text"
+            
+        if focus_instruction:
+            connector = "siguiendo esta instrucción:" if language == "es" else "following this instruction:"
+            base_instruction += f" {connector} {focus_instruction}"
+        else:
+            base_instruction += ":"
+            
+        return f"{base_instruction}\n\n{text}\n\nResumen:"
+    
+    def summarize_iterative(self, text: str, chunk_size: int = 1024, max_new_tokens: int = 2048, progress_callback=None, focus_instruction: str = None, language: str = "es", stream: bool = False, checkpoint_db=None, chunk_callback=None, previous: Dict = None) -> Union[Dict[str, Any], Generator]:
+        """
+        Resume el texto chunk a chunk usando el resumen anterior como contexto.
+
+        Con `checkpoint_db` (un `SummaryDatabase`) cada chunk terminado se guarda
+        al momento, y volver a lanzar el mismo documento con la misma
+        configuración reanuda desde el primer chunk pendiente.
+        `chunk_callback` recibe el registro de cada chunk al terminarlo.
+
+        Con `previous` (ver `incremental.previous_document`), los chunks que
+        no cambiaron respecto a ese resumen y reciben el mismo contexto
+        reutilizan su resumen (marcados con 'reused').
+        """
+        settings = dict(chunk_size=chunk_size, focus_instruction=focus_instruction, language=language)
+        if previous:
+            chunks, matches = align_chunks(text, previous, lambda part: self._split_text(part, chunk_size),
+                                           lambda chunk: self._checkpoint_key(chunk, **settings))
+        else:
+            chunks = self._split_text(text, chunk_size)
+            matches = [None] * len(chunks)
+        if not chunks: return ""
+        
+        if len(chunks) == 1:
+            result = self.summarize(text, max_length=max_new_tokens, focus_instruction=focus_instruction, stream=stream)
+            return result if stream else result
+        
+        chunk_summaries = []
+        accumulated_summary = ""
+        context_summary = "" # Resumen breve para dar contexto al siguiente chunk
+        
+        checkpoint_key = None
+        saved_chunks = []
+        if checkpoint_db is not None:
+            # Alineados con un resumen anterior los cortes pueden ser otros: checkpoint aparte
+            aligned = {"previous": previous.get("id")} if previous else {}
+            checkpoint_key = self._checkpoint_key(text, **settings, **aligned)
+            checkpoint_db.start_checkpoint(checkpoint_key, len(chunks))
+            saved_chunks = checkpoint_db.get_checkpoint_chunks(checkpoint_key)
+        
+        def finish_chunk(i: int, chunk: str, chunk_text: str, reused: bool = False):
+            nonlocal accumulated_summary
+            record = {
+                'chunk_number': i + 1,
+                'text_preview': chunk[:100] + "...",
+                'summary': chunk_text,
+                'chunk_hash': self._checkpoint_key(chunk, **settings),
+            }
+            if reused:
+                record['reused'] = True
+            chunk_summaries.append(record)
+            accumulated_summary += f"\n\n#### Parte {i+1}\n\n{chunk_text}"
+            if chunk_callback: chunk_callback(record)
+
+        # Generator for streaming
+        def stream_generator():
+            nonlocal context_summary
+            
+            for i, chunk in enumerate(chunks):
+                if progress_callback: progress_callback(i + 1, len(chunks))
+                
+                if i < len(saved_chunks):
+                    # Chunk ya terminado en una ejecución anterior: se reutiliza tal cual
+                    chunk_text = saved_chunks[i]['summary']
+                    context_summary = saved_chunks[i]['context']
+                    yield f"\n\n#### Parte {i+1}\n\n"
+                    yield chunk_text
+                    finish_chunk(i, chunk, chunk_text)
+                    continue
+
+                reused = same_context(i, matches, [c['summary'] for c in chunk_summaries], CONTEXT_CHARS)
+                if reused:
+                    # Mismo texto y mismo contexto que en el resumen anterior
+                    chunk_text = matches[i][1]['summary']
+                    yield f"\n\n#### Parte {i+1}\n\n"
+                    yield chunk_text
+                else:
+                    # Incremental Append Strategy
+                    # Generamos el resumen SÓLO de este chunk, usando el anterior como contexto
+
+                    if i == 0:
+                        prompt = self._get_initial_prompt(chunk, language)
+                    else:
+                        prompt = self._get_incremental_prompt(chunk, context_summary, language)
+
+                    chunk_text = ""
+                    yield f"\n\n#### Parte {i+1}\n\n"
+
+                    # Streaming generation for this chunk
+                    with stage(self, "chunk", i + 1):
+                        for new_text in self._generate_stream(
+                            prompt,
+                            max_new_tokens=600, # Summaries per chunk shouldn't be too long
+                            min_new_tokens=100,
+                            temperature=0.4, # Low temp to avoid hallucinations
+                            repetition_penalty=1.2
+                        ):
+                            chunk_text += new_text
+                            yield new_text
+
+                    # Limpiar resultado
+                    chunk_text = chunk_text.replace(prompt, "").strip()
+                
+                # Mantener un contexto breve (últimos CONTEXT_CHARS cars) para el siguiente paso
+                context_summary = (context_summary + " " + chunk_text)[-CONTEXT_CHARS:]
+                
+                if checkpoint_key:
+                    checkpoint_db.save_checkpoint_chunk(checkpoint_key, i, chunk_text, context_summary, chunk[:100] + "...")
+                finish_chunk(i, chunk, chunk_text, reused)
+            
+            if checkpoint_key:
+                checkpoint_db.finish_checkpoint(checkpoint_key)
+
+        if stream:
+            return stream_generator()
+
+        # Non-streaming execution
+        for val in stream_generator():
+            pass # Consume generator
+            
+        return {
+            "summary": self._format_final_output(accumulated_summary, len(chunks), len(text), language),
+            "chunks": chunk_summaries
+        }
+
+    def _get_initial_prompt(self, chunk: str, language: str) -> str:
+        if language == "es":
+            return f"""Resume el siguiente texto de manera detallada y objetiva.
+ESTILO: Académico, formal, directo.
+PROHIBIDO: Emojis, saludos, "Espero que sirva".
+
+Texto:
+{chunk}
+
+Resumen:"""
+        else:
+            return f"""Summarize the following text in a detailed and objective way.
+STYLE: Academic, formal, direct.
+FORBIDDEN: Emojis, greetings, "Hope this helps".
+
+Text:
+{chunk}
+
+Summary:"""
+
+    def _get_incremental_prompt(self, chunk: str, context: str, language: str) -> str:
+        if language == "es":
+            return f"""Contexto anterior: "{context}..."
+
+Resume la SIGUIENTE parte del texto, continuando la narrativa.
+ESTILO: Académico, formal, directo. Sin repeticiones.
+PROHIBIDO: Emojis, saludos.
+
+Nueva Parte:
+{chunk}
+
+Resumen de la Nueva Parte:"""
+        else:
+            return f"""Previous context: "{context}..."
+
+Summarize the FOLLOWING part of the text, continuing the narrative.
+STYLE: Academic, formal, direct. No repetitions.
+FORBIDDEN: Emojis, greetings.
+
+New Part:
+{chunk}
+
+Summary of New Part:"""
+
+
+    def _get_style_guidelines(self, language: str) -> str:
+        # Not used directly in the new prompts but kept for reference if needed
+        return ""
+
+    def _format_final_output(self, summary: str, chunks_count: int, length: int, language: str) -> str:
+        header = "📚 Reporte de Resumen" if language == "es" else "📚 Summary Report"
+        info = "Información de Procesamiento" if language == "es" else "Processing Info"
+        return f"""# {header}
+## 📊 {info}
+- Chunks: {chunks_count}
+- Input Length: {length} chars
+---
+## 🎯 Resumen Completo
+{summary}"""
+
+    def _split_text(self, text: str, chunk_size: int) -> list[str]:
+        # chunk_size es un presupuesto en tokens del propio modelo (estimados si no hay tokenizer)
+        return TokenTextSplitter(max_tokens=chunk_size, tokenizer=self.tokenizer).split_text(text)
+
+    def generate_title(self, text: str) -> str:
+        prompt = f"Genera un título muy corto (máximo 5 palabras) para:\n\n{text[:1000]}\n\nTítulo:"
+        title = self._generate(prompt, max_new_tokens=20, temperature=0.7)
+        return title.split('\n')[0].strip('"')
+
+    def generate_tags(self, text: str) -> list[str]:
+        prompt = f"Genera 3-5 etiquetas separadas por comas para:\n\n{text[:2000]}\n\nEtiquetas:"
+        text = self._generate(prompt, max_new_tokens=40, temperature=0.3)
+        return split_tags(text)
+
+    def generate_metadata(self, summaries: List[str], language: str = "es") -> Dict[str, Any]:
+        # Una sola generación para ambos; el prompt acaba en "Título:" para encauzar la respuesta
+        instructions = self._METADATA_INSTRUCTIONS.get(language, self._METADATA_INSTRUCTIONS["en"])
+        label = "Título:" if language == "es" else "Title:"
+        prompt = f"{instructions}{metadata_source(summaries)}\n\n{label}"
+        return parse_metadata(self._generate(prompt, max_new_tokens=60, temperature=0.5))
@@ -0,0 +1,315 @@
+"""
+Proveedor local: Gemma (BookSum) con transformers.
+
+Importa torch y transformers; `providers.get_provider_class("gemma")` sólo
+carga este módulo al crear el primer proveedor Gemma.
+"""
+from typing import Optional, Generator, Dict, Any
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
+from threading import Lock, Thread, local
+import gc
+import os
+import time
+import warnings
+from .gemma_prompts import GemmaPromptMixin
+from .generation_cache import GenerationCache
+from .providers import DEFAULT_PRECISION, PRECISIONS, SummarizationProvider
+from .telemetry import FirstTokenTimer
+
+def _available_memory_bytes() -> int:
+    """Memoria libre en el dispositivo donde corre el modelo (GPU o RAM)."""
+    if torch.cuda.is_available():
+        free, _ = torch.cuda.mem_get_info()
+        return free
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+def _is_out_of_memory(error: RuntimeError) -> bool:
+    """Sin memoria para el batch: CUDA lanza `OutOfMemoryError`, el asignador de CPU un RuntimeError genérico."""
+    if isinstance(error, torch.OutOfMemoryError):
+        return True
+    message = str(error)
+    return "DefaultCPUAllocator" in message or "can't allocate memory" in message or "not enough memory" in message
+
+def _load_model(model_name: str, precision: str, trust_remote_code: bool = True):
+    """Carga el checkpoint con la precisión pedida."""
+    on_gpu = torch.cuda.is_available() and precision != "int8"
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        dtype=torch.bfloat16 if precision == "bf16" else torch.float32,
+        device_map="auto" if on_gpu else "cpu",
+        trust_remote_code=trust_remote_code
+    )
+    if not on_gpu:
+        model.to("cpu")
+    if precision == "int8":
+        # torch.ao.quantization avisa de que pasará a torchao; en CPU sigue siendo la vía disponible
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            # inplace: cada Linear fp32 se libera al sustituirlo, sin tener dos copias del modelo
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        # Los pesos que siguen en fp32 (embeddings, normas) son vistas del safetensors
+        # mapeado en memoria: copiarlos (y recoger los ciclos que aún lo referencian)
+        # libera el archivo entero, ya leído al cuantizar
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            tensor.data = tensor.data.clone()
+        gc.collect()
+    model.eval()
+    return model
+
+# Pasadas del modelo de borrador en la generación en curso de cada hilo: cada
+# una propone un token. None fuera de una generación asistida
+_draft_forwards = local()
+
+def _count_draft_forward(module, args, output):
+    if getattr(_draft_forwards, "count", None) is not None:
+        _draft_forwards.count += 1
+
+def _vocab_size(model) -> int:
+    return getattr(model.config, "text_config", model.config).vocab_size
+
+class _TimedTextStreamer(TextIteratorStreamer):
+    """`TextIteratorStreamer` que además cuenta los tokens nuevos y anota cuándo llega el primero."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timer = FirstTokenTimer()
+
+    def put(self, value):
+        self.timer.put(value)
+        super().put(value)
+
+class GemmaBookSumProvider(GemmaPromptMixin, SummarizationProvider):
+    _tokenizer = None
+    # Modelos cargados, compartidos entre instancias: (model_name, precision) -> modelo,
+    # y (model_name, precision, "draft") -> borrador. Como mucho uno de cada por proceso
+    _models: Dict[tuple, Any] = {}
+    _models_lock = Lock()
+    supports_batching = True
+    _draft_model = None
+
+    def __init__(self, model_name: str = "croko22/gemma-booksum-lora-v1", max_batch_size: int = 8, cache: Optional[GenerationCache] = None,
+                 precision: str = DEFAULT_PRECISION, draft_model: Optional[str] = None):
+        """
+        `draft_model` activa la decodificación asistida: un modelo mucho más
+        pequeño con el mismo vocabulario propone varios tokens y el principal
+        los verifica en una sola pasada. Con muestreo se usa el muestreo
+        especulativo, que conserva la distribución del modelo principal. Sólo
+        se aplica a las generaciones de una secuencia (no a `summarize_batch`).
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Precisión desconocida: {precision!r} (disponibles: {', '.join(PRECISIONS)})")
+        if precision == "int8" and torch.cuda.is_available():
+            raise ValueError("La cuantización int8 dinámica sólo está disponible en CPU")
+        super().__init__(model_name, cache)
+        self.precision = precision
+        self.max_batch_size = max_batch_size
+        if GemmaBookSumProvider._tokenizer is None:
+            GemmaBookSumProvider._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            # Relleno a la izquierda: en batch todas las generaciones empiezan en la misma columna
+            GemmaBookSumProvider._tokenizer.padding_side = "left"
+            if GemmaBookSumProvider._tokenizer.pad_token is None:
+                GemmaBookSumProvider._tokenizer.pad_token = GemmaBookSumProvider._tokenizer.eos_token
+        with GemmaBookSumProvider._models_lock:
+            key = (self.model_name, precision)
+            if key not in GemmaBookSumProvider._models:
+                GemmaBookSumProvider._unload(draft=False)
+                GemmaBookSumProvider._models[key] = _load_model(self.model_name, precision)
+            self._model = GemmaBookSumProvider._models[key]
+            self.draft_model_name = draft_model
+            if draft_model:
+                # Clave propia: el gancho que cuenta sus pasadas no debe contar las del modelo principal
+                key = (draft_model, precision, "draft")
+                if key not in GemmaBookSumProvider._models:
+                    GemmaBookSumProvider._unload(draft=True)
+                    # El borrador sólo necesita una arquitectura estándar: nunca se ejecuta código del Hub
+                    draft = _load_model(draft_model, precision, trust_remote_code=False)
+                    draft.register_forward_hook(_count_draft_forward)
+                    GemmaBookSumProvider._models[key] = draft
+                self._draft_model = GemmaBookSumProvider._models[key]
+                if _vocab_size(self._draft_model) != _vocab_size(self._model):
+                    raise ValueError(f"El modelo de borrador {draft_model!r} no comparte vocabulario con {self.model_name!r}")
+
+    @classmethod
+    def _unload(cls, draft: bool):
+        """
+        Suelta los modelos principales (o los borradores) cargados antes de
+        cargar otro: cada precisión o borrador nuevo sustituye al anterior en
+        lugar de sumar otra copia del modelo. La memoria se libera cuando
+        ninguna instancia lo usa ya (el worker suelta su proveedor anterior).
+        """
+        stale = [key for key in cls._models if (len(key) == 3) == draft]
+        if not stale:
+            return
+        for key in stale:
+            del cls._models[key]
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    @property
+    def model_id(self) -> str:
+        # fp32 conserva el identificador de siempre: sus entradas en caché siguen valiendo
+        return self.model_name if self.precision == DEFAULT_PRECISION else f"{self.model_name}@{self.precision}"
+
+    @property
+    def tokenizer(self):
+        return self._tokenizer
+
+    def _encode(self, prompt):
+        inputs = self._tokenizer(text=prompt, return_tensors="pt", padding=True)
+        if torch.cuda.is_available():
+            inputs = {k: v.cuda() for k, v in inputs.items()}
+        return inputs
+
+    def _generate(self, prompt: str, **generation_kwargs) -> str:
+        """Genera (con muestreo) la continuación de `prompt`, pasando por la caché."""
+        def run():
+            start = time.perf_counter()
+            inputs = self._encode(prompt)
+            tokenized = time.perf_counter()
+            timer = FirstTokenTimer()
+            outputs = self._run_generate(timer, **inputs, do_sample=True, streamer=timer, **generation_kwargs)
+            new_tokens = outputs[0, inputs["input_ids"].shape[1]:]
+            self._record_generation(inputs, len(new_tokens), start, tokenized, timer)
+            return self._tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+        return self._cached_generate(prompt, generation_kwargs, run)
+
+    def _generate_stream(self, prompt: str, **generation_kwargs) -> Generator[str, None, None]:
+        """Como `_generate`, pero emitiendo el texto a medida que se decodifica."""
+        def run():
+            start = time.perf_counter()
+            inputs = self._encode(prompt)
+            tokenized = time.perf_counter()
+            streamer = _TimedTextStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True)
+            thread = Thread(target=self._run_generate, args=(streamer.timer,),
+                            kwargs=dict(inputs, streamer=streamer, do_sample=True, **generation_kwargs))
+            thread.start()
+
+            def stream():
+                yield from streamer
+                thread.join()
+                self._record_generation(inputs, streamer.timer.tokens, start, tokenized, streamer.timer)
+            return stream()
+        return self._cached_stream(prompt, generation_kwargs, run)
+
+    def _run_generate(self, timer: FirstTokenTimer, **kwargs):
+        """
+        `generate` de una secuencia, asistido por el modelo de borrador si lo
+        hay; anota en `timer` cuántos tokens propuso el borrador.
+        """
+        if self._draft_model is None:
+            with torch.no_grad():
+                return self._model.generate(**kwargs)
+        _draft_forwards.count = 0
+        try:
+            with torch.no_grad():
+                return self._model.generate(assistant_model=self._draft_model, **kwargs)
+        finally:
+            timer.draft_tokens = _draft_forwards.count
+            _draft_forwards.count = None
+
+    def _record_generation(self, inputs: Dict[str, Any], generated_tokens: int, start: float, tokenized: float,
+                           timer: FirstTokenTimer, batch_size: int = 1):
+        # Cada paso del modelo principal acepta algunos tokens del borrador y añade uno propio
+        accepted_tokens = generated_tokens - timer.steps if timer.draft_tokens is not None else None
+        self._record_call(
+            prompt_tokens=int(inputs["attention_mask"].sum()),
+            generated_tokens=generated_tokens,
+            wall_seconds=time.perf_counter() - start,
+            tokenize_seconds=tokenized - start,
+            ttft_seconds=timer.first_token_at - start if timer.first_token_at else None,
+            batch_size=batch_size,
+            draft_tokens=timer.draft_tokens,
+            accepted_tokens=accepted_tokens,
+        )
+
+    def summarize_batch(self, texts: list[str], max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", batch_size: int = None) -> list[str]:
+        """
+        Resume varios textos decodificándolos juntos en una sola llamada a `generate`.
+
+        Si no se indica `batch_size`, se calcula a partir de la memoria libre.
+        Si aun así falta memoria (en GPU o en CPU), el grupo se reintenta con
+        la mitad de secuencias.
+        """
+        prompts = [self._get_summary_prompt(text, focus_instruction, language) for text in texts]
+        if not prompts:
+            return []
+        
+        # Agrupar prompts de longitud parecida para minimizar el relleno
+        lengths = [len(ids) for ids in self._tokenizer(prompts)["input_ids"]]
+        order = sorted(range(len(prompts)), key=lambda i: lengths[i])
+        if batch_size is None:
+            batch_size = self._auto_batch_size(max(lengths), max_length)
+        
+        results = [None] * len(prompts)
+        params = dict(max_new_tokens=max_length, min_new_tokens=min_length, temperature=0.6)
+        keys = [self._cache_key(prompt, params) for prompt in prompts]
+        if self.cache:
+            for i, key in enumerate(keys):
+                results[i] = self.cache.get(key)
+            order = [i for i in order if results[i] is None]
+        
+        start = 0
+        while start < len(order):
+            group = order[start:start + batch_size]
+            try:
+                summaries = self._generate_batch([prompts[i] for i in group], max_length, min_length)
+            except RuntimeError as e:
+                if batch_size == 1 or not _is_out_of_memory(e):
+                    raise
+                # Reintentar el mismo grupo con la mitad de secuencias
+                batch_size = max(1, batch_size // 2)
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+                gc.collect()
+                continue
+            for i, summary in zip(group, summaries):
+                results[i] = summary
+                if keys[i] and summary:
+                    self.cache.put(keys[i], summary, self.model_id)
+            start += len(group)
+        return results
+
+    def _generate_batch(self, prompts: list[str], max_new_tokens: int, min_new_tokens: int) -> list[str]:
+        start = time.perf_counter()
+        inputs = self._tokenizer(text=prompts, return_tensors="pt", padding=True)
+        if torch.cuda.is_available():
+            inputs = {k: v.cuda() for k, v in inputs.items()}
+        tokenized = time.perf_counter()
+        timer = FirstTokenTimer()
+        
+        with torch.no_grad():
+            outputs = self._model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                min_new_tokens=min_new_tokens,
+                temperature=0.6,
+                do_sample=True,
+                pad_token_id=self._tokenizer.pad_token_id,
+                streamer=timer,
+            )
+        
+        # Con relleno a la izquierda los tokens nuevos empiezan tras la última columna del prompt
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        generated = int((new_tokens != self._tokenizer.pad_token_id).sum())
+        self._record_generation(inputs, generated, start, tokenized, timer, batch_size=len(prompts))
+        return [text.strip() for text in self._tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+    def _auto_batch_size(self, prompt_tokens: int, max_new_tokens: int) -> int:
+        """Estima cuántas secuencias caben a la vez según el tamaño de la caché KV."""
+        config = getattr(self._model.config, "text_config", self._model.config)
+        heads = config.num_attention_heads
+        kv_heads = getattr(config, "num_key_value_heads", None) or heads
+        head_dim = getattr(config, "head_dim", None) or config.hidden_size // heads
+        dtype_bytes = next(self._model.parameters()).element_size()
+        
+        # Claves y valores de cada capa para toda la secuencia, x2 de margen para activaciones
+        per_sequence = 2 * config.num_hidden_layers * kv_heads * head_dim * dtype_bytes * (prompt_tokens + max_new_tokens)
+        per_sequence *= 2
+        fits = int(_available_memory_bytes() * 0.5 // max(per_sequence, 1))
+        return max(1, min(self.max_batch_size, fits))
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from .connection import ConnectionManager
+
+# Consultas cuyo último acceso y contadores se escriben de una vez, en lugar de uno por lectura
+TOUCH_BATCH = 32
+# Cada cuántas escrituras se recalcula el tamaño total (otros procesos también escriben)
+RESYNC_PUTS = 100
+
+
+class GenerationCache:
+    """
+    Caché persistente de generaciones, direccionada por contenido.
+
+    Se guarda en el mismo archivo SQLite que `SummaryDatabase`, en su propia
+    tabla, y desaloja las entradas menos usadas (LRU) al superar `max_bytes`.
+    El tamaño total se lleva en memoria y los últimos accesos se escriben por
+    lotes, así que leer no escribe y escribir no recorre la tabla. Los
+    aciertos y fallos se acumulan en la base de datos con esos mismos lotes:
+    la app ve los de los workers, que son quienes generan.
+    """
+
+    def __init__(self, db_path: str = "summary_history.db", max_bytes: int = 64 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._pending_hits = 0
+        self._pending_misses = 0
+        self._total: Optional[int] = None
+        self._puts = 0
+        self.connections = ConnectionManager(db_path)
+        self.init_database()
+
+    def init_database(self):
+        """Crea la tabla de la caché si no existe."""
+        with self.connections.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generation_cache (
+                    key TEXT PRIMARY KEY,
+                    model_name TEXT,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON generation_cache(last_access)")
+            # Aciertos y fallos de todos los procesos que usan la caché (una sola fila)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generation_cache_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO generation_cache_stats (id) VALUES (1)")
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, params: Dict) -> str:
+        """
+        Hash de todo lo que determina una generación.
+
+        El prompt ya renderizado incluye la plantilla, el texto del chunk y el
+        contexto, así que basta con combinarlo con el modelo y los parámetros.
+        """
+        payload = json.dumps([model_name, prompt, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la generación guardada o None; su último acceso se anota para el próximo lote."""
+        row = self.connections.connection().execute("SELECT value FROM generation_cache WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row:
+                self.hits += 1
+                self._pending_hits += 1
+                self._touched[key] = time.time()
+            else:
+                self.misses += 1
+                self._pending_misses += 1
+            flush = self._pending_hits + self._pending_misses >= TOUCH_BATCH
+        if flush:
+            self.flush()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, model_name: str = None):
+        """Guarda una generación y desaloja las entradas más antiguas si hace falta."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._write_lock, self.connections.connection() as conn:
+            old = conn.execute("SELECT size FROM generation_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute("""
+                INSERT OR REPLACE INTO generation_cache (key, model_name, value, size, last_access)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, model_name, value, size, time.time()))
+            # Ya se escribe: de paso, los accesos y contadores pendientes
+            self._flush(conn)
+            self._puts += 1
+            if self._total is None or self._puts % RESYNC_PUTS == 0:
+                self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM generation_cache").fetchone()[0]
+            else:
+                self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict(conn)
+
+    def flush(self):
+        """Escribe los últimos accesos y los aciertos y fallos pendientes."""
+        with self.connections.connection() as conn:
+            self._flush(conn)
+
+    def _flush(self, conn: sqlite3.Connection):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            hits, misses = self._pending_hits, self._pending_misses
+            self._pending_hits = self._pending_misses = 0
+        if touched:
+            conn.executemany("UPDATE generation_cache SET last_access = ? WHERE key = ?",
+                             [(last_access, key) for key, last_access in touched.items()])
+        if hits or misses:
+            conn.execute("UPDATE generation_cache_stats SET hits = hits + ?, misses = misses + ? WHERE id = 1",
+                         (hits, misses))
+
+    def _evict(self, conn: sqlite3.Connection):
+        excess = self._total - self.max_bytes
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM generation_cache ORDER BY last_access"):
+            stale.append((key,))
+            excess -= size
+            self._total -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM generation_cache WHERE key = ?", stale)
+
+    def stats(self) -> Dict:
+        """Aciertos y fallos de todos los procesos, más el tamaño actual de la caché."""
+        with self.connections.connection() as conn:
+            self._flush(conn)
+            hits, misses = conn.execute("SELECT hits, misses FROM generation_cache_stats WHERE id = 1").fetchone()
+            entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generation_cache").fetchone()
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'bytes': total
+        }
+
+    def clear(self):
+        """Vacía la caché."""
+        with self._write_lock, self.connections.connection() as conn:
+            conn.execute("DELETE FROM generation_cache")
+            conn.execute("UPDATE generation_cache_stats SET hits = 0, misses = 0 WHERE id = 1")
+            self._total = 0
+        with self._lock:
+            self._touched = {}
+            self._pending_hits = self._pending_misses = 0
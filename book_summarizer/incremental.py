@@ -0,0 +1,120 @@
+"""
+Resumen incremental de documentos editados: alinea los chunks del texto nuevo
+con los de un resumen anterior para reutilizar los resúmenes de los que no
+cambiaron.
+
+Cada chunk resumido guarda en `chunks_data` el hash de su texto y de la
+configuración con que se resumió (`SummarizationProvider._checkpoint_key`).
+Para alinear, el texto anterior se vuelve a dividir igual que entonces; de
+sus chunks sólo valen los que conservan el hash guardado. Esos chunks se
+buscan en orden dentro del texto nuevo, y sólo los tramos entre dos
+encontrados (lo editado) se dividen de nuevo: así los cortes se
+resincronizan tras cada cambio en vez de desplazarse hasta el final.
+"""
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Chunk antiguo alineado con un chunk nuevo: (índice en el documento anterior, su registro)
+Match = Optional[Tuple[int, Dict]]
+
+
+# Etapas de telemetría que resumen chunks del documento (ver `telemetry.stage`)
+CHUNK_STAGES = ("chunk", "map")
+
+
+def previous_document(item: Dict, metrics: Optional[List[Dict]] = None) -> Optional[Dict]:
+    """
+    {"id", "text", "chunks", "seconds_per_chunk"} de un resumen guardado
+    (`SummaryDatabase.get_summary_by_id`), si tiene chunks. Con sus
+    `metrics` (`get_summary_metrics`) se sabe lo que costó cada chunk.
+    """
+    if not item or not item.get("chunks_data") or not item.get("original_text"):
+        return None
+    chunks = json.loads(item["chunks_data"])
+    per_chunk = seconds_per_chunk(metrics or [], len(chunks))
+    if per_chunk and item.get("processing_time"):
+        # Las llamadas de la fase map van en paralelo: su suma puede pasar del tiempo real
+        per_chunk = min(per_chunk, item["processing_time"] / len(chunks))
+    return {"id": item.get("id"), "text": item["original_text"], "chunks": chunks, "seconds_per_chunk": per_chunk}
+
+
+def find_previous(database, source_name: Optional[str], method: str) -> Optional[Dict]:
+    """Versión anterior de `source_name` en el historial (`SummaryDatabase`) lista para `align_chunks`, o None."""
+    if not source_name:
+        return None
+    item = database.find_previous_version(source_name, method)
+    return previous_document(item, database.get_summary_metrics(item["id"])) if item else None
+
+
+def seconds_per_chunk(metrics: List[Dict], generated: int) -> Optional[float]:
+    """Tiempo medio de modelo por chunk generado (llamadas de las etapas `CHUNK_STAGES`)."""
+    seconds = sum(m.get("wall_seconds") or 0 for m in metrics if m.get("stage") in CHUNK_STAGES and not m.get("cached"))
+    return seconds / generated if generated and seconds else None
+
+
+def align_chunks(text: str, previous: Dict, split: Callable[[str], List[str]],
+                 chunk_key: Callable[[str], str]) -> Tuple[List[str], List[Match]]:
+    """
+    Divide `text` alineándolo con los chunks de `previous`.
+
+    `split` divide un texto como lo hizo el resumen anterior y `chunk_key`
+    calcula el hash de un chunk con la configuración actual. Devuelve los
+    chunks nuevos y, para cada uno, el chunk antiguo idéntico o None.
+    """
+    records = {record.get("chunk_number"): record for record in previous.get("chunks") or []}
+    chunks: List[str] = []
+    matches: List[Match] = []
+
+    def split_gap(gap: str):
+        if gap.strip():
+            for chunk in split(gap):
+                chunks.append(chunk)
+                matches.append(None)
+
+    covered = 0  # final del último chunk colocado en el texto nuevo
+    search = 0   # desde dónde buscar el siguiente chunk antiguo (con solapamiento, antes de `covered`)
+    for j, old in enumerate(split(previous["text"])):
+        record = records.get(j + 1)
+        if record is None or record.get("chunk_hash") != chunk_key(old):
+            continue
+        start = text.find(old, search)
+        if start < 0:
+            continue
+        split_gap(text[covered:start])
+        chunks.append(old)
+        matches.append((j, record))
+        search = start + 1
+        covered = max(covered, start + len(old))
+    split_gap(text[covered:])
+    return chunks, matches
+
+
+def same_context(i: int, matches: List[Match], summaries: List[str], context_chars: int) -> bool:
+    """
+    Si el chunk `i` del resumen iterativo recibe el contexto que tuvo su
+    chunk antiguo: los resúmenes que caben en los últimos `context_chars`
+    caracteres son de los mismos chunks antiguos, en el mismo orden, y
+    byte a byte iguales a los de entonces (`summaries` son los del resumen
+    en curso). Tras un chunk regenerado con otro resultado se regeneran
+    todos los que lo tienen en su ventana de contexto.
+    """
+    if matches[i] is None:
+        return False
+    j = matches[i][0]
+    chars = 0
+    k = i - 1
+    while k >= 0 and chars < context_chars:
+        if matches[k] is None or matches[k][0] != j - (i - k) or summaries[k] != matches[k][1].get("summary"):
+            return False
+        chars += len(summaries[k]) + 1
+        k -= 1
+    # Si el contexto llega hasta el principio, el chunk antiguo también debía tener sólo esos delante
+    return k >= 0 or i == j
+
+
+def reused_prefix(matches: List[Match]) -> int:
+    """Chunks iniciales que siguen igual y en su sitio (para resúmenes que dependen de todo lo anterior)."""
+    count = 0
+    while count < len(matches) and matches[count] is not None and matches[count][0] == count:
+        count += 1
+    return count
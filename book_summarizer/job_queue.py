@@ -0,0 +1,278 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from .connection import ConnectionManager
+from .database import compress_text, decompress_text
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+# Trabajos que pueden estar en ejecución a la vez entre todos los workers
+DEFAULT_MAX_RUNNING = 1
+# Un trabajo en ejecución sin latido durante este tiempo se da por abandonado
+STALE_SECONDS = 120
+# Intentos antes de marcar como fallido un trabajo cuyo worker murió
+MAX_ATTEMPTS = 3
+# Un worker sin latido durante este tiempo ya no cuenta como activo
+WORKER_TIMEOUT = 30
+
+JOB_COLUMNS = ("id, status, priority, payload, source_name, progress, message, error, worker_id, attempts, "
+               "summary_id, cancel_requested, created_at, started_at, finished_at, heartbeat_at")
+
+
+class JobCancelled(Exception):
+    """Se pidió cancelar el trabajo mientras se ejecutaba."""
+
+
+class JobQueue:
+    """
+    Cola de trabajos de resumen persistente en SQLite.
+
+    Vive en el mismo archivo que `SummaryDatabase`. La interfaz encola
+    trabajos y consulta su estado; los procesos de `book_summarizer.worker`
+    los reclaman por prioridad (y orden de llegada) sin pasar de
+    `max_running` trabajos en ejecución a la vez. Un trabajo cuyo worker deja
+    de dar latidos vuelve a la cola y, si es iterativo, se reanuda desde sus
+    checkpoints.
+    """
+
+    def __init__(self, db_path: str = "summary_history.db", max_running: int = DEFAULT_MAX_RUNNING):
+        self.db_path = db_path
+        self.max_running = max_running
+        self.connections = ConnectionManager(db_path)
+        self.init_database()
+
+    def close(self):
+        self.connections.close_all()
+
+    def init_database(self):
+        """Crea las tablas de la cola si no existen."""
+        with self.connections.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    payload TEXT NOT NULL,
+                    source_name TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    partial_text TEXT NOT NULL DEFAULT '',
+                    error TEXT,
+                    worker_id TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    summary_id INTEGER,
+                    result TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL
+                )
+            """)
+            # El texto del documento, comprimido y fuera de la fila (como summary_documents)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_inputs (
+                    job_id INTEGER PRIMARY KEY,
+                    text BLOB NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_workers (
+                    worker_id TEXT PRIMARY KEY,
+                    pid INTEGER,
+                    host TEXT,
+                    providers TEXT,
+                    started_at REAL,
+                    heartbeat_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, id)")
+
+    def submit(self, text: str, payload: Dict, priority: int = 0, source_name: str = None) -> int:
+        """Encola un documento; los trabajos de mayor `priority` se atienden antes."""
+        with self.connections.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (priority, payload, source_name) VALUES (?, ?, ?)",
+                (priority, json.dumps(payload, ensure_ascii=False), source_name)
+            )
+            conn.execute("INSERT INTO job_inputs (job_id, text) VALUES (?, ?)", (cursor.lastrowid, compress_text(text)))
+            return cursor.lastrowid
+
+    def claim(self, worker_id: str, providers: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Reclama el siguiente trabajo en cola para `worker_id`, o None.
+
+        Con `providers` sólo se consideran los trabajos de esos proveedores
+        (un worker sin API key de Gemini no se lleva trabajos de Gemini).
+        Devuelve None también si ya hay `max_running` trabajos en ejecución.
+        La comprobación y el cambio de estado van en una transacción
+        BEGIN IMMEDIATE para que dos workers no se lleven el mismo trabajo.
+        """
+        self.requeue_stale()
+        query = "SELECT id FROM jobs WHERE status = ?"
+        params = [QUEUED]
+        if providers:
+            query += f" AND json_extract(payload, '$.provider') IN ({', '.join('?' for _ in providers)})"
+            params.extend(providers)
+        query += " ORDER BY priority DESC, id LIMIT 1"
+        conn = self.connections.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+            row = None
+            if running < self.max_running:
+                row = conn.execute(query, params).fetchone()
+            if row:
+                now = time.time()
+                conn.execute("""
+                    UPDATE jobs SET status = ?, worker_id = ?, attempts = attempts + 1,
+                                    started_at = ?, heartbeat_at = ?, message = NULL, partial_text = ''
+                    WHERE id = ?
+                """, (RUNNING, worker_id, now, now, row["id"]))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return self.get_job(row["id"]) if row else None
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        row = self.connections.connection().execute(
+            f"SELECT {JOB_COLUMNS}, partial_text, result FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._job(row) if row else None
+
+    def get_job_text(self, job_id: int) -> Optional[str]:
+        row = self.connections.connection().execute("SELECT text FROM job_inputs WHERE job_id = ?", (job_id,)).fetchone()
+        return decompress_text(row["text"]) if row else None
+
+    def list_jobs(self, statuses: Optional[List[str]] = None, limit: int = 50) -> List[Dict]:
+        """Trabajos (sin el texto parcial), los activos primero y por orden de atención."""
+        query = f"SELECT {JOB_COLUMNS} FROM jobs"
+        params = []
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        query += " ORDER BY status = 'running' DESC, status = 'queued' DESC, priority DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return [self._job(row) for row in self.connections.connection().execute(query, params)]
+
+    def queue_position(self, job_id: int) -> Optional[int]:
+        """Trabajos que se atenderán antes que `job_id` (0 = el siguiente), o None si no está en cola."""
+        conn = self.connections.connection()
+        job = conn.execute("SELECT status, priority FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not job or job["status"] != QUEUED:
+            return None
+        return conn.execute("""
+            SELECT COUNT(*) FROM jobs
+            WHERE status = ? AND (priority > ? OR (priority = ? AND id < ?))
+        """, (QUEUED, job["priority"], job["priority"], job_id)).fetchone()[0]
+
+    def update_progress(self, job_id: int, progress: float, message: str = None, append_text: str = None):
+        """Actualiza el progreso (y el latido) de un trabajo; lanza JobCancelled si se pidió cancelarlo."""
+        with self.connections.connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET progress = ?, message = COALESCE(?, message),
+                                partial_text = partial_text || ?, heartbeat_at = ?
+                WHERE id = ?
+            """, (progress, message, append_text or "", time.time(), job_id))
+            cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if cancelled and cancelled["cancel_requested"]:
+            raise JobCancelled(f"Trabajo {job_id} cancelado")
+
+    def complete(self, job_id: int, summary_id: int, result: Optional[Dict] = None):
+        """Marca el trabajo como terminado; `result` guarda datos extra (p. ej. tiempos por nivel)."""
+        with self.connections.connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = ?, progress = 1, summary_id = ?, result = ?, finished_at = ?, message = NULL
+                WHERE id = ?
+            """, (DONE, summary_id, json.dumps(result, ensure_ascii=False) if result else None, time.time(), job_id))
+            conn.execute("DELETE FROM job_inputs WHERE job_id = ?", (job_id,))
+
+    def fail(self, job_id: int, error: str):
+        with self.connections.connection() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                         (FAILED, error, time.time(), job_id))
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancela un trabajo: si está en cola, en el acto; si está en ejecución,
+        su worker lo abandona en la siguiente actualización de progreso.
+        """
+        with self.connections.connection() as conn:
+            cursor = conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                                  (CANCELLED, time.time(), job_id, QUEUED))
+            if cursor.rowcount:
+                return True
+            cursor = conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+            return cursor.rowcount > 0
+
+    def mark_cancelled(self, job_id: int):
+        with self.connections.connection() as conn:
+            conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?", (CANCELLED, time.time(), job_id))
+
+    def release(self, job_id: int):
+        """Devuelve a la cola un trabajo que su worker no pudo terminar (p. ej. al pararlo)."""
+        with self.connections.connection() as conn:
+            conn.execute("UPDATE jobs SET status = ?, worker_id = NULL WHERE id = ? AND status = ?",
+                         (QUEUED, job_id, RUNNING))
+
+    def heartbeat(self, job_id: int):
+        with self.connections.connection() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def requeue_stale(self, stale_seconds: float = STALE_SECONDS) -> int:
+        """Devuelve a la cola los trabajos cuyo worker dejó de dar latidos."""
+        limit = time.time() - stale_seconds
+        with self.connections.connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = ?, finished_at = ?, error = 'Worker sin respuesta'
+                WHERE status = ? AND heartbeat_at < ? AND attempts >= ?
+            """, (FAILED, time.time(), RUNNING, limit, MAX_ATTEMPTS))
+            cursor = conn.execute("""
+                UPDATE jobs SET status = ?, worker_id = NULL, message = 'Reintentando tras caída del worker'
+                WHERE status = ? AND heartbeat_at < ?
+            """, (QUEUED, RUNNING, limit))
+            return cursor.rowcount
+
+    def register_worker(self, worker_id: str, providers: Optional[List[str]] = None):
+        """Registra (o renueva el latido de) un worker y los proveedores que atiende."""
+        now = time.time()
+        with self.connections.connection() as conn:
+            conn.execute("""
+                INSERT INTO job_workers (worker_id, pid, host, providers, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+            """, (worker_id, os.getpid(), socket.gethostname(), ",".join(providers or []), now, now))
+
+    def unregister_worker(self, worker_id: str):
+        with self.connections.connection() as conn:
+            conn.execute("DELETE FROM job_workers WHERE worker_id = ?", (worker_id,))
+
+    def active_workers(self, timeout: float = WORKER_TIMEOUT) -> List[Dict]:
+        rows = self.connections.connection().execute(
+            "SELECT * FROM job_workers WHERE heartbeat_at >= ? ORDER BY started_at", (time.time() - timeout,)
+        ).fetchall()
+        workers = []
+        for row in rows:
+            worker = dict(row)
+            worker["providers"] = [p for p in (worker["providers"] or "").split(",") if p]
+            workers.append(worker)
+        return workers
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        if job.get("result"):
+            job["result"] = json.loads(job["result"])
+        return job
@@ -0,0 +1,430 @@
+"""
+Servidor local de modelo: un proceso es dueño de una única instancia de Gemma
+y atiende por HTTP a todos los workers, sesiones y lotes de la máquina.
+
+Las peticiones que llegan a la vez con los mismos parámetros de generación se
+agrupan en un mismo `generate` (batching dinámico): el planificador espera
+hasta `max_wait` a que se llene el batch y reparte sus plazas por turnos
+entre clientes, de modo que quien manda muchas peticiones (el map de un libro
+largo) no deja sin turno a los demás. Una petición que llega sola se genera
+con el camino normal del proveedor (con el modelo de borrador si lo hay).
+
+Endpoints (JSON por POST; con "stream": true la respuesta es una línea JSON
+por trozo de texto, y la última trae las métricas):
+    /generate   {"prompt", "params"}                 generación de bajo nivel
+    /summarize  {"text", "max_length", "min_length", "focus_instruction", "language"}
+    /title      {"text"}
+    /tags       {"text"}
+    /metadata   {"summaries", "language"}              título y etiquetas en una generación
+    /split      {"text", "chunk_size"}               chunks con el tokenizer del modelo
+    GET /health                                      modelo, cola y clientes
+
+El cliente es `server_provider.ModelServerProvider` (proveedor "server").
+
+Uso:
+    python -m book_summarizer.model_server [--port 8765] [--precision int8] [--max-batch-size 8]
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Generator, List, Optional
+
+from .gemma_prompts import GemmaPromptMixin
+from .providers import DEFAULT_PRECISION, PRECISIONS, SummarizationProvider
+from .telemetry import TelemetryRecorder
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Espera máxima para juntar más peticiones en el batch una vez llega la primera
+DEFAULT_MAX_WAIT_SECONDS = 0.02
+
+# Campos de `telemetry.call_metrics` que viajan al cliente para que él las registre
+CALL_FIELDS = ("prompt_tokens", "generated_tokens", "wall_seconds", "tokenize_seconds", "ttft_seconds",
+               "batch_size", "draft_tokens", "accepted_tokens")
+
+
+class GenerationRequest:
+    """Una generación pendiente; el hilo del modelo deja sus eventos en `events`."""
+
+    def __init__(self, prompt: str, params: Dict, client: str):
+        self.prompt = prompt
+        self.params = params
+        self.client = client
+        # Sólo se agrupan peticiones con parámetros idénticos: `generate` usa una configuración por batch
+        self.batch_key = json.dumps(params, sort_keys=True)
+        self.submitted_at = time.perf_counter()
+        # ("text", trozo) | ("done", métricas) | ("error", mensaje)
+        self.events: "queue.Queue[tuple]" = queue.Queue()
+
+    def stream(self) -> Generator[str, None, None]:
+        """Trozos de texto según se generan; las métricas quedan en `self.metrics`."""
+        while True:
+            kind, value = self.events.get()
+            if kind == "text":
+                yield value
+            elif kind == "done":
+                self.metrics = value
+                return
+            else:
+                raise RuntimeError(value)
+
+    def result(self) -> str:
+        return "".join(self.stream())
+
+
+class BatchScheduler:
+    """
+    Cola por cliente y un único hilo que ejecuta el modelo.
+
+    Cada batch empieza por el siguiente cliente en turno; su petición más
+    antigua fija los parámetros, y las plazas se rellenan por rondas (una
+    petición compatible por cliente y ronda) hasta `max_batch_size`.
+    """
+
+    def __init__(self, provider, max_batch_size: int = 8, max_wait: float = DEFAULT_MAX_WAIT_SECONDS):
+        self.provider = provider
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="model-server-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+
+    def submit(self, prompt: str, params: Dict, client: str = "anonymous") -> GenerationRequest:
+        request = GenerationRequest(prompt, params, client)
+        with self._condition:
+            self._queues.setdefault(client, deque()).append(request)
+            self._condition.notify_all()
+        return request
+
+    def pending(self) -> Dict[str, int]:
+        with self._condition:
+            return {client: len(requests) for client, requests in self._queues.items()}
+
+    def _pending_count(self) -> int:
+        return sum(len(requests) for requests in self._queues.values())
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending_count():
+                    self._condition.wait()
+                if not self._running:
+                    return
+                # Dar tiempo a que lleguen más peticiones antes de cerrar el batch
+                deadline = time.monotonic() + self.max_wait
+                while self._running and self._pending_count() < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._take_batch()
+            self.batches += 1
+            self._run(batch)
+
+    def _take_batch(self) -> List[GenerationRequest]:
+        """Saca de las colas el próximo batch (llamar con el lock tomado)."""
+        clients = [client for client, requests in self._queues.items() if requests]
+        lead = clients[0]
+        key = self._queues[lead][0].batch_key
+        batch: List[GenerationRequest] = []
+        while len(batch) < self.max_batch_size:
+            taken = False
+            for client in clients:
+                requests = self._queues[client]
+                match = next((r for r in requests if r.batch_key == key), None)
+                if match is not None and len(batch) < self.max_batch_size:
+                    requests.remove(match)
+                    batch.append(match)
+                    taken = True
+            if not taken:
+                break
+        # El cliente que abrió este batch pasa al final del turno
+        self._queues.move_to_end(lead)
+        for client in [client for client, requests in self._queues.items() if not requests]:
+            del self._queues[client]
+        return batch
+
+    def _run(self, batch: List[GenerationRequest]):
+        try:
+            if len(batch) == 1:
+                self._run_single(batch[0])
+            else:
+                self._run_batch(batch)
+        except Exception as e:
+            for request in batch:
+                request.events.put(("error", f"{type(e).__name__}: {e}"))
+
+    def _run_single(self, request: GenerationRequest):
+        # Camino normal del proveedor: con el modelo de borrador si lo hay
+        recorder = TelemetryRecorder()
+        self.provider.telemetry = recorder
+        try:
+            for part in self.provider._generate_stream(request.prompt, **request.params):
+                request.events.put(("text", part))
+        finally:
+            self.provider.telemetry = None
+        metrics = {field: recorder.calls[-1].get(field) for field in CALL_FIELDS} if recorder.calls else {}
+        # Los tiempos que ve el cliente incluyen la espera en la cola
+        waited = time.perf_counter() - request.submitted_at - (metrics.get("wall_seconds") or 0)
+        for field in ("wall_seconds", "ttft_seconds"):
+            if metrics.get(field) is not None:
+                metrics[field] += waited
+        request.events.put(("done", metrics))
+
+    def _run_batch(self, batch: List[GenerationRequest]):
+        # Sin borrador: la decodificación asistida sólo admite una secuencia
+        import torch
+
+        tokenizer = self.provider.tokenizer
+        started = time.perf_counter()
+        inputs = tokenizer(text=[request.prompt for request in batch], return_tensors="pt", padding=True)
+        inputs = {name: tensor.to(self.provider._model.device) for name, tensor in inputs.items()}
+        tokenized = time.perf_counter()
+        streamer = _BatchStreamer(tokenizer, batch)
+        with torch.no_grad():
+            self.provider._model.generate(**inputs, do_sample=True, pad_token_id=tokenizer.pad_token_id,
+                                          streamer=streamer, **batch[0].params)
+        finished = time.perf_counter()
+        prompt_tokens = inputs["attention_mask"].sum(dim=1).tolist()
+        for i, request in enumerate(batch):
+            request.events.put(("done", {
+                "prompt_tokens": int(prompt_tokens[i]),
+                "generated_tokens": len(streamer.tokens[i]),
+                "wall_seconds": finished - request.submitted_at,
+                "tokenize_seconds": tokenized - started,
+                "ttft_seconds": streamer.first_token_at - request.submitted_at if streamer.first_token_at else None,
+                "batch_size": len(batch),
+            }))
+
+
+class _BatchStreamer:
+    """
+    Streamer de `generate` para un batch: reparte cada paso entre las
+    peticiones y les envía el texto nuevo de su secuencia.
+    """
+
+    def __init__(self, tokenizer, batch: List[GenerationRequest]):
+        self.tokenizer = tokenizer
+        self.batch = batch
+        self.tokens: List[List[int]] = [[] for _ in batch]
+        self.texts = ["" for _ in batch]
+        self.finished = [False for _ in batch]
+        self.first_token_at: Optional[float] = None
+        self._prompt_seen = False
+
+    def put(self, value):
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        for i, token in enumerate(value.reshape(len(self.batch), -1)[:, -1].tolist()):
+            if self.finished[i]:
+                continue
+            # Tras el fin de secuencia generate rellena con pad: la petición ya terminó
+            if token in (self.tokenizer.eos_token_id, self.tokenizer.pad_token_id):
+                self.finished[i] = True
+                continue
+            self.tokens[i].append(token)
+            text = self.tokenizer.decode(self.tokens[i], skip_special_tokens=True)
+            # Un carácter multibyte a medias se emite cuando llegue el resto
+            if text.endswith("\ufffd") or not text.startswith(self.texts[i]):
+                continue
+            if len(text) > len(self.texts[i]):
+                self.batch[i].events.put(("text", text[len(self.texts[i]):]))
+                self.texts[i] = text
+
+    def end(self):
+        pass
+
+
+class _ScheduledPrompts(GemmaPromptMixin, SummarizationProvider):
+    """Las plantillas de Gemma generando a través del planificador (endpoints de alto nivel)."""
+
+    def __init__(self, scheduler: BatchScheduler, client: str):
+        super().__init__("server")
+        self.scheduler = scheduler
+        self.client = client
+        self.telemetry = TelemetryRecorder()
+
+    def _generate(self, prompt: str, **generation_kwargs) -> str:
+        return "".join(self._generate_stream(prompt, **generation_kwargs)).strip()
+
+    def _generate_stream(self, prompt: str, **generation_kwargs) -> Generator[str, None, None]:
+        request = self.scheduler.submit(prompt, generation_kwargs, self.client)
+        yield from request.stream()
+        self.telemetry.calls.append(request.metrics)
+
+    @property
+    def tokenizer(self):
+        return self.scheduler.provider.tokenizer
+
+
+class ModelServer:
+    """Servidor HTTP (un hilo por conexión) delante de un `BatchScheduler`."""
+
+    def __init__(self, provider, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 max_batch_size: int = 8, max_wait: float = DEFAULT_MAX_WAIT_SECONDS):
+        self.provider = provider
+        self.scheduler = BatchScheduler(provider, max_batch_size, max_wait)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.model_server = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Arranca el planificador y el servidor en hilos de fondo."""
+        self.scheduler.start()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="model-server-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.scheduler.start()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.scheduler.stop()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.scheduler.stop()
+
+    def health(self) -> Dict:
+        return {
+            "model": self.provider.model_name,
+            "model_id": self.provider.model_id,
+            "precision": getattr(self.provider, "precision", None),
+            "max_batch_size": self.scheduler.max_batch_size,
+            "batches": self.scheduler.batches,
+            "pending": self.scheduler.pending(),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.0: sin Content-Length en el streaming, la respuesta termina al cerrar la conexión
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def server_state(self) -> ModelServer:
+        return self.server.model_server
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send_json({"error": f"Ruta desconocida: {self.path}"}, 404)
+        self._send_json(self.server_state.health())
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            return self._send_json({"error": "JSON no válido"}, 400)
+        client = body.get("client") or self.client_address[0]
+        scheduler = self.server_state.scheduler
+        try:
+            if self.path == "/generate":
+                request = scheduler.submit(body["prompt"], body.get("params", {}), client)
+                return self._respond(request.stream(), body.get("stream", False), lambda: [request.metrics])
+            if self.path == "/split":
+                chunks = self.server_state.provider._split_text(body["text"], body.get("chunk_size", 1024))
+                return self._send_json({"chunks": chunks})
+            prompts = _ScheduledPrompts(scheduler, client)
+            if self.path == "/summarize":
+                parts = prompts.summarize(body["text"], max_length=body.get("max_length", 500),
+                                          min_length=body.get("min_length", 50),
+                                          focus_instruction=body.get("focus_instruction"),
+                                          language=body.get("language", "es"), stream=True)
+                return self._respond(parts, body.get("stream", False), lambda: prompts.telemetry.calls)
+            if self.path == "/title":
+                return self._send_json({"title": prompts.generate_title(body["text"]), "metrics": prompts.telemetry.calls})
+            if self.path == "/tags":
+                return self._send_json({"tags": prompts.generate_tags(body["text"]), "metrics": prompts.telemetry.calls})
+            if self.path == "/metadata":
+                metadata = prompts.generate_metadata(body["summaries"], body.get("language", "es"))
+                return self._send_json(dict(metadata, metrics=prompts.telemetry.calls))
+        except KeyError as e:
+            return self._send_json({"error": f"Falta el campo {e}"}, 400)
+        except RuntimeError as e:
+            return self._send_json({"error": str(e)}, 500)
+        self._send_json({"error": f"Ruta desconocida: {self.path}"}, 404)
+
+    def _respond(self, parts, stream: bool, metrics):
+        """Responde con el texto entero o, en streaming, una línea JSON por trozo."""
+        if not stream:
+            text = "".join(parts)
+            return self._send_json({"text": text, "metrics": metrics()})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for part in parts:
+                self._write_line({"text": part})
+            self._write_line({"done": True, "metrics": metrics()})
+        except RuntimeError as e:
+            self._write_line({"error": str(e)})
+
+    def _write_line(self, payload: Dict):
+        self.wfile.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", default="croko22/gemma-booksum-lora-v1")
+    parser.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION)
+    parser.add_argument("--draft-model", default=None)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_SECONDS * 1000,
+                        help="Espera máxima para completar un batch")
+    args = parser.parse_args()
+
+    from .gemma_provider import GemmaBookSumProvider
+
+    provider = GemmaBookSumProvider(args.model, precision=args.precision, draft_model=args.draft_model)
+    server = ModelServer(provider, args.host, args.port, args.max_batch_size, args.max_wait_ms / 1000)
+    print(f"Servidor de modelo {provider.model_id} en {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import time
+from threading import Thread
+from typing import Callable, Dict, List, Optional
+
+from .incremental import seconds_per_chunk
+from .providers import DEFAULT_PRECISION, SummarizationProvider, get_provider_class
+from .summarizer import generate_summary_map_reduce
+from .telemetry import TelemetryRecorder, aggregate, stage
+
+# Presupuesto en tokens de cada chunk del método iterativo: mucho mayor para
+# Gemini (~12k) que para Gemma (1k)
+ITERATIVE_CHUNK_TOKENS = {"gemma": 1024, "gemini": 12500, "server": 1024}
+
+# Resúmenes de chunk tras los que se piden título y etiquetas, en paralelo con el
+# resto del documento (más texto no cabe en `providers.METADATA_MAX_CHARS`)
+METADATA_AFTER_CHUNKS = 3
+
+METHOD_ITERATIVE = "Iterativo"
+METHOD_MAP_REDUCE = "Map Reduce"
+
+
+def create_provider(provider_name: str, db_path: str, use_cache: bool = True,
+                    gemini_api_key: Optional[str] = None, precision: Optional[str] = None,
+                    draft_model: Optional[str] = None) -> SummarizationProvider:
+    """
+    Crea un proveedor registrado (ver `providers.PROVIDER_REGISTRY`): Gemma
+    local, Gemma en el servidor de modelo compartido o Gemini con cuota y
+    reintentos. Sólo se importa el módulo del proveedor pedido. `precision`
+    ("fp32", "bf16", "int8") y `draft_model` (modelo de borrador para la
+    decodificación asistida) sólo se aplican a los modelos locales; los del
+    servidor se fijan al arrancarlo.
+    """
+    from .generation_cache import GenerationCache
+
+    kwargs = {"cache": GenerationCache(db_path) if use_cache else None}
+    if provider_name == "gemini":
+        if not gemini_api_key:
+            raise ValueError("Falta la API key de Gemini (GOOGLE_API_KEY)")
+        kwargs["api_key"] = gemini_api_key
+    elif provider_name != "server":
+        if precision:
+            kwargs["precision"] = precision
+        if draft_model:
+            kwargs["draft_model"] = draft_model
+    return get_provider_class(provider_name)(**kwargs)
+
+
+def method_label(method: str, provider: SummarizationProvider) -> str:
+    """
+    Método tal como se guarda en el historial: con la precisión del modelo
+    local si no es la de por defecto ("Iterativo (int8)"), para distinguir y
+    no saltarse resúmenes hechos con otra precisión. En fp32 queda igual que
+    en el historial anterior ("Iterativo").
+    """
+    precision = getattr(provider, "precision", None)
+    return f"{method} ({precision})" if precision and precision != DEFAULT_PRECISION else method
+
+
+def summary_markdown(item: Dict) -> str:
+    """Markdown de un resumen guardado (fila de `SummaryDatabase`)."""
+    lines = [f"# {item.get('title') or 'Resumen de Texto'}", ""]
+    if item.get("source_name"):
+        lines += [f"**Archivo:** {item['source_name']}", ""]
+    lines += [
+        f"**Fecha:** {item['timestamp']}", "",
+        f"**Método:** {item['method']}", "",
+        f"**Palabras:** {item['word_count']}", "",
+    ]
+    if item.get("tags"):
+        lines += [f"**Etiquetas:** {item['tags']}", ""]
+    lines += ["## Resumen", "", item["summary"], ""]
+    return "\n".join(lines)
+
+
+class _MetadataTask:
+    """
+    Título y etiquetas de un documento (`generate_metadata`) en un hilo
+    propio: arranca en cuanto hay `after_chunks` resúmenes de chunk y se
+    solapa con los chunks que faltan.
+    """
+
+    def __init__(self, provider: SummarizationProvider, language: str, after_chunks: int = METADATA_AFTER_CHUNKS):
+        self.provider = provider
+        self.language = language
+        self.after_chunks = after_chunks
+        self.summaries: List[str] = []
+        self._thread: Optional[Thread] = None
+        self._result: Dict = {}
+
+    def add(self, record: Dict):
+        summary = record.get("summary")
+        if summary and summary.strip():
+            self.summaries.append(summary)
+        if self._thread is None and len(self.summaries) >= self.after_chunks:
+            self._start()
+
+    def _start(self):
+        summaries = list(self.summaries)
+
+        def run():
+            try:
+                with stage(self.provider, "metadata", concurrent=True):
+                    self._result = self.provider.generate_metadata(summaries, self.language)
+            except Exception as e:
+                print(f"Error generating title and tags: {e}")
+
+        self._thread = Thread(target=run, name="metadata", daemon=True)
+        self._thread.start()
+
+    def result(self, summary: str) -> Dict:
+        """Espera al título y las etiquetas; con menos chunks que `after_chunks` los pide ahora."""
+        if self._thread is None:
+            if not self.summaries:
+                self.summaries.append(summary)
+            self._start()
+        self._thread.join()
+        return self._result
+
+
+def summarize_document(provider: SummarizationProvider,
+                       text: str,
+                       method: str = METHOD_ITERATIVE,
+                       *,
+                       provider_name: str = "gemma",
+                       focus_instruction: str = None,
+                       language: str = "es",
+                       checkpoint_db=None,
+                       progress_callback: Optional[Callable[[float, str], None]] = None,
+                       text_callback: Optional[Callable[[str], None]] = None,
+                       previous: Optional[Dict] = None) -> Dict:
+    """
+    Resume un documento completo: resumen, título y etiquetas.
+
+    Es el mismo proceso que antes corría dentro del botón de `app.py`; ahora
+    lo ejecutan los workers de la cola de trabajos. El título y las
+    etiquetas salen de una sola generación sobre los primeros resúmenes de
+    chunk, lanzada mientras se resumen los demás. `progress_callback`
+    recibe (fracción 0-1, mensaje) y `text_callback` cada trozo de texto del
+    resumen iterativo a medida que se genera.
+
+    Con `previous`, un resumen anterior del mismo documento (ver
+    `incremental.previous_document`), sólo se generan los chunks editados y
+    los que dependen de ellos; el resto reutiliza su resumen.
+
+    Devuelve un dict con 'summary', 'chunks', 'chunk_count', 'title',
+    'tags', 'reduce_levels', 'processing_time', 'reused_chunks',
+    'time_saved' (segundos estimados que se ahorró al reutilizar chunks),
+    'metrics' (una entrada por llamada al modelo, ver `telemetry`) y
+    'telemetry' (sus totales).
+    """
+    # El proveedor mide sus llamadas mientras dura este documento
+    recorder = TelemetryRecorder()
+    previous_recorder = provider.telemetry
+    provider.telemetry = recorder
+    try:
+        result = _summarize_document(provider, text, method, provider_name, focus_instruction, language,
+                                     checkpoint_db, progress_callback, text_callback, previous)
+    finally:
+        provider.telemetry = previous_recorder
+    # Lo ahorrado es lo que costaron los chunks reutilizados en el resumen anterior; sin
+    # sus métricas, lo que costó cada chunk generado ahora. La fase map resume varios
+    # chunks a la vez: cuenta su duración, no la suma de sus llamadas
+    generated = len(result["chunks"]) - result["reused_chunks"]
+    per_chunk = (previous or {}).get("seconds_per_chunk")
+    if not per_chunk and generated:
+        per_chunk = (result["reduce_levels"][0]["seconds"] / generated if result["reduce_levels"]
+                     else seconds_per_chunk(recorder.calls, generated))
+    result["time_saved"] = result["reused_chunks"] * (per_chunk or 0.0)
+    result["metrics"] = recorder.calls
+    result["telemetry"] = aggregate(recorder.calls)
+    return result
+
+
+def _summarize_document(provider, text, method, provider_name, focus_instruction, language,
+                        checkpoint_db, progress_callback, text_callback, previous) -> Dict:
+    start_time = time.time()
+
+    def report(fraction: float, message: str):
+        if progress_callback:
+            progress_callback(fraction, message)
+
+    chunks: List[Dict] = []
+
+    def chunk_done(record: Dict):
+        chunks.append(record)
+        metadata.add(record)
+
+    level_timings: List[Dict] = []
+    metadata = _MetadataTask(provider, language)
+    chunk_count = 1
+    if method == METHOD_ITERATIVE and hasattr(provider, "summarize_iterative"):
+        chunk_size = ITERATIVE_CHUNK_TOKENS.get(provider_name, ITERATIVE_CHUNK_TOKENS["gemma"])
+
+        def update_progress(current, total):
+            nonlocal chunk_count
+            chunk_count = total
+            report(0.05 + 0.85 * (current - 1) / total, f"Procesando chunk {current}/{total}")
+
+        report(0.05, "Dividiendo el texto en chunks")
+        with stage(provider, "summary"):
+            result = provider.summarize_iterative(
+                text,
+                chunk_size=chunk_size,
+                progress_callback=update_progress,
+                focus_instruction=focus_instruction,
+                language=language,
+                stream=True,
+                checkpoint_db=checkpoint_db,
+                chunk_callback=chunk_done,
+                previous=previous
+            )
+            if isinstance(result, dict):
+                summary = result["summary"]
+                chunks = result.get("chunks", chunks)
+            elif isinstance(result, str):
+                summary = result
+            else:
+                parts = []
+                for part in result:
+                    parts.append(part)
+                    if text_callback:
+                        text_callback(part)
+                summary = "".join(parts)
+    else:
+        report(0.2, "Procesando con método Map-Reduce")
+        summary = generate_summary_map_reduce(provider, text, focus_instruction=focus_instruction,
+                                              language=language, level_timings=level_timings,
+                                              chunk_callback=chunk_done, previous=previous)
+        chunk_count = level_timings[0]["inputs"] if level_timings else 0
+
+    report(0.95, "Generando título y etiquetas")
+    title_and_tags = metadata.result(summary)
+    title = title_and_tags.get("title") or f"Resumen {time.strftime('%H:%M')}"
+    tags = ",".join(title_and_tags.get("tags") or [])
+
+    return {
+        "summary": summary,
+        "chunks": chunks,
+        "chunk_count": chunk_count,
+        "title": title,
+        "tags": tags,
+        "reduce_levels": level_timings,
+        "processing_time": time.time() - start_time,
+        "reused_chunks": sum(1 for chunk in chunks if chunk.get("reused")),
+    }
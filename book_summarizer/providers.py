@@ -1,334 +1,191 @@
+"""
+Interfaz común de los proveedores de resumen y registro de proveedores por nombre.
+
+Cada proveedor vive en su propio módulo y se importa la primera vez que se
+pide (`get_provider_class`), de modo que consultar el historial o usar sólo
+Gemini no carga torch ni transformers.
+"""
 from abc import ABC, abstractmethod
-from typing import Optional, Union, Generator, Dict, Any
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
-from threading import Thread
-from google import genai
+from typing import Any, Dict, Generator, List, Optional
+import hashlib
+import importlib
+import json
 import time
+from .generation_cache import GenerationCache
+from .telemetry import TelemetryRecorder, call_metrics
+
+# Nombre del proveedor -> "módulo:Clase"; los módulos se importan al primer uso
+PROVIDER_REGISTRY: Dict[str, str] = {
+    "gemma": "book_summarizer.gemma_provider:GemmaBookSumProvider",
+    "gemini": "book_summarizer.gemini_provider:AsyncGeminiProvider",
+    # Gemma a través del servidor de modelo compartido (book_summarizer.model_server)
+    "server": "book_summarizer.server_provider:ModelServerProvider",
+}
+
+# Precisión de inferencia de los modelos locales: fp32 (la de siempre), bf16 (la
+# mitad de memoria; rápido sólo en CPUs con instrucciones bf16) o int8
+# (cuantización dinámica de las capas Linear, sólo en CPU). Ver
+# benchmarks/bench_quantization.py
+PRECISIONS = ("fp32", "bf16", "int8")
+DEFAULT_PRECISION = "fp32"
+
+# Caracteres de los resúmenes de chunk de los que salen el título y las etiquetas
+METADATA_MAX_CHARS = 2000
+_TITLE_LABELS = ("título:", "titulo:", "title:")
+_TAGS_LABELS = ("etiquetas:", "tags:")
+
+# Nombres que antes se importaban de este módulo, ahora en los módulos de cada proveedor
+_MOVED = {
+    "GemmaBookSumProvider": "book_summarizer.gemma_provider",
+    "GeminiProvider": "book_summarizer.gemini_provider",
+    "AsyncGeminiProvider": "book_summarizer.gemini_provider",
+}
 
 class SummarizationProvider(ABC):
+    # Los proveedores que resuelven varios textos en una sola llamada al modelo
+    # lo indican aquí para que el map-reduce no los paralelice con hilos.
+    supports_batching = False
+    # Con un TelemetryRecorder asignado, cada llamada al modelo deja sus métricas
+    telemetry: Optional[TelemetryRecorder] = None
     
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, cache: Optional[GenerationCache] = None):
         self.model_name = model_name
+        # Sin caché (cache=None) cada llamada vuelve a muestrear: útil cuando se busca variedad
+        self.cache = cache
 
     @abstractmethod
-    def summarize(self, text: str, max_length: int = 500, min_length: int = 50, language: str = "es", stream: bool = False):
+    def summarize(self, text: str, max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", stream: bool = False):
         pass
 
+    def summarize_batch(self, texts: list[str], max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", batch_size: int = None) -> list[str]:
+        """Resume varios textos y devuelve los resúmenes en el mismo orden."""
+        return [self.summarize(text, max_length=max_length, min_length=min_length, focus_instruction=focus_instruction, language=language) for text in texts]
+
     def generate_title(self, text: str) -> str:
         return " ".join(text.split()[:5]) + "..."
     
     def generate_tags(self, text: str) -> list[str]:
         return []
 
-class GemmaBookSumProvider(SummarizationProvider):
-    _tokenizer = None
-    _model = None
-    
-    def __init__(self, model_name: str = "croko22/gemma-booksum-lora-v1"):
-        super().__init__(model_name)
-        if GemmaBookSumProvider._tokenizer is None:
-            GemmaBookSumProvider._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            GemmaBookSumProvider._model = AutoModelForCausalLM.from_pretrained(
-                self.model_name,
-                device_map="auto" if torch.cuda.is_available() else "cpu",
-                trust_remote_code=True
-            )
-            
-            if not torch.cuda.is_available():
-                GemmaBookSumProvider._model.to("cpu")
-            
-    def summarize(self, text: str, max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", stream: bool = False):
-        base_instruction = "Resume el siguiente texto" if language == "es" else "Summarize the following text"
-            
-        if focus_instruction:
-            connector = "siguiendo esta instrucción:" if language == "es" else "following this instruction:"
-            base_instruction += f" {connector} {focus_instruction}"
-        else:
-            base_instruction += ":"
-            
-        prompt = f"{base_instruction}\n\n{text}\n\nResumen:"
-        
-        inputs = self._tokenizer(text=prompt, return_tensors="pt", padding=True)
-        if torch.cuda.is_available():
-            inputs = {k: v.cuda() for k, v in inputs.items()}
-
-        if stream:
-            return self._stream_generation(inputs, max_length, min_length)
-            
-        with torch.no_grad():
-            outputs = self._model.generate(
-                **inputs,
-                max_new_tokens=max_length,
-                min_new_tokens=min_length,
-                temperature=0.6,
-                do_sample=True,
-            )
-        
-        generated_text = self._tokenizer.batch_decode(outputs, skip_special_tokens=True)[0]
-        return generated_text.replace(prompt, "").strip()
-    
-    def summarize_iterative(self, text: str, chunk_size: int = 4000, max_new_tokens: int = 2048, progress_callback=None, focus_instruction: str = None, language: str = "es", stream: bool = False) -> Union[Dict[str, Any], Generator]:
-        chunks = self._split_text(text, chunk_size)
-        if not chunks: return ""
-        
-        if len(chunks) == 1:
-            result = self.summarize(text, max_length=max_new_tokens, focus_instruction=focus_instruction, stream=stream)
-            return result if stream else result
-        
-        chunk_summaries = []
-        accumulated_summary = ""
-        context_summary = "" # Resumen breve para dar contexto al siguiente chunk
-        
-        # Generator for streaming
-        def stream_generator():
-            nonlocal accumulated_summary, context_summary
-            
-            for i, chunk in enumerate(chunks):
-                if progress_callback: progress_callback(i + 1, len(chunks))
-                
-                # Incremental Append Strategy
-                # Generamos el resumen SÓLO de este chunk, usando el anterior como contexto
-                
-                if i == 0:
-                    prompt = self._get_initial_prompt(chunk, language)
-                else:
-                    prompt = self._get_incremental_prompt(chunk, context_summary, language)
-
-                inputs = self._tokenizer(text=prompt, return_tensors="pt", padding=True)
-                if torch.cuda.is_available():
-                    inputs = {k: v.cuda() for k, v in inputs.items()}
-
-                # Streaming generation for this chunk
-                streamer = TextIteratorStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True)
-                generation_kwargs = dict(
-                    inputs,
-                    streamer=streamer,
-                    max_new_tokens=600, # Summaries per chunk shouldn't be too long
-                    min_new_tokens=100,
-                    temperature=0.4, # Low temp to avoid hallucinations
-                    do_sample=True,
-                    repetition_penalty=1.2
-                )
-                
-                thread = Thread(target=self._model.generate, kwargs=generation_kwargs)
-                thread.start()
-                
-                chunk_text = ""
-                yield f"\n\n#### Parte {i+1}\n\n"
-                
-                for new_text in streamer:
-                    chunk_text += new_text
-                    yield new_text
-                
-                # Limpiar resultado
-                chunk_text = chunk_text.replace(prompt, "").strip()
-                
-                # Actualizar acumulados
-                chunk_summaries.append({
-                    'chunk_number': i + 1,
-                    'text_preview': chunk[:100] + "...",
-                    'summary': chunk_text
-                })
-                accumulated_summary += f"\n\n#### Parte {i+1}\n\n{chunk_text}"
-                # Mantener un contexto breve (últimos 1000 cars) para el siguiente paso
-                context_summary = (context_summary + " " + chunk_text)[-1000:]
-
-        if stream:
-            return stream_generator()
-
-        # Non-streaming execution
-        for val in stream_generator():
-            pass # Consume generator
-            
-        return {
-            "summary": self._format_final_output(accumulated_summary, len(chunks), len(text), language),
-            "chunks": chunk_summaries
-        }
-
-    def _get_initial_prompt(self, chunk: str, language: str) -> str:
-        if language == "es":
-            return f"""Resume el siguiente texto de manera detallada y objetiva.
-ESTILO: Académico, formal, directo.
-PROHIBIDO: Emojis, saludos, "Espero que sirva".
-
-Texto:
-{chunk}
-
-Resumen:"""
-        else:
-            return f"""Summarize the following text in a detailed and objective way.
-STYLE: Academic, formal, direct.
-FORBIDDEN: Emojis, greetings, "Hope this helps".
-
-Text:
-{chunk}
-
-Summary:"""
-
-    def _get_incremental_prompt(self, chunk: str, context: str, language: str) -> str:
-        if language == "es":
-            return f"""Contexto anterior: "{context}..."
-
-Resume la SIGUIENTE parte del texto, continuando la narrativa.
-ESTILO: Académico, formal, directo. Sin repeticiones.
-PROHIBIDO: Emojis, saludos.
-
-Nueva Parte:
-{chunk}
-
-Resumen de la Nueva Parte:"""
-        else:
-            return f"""Previous context: "{context}..."
-
-Summarize the FOLLOWING part of the text, continuing the narrative.
-STYLE: Academic, formal, direct. No repetitions.
-FORBIDDEN: Emojis, greetings.
-
-New Part:
-{chunk}
-
-Summary of New Part:"""
-
-
-    def _stream_generation(self, inputs, max_new_tokens=500, min_new_tokens=50, temperature=0.6):
-        streamer = TextIteratorStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True)
-        generation_kwargs = dict(
-            inputs,
-            streamer=streamer,
-            max_new_tokens=max_new_tokens,
-            min_new_tokens=min_new_tokens,
-            temperature=temperature,
-            do_sample=True,
-            repetition_penalty=1.3
-        )
-        thread = Thread(target=self._model.generate, kwargs=generation_kwargs)
-        thread.start()
-        return streamer
-
-    def _get_style_guidelines(self, language: str) -> str:
-        # Not used directly in the new prompts but kept for reference if needed
-        return ""
-
-    def _format_final_output(self, summary: str, chunks_count: int, length: int, language: str) -> str:
-        header = "📚 Reporte de Resumen" if language == "es" else "📚 Summary Report"
-        info = "Información de Procesamiento" if language == "es" else "Processing Info"
-        return f"""# {header}
-## 📊 {info}
-- Chunks: {chunks_count}
-- Input Length: {length} chars
----
-## 🎯 Resumen Completo
-{summary}"""
-
-    def _split_text(self, text: str, chunk_size: int) -> list[str]:
-        if len(text) <= chunk_size: return [text]
-        chunks = []
-        current_chunk = ""
-        for para in text.split('\n\n'):
-            if len(current_chunk) + len(para) + 2 <= chunk_size:
-                current_chunk += ("\n\n" + para) if current_chunk else para
-            else:
-                if current_chunk: chunks.append(current_chunk)
-                current_chunk = para
-                
-                # Split huge paragraphs
-                if len(para) > chunk_size:
-                    while len(current_chunk) > chunk_size:
-                        chunks.append(current_chunk[:chunk_size])
-                        current_chunk = current_chunk[chunk_size:]
-                        
-        if current_chunk: chunks.append(current_chunk)
-        return chunks
-
-    def generate_title(self, text: str) -> str:
-        prompt = f"Genera un título muy corto (máximo 5 palabras) para:\n\n{text[:1000]}\n\nTítulo:"
-        inputs = self._tokenizer(text=prompt, return_tensors="pt", padding=True)
-        if torch.cuda.is_available(): inputs = {k: v.cuda() for k, v in inputs.items()}
-        
-        with torch.no_grad():
-            outputs = self._model.generate(**inputs, max_new_tokens=20, do_sample=True, temperature=0.7)
-            
-        return self._tokenizer.batch_decode(outputs, skip_special_tokens=True)[0].replace(prompt, "").strip().split('\n')[0].strip('"')
-
-    def generate_tags(self, text: str) -> list[str]:
-        prompt = f"Genera 3-5 etiquetas separadas por comas para:\n\n{text[:2000]}\n\nEtiquetas:"
-        inputs = self._tokenizer(text=prompt, return_tensors="pt", padding=True)
-        if torch.cuda.is_available(): inputs = {k: v.cuda() for k, v in inputs.items()}
-        
-        with torch.no_grad():
-            outputs = self._model.generate(**inputs, max_new_tokens=40, do_sample=True, temperature=0.3)
-            
-        text = self._tokenizer.batch_decode(outputs, skip_special_tokens=True)[0].replace(prompt, "").strip()
-        return [t.strip().strip('.') for t in text.replace('\n', ',').replace('-', '').split(',') if t.strip()][:5]
-
-
-class GeminiProvider(SummarizationProvider):
-    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash-exp"):
-        super().__init__(model_name)
-        self.client = genai.Client(api_key=api_key)
-        
-    def summarize(self, text: str, max_length: int = 2048, min_length: int = 50, focus_instruction: str = None, language: str = "es", stream: bool = False):
-        base = "Resume el siguiente texto" if language == "es" else "Summarize the following text"
-        if focus_instruction:
-            base += f" {'siguiendo' if language == 'es' else 'following'}: {focus_instruction}"
-        
-        prompt = f"{base}:\n\n{text}"
-        
-        if stream:
-            response = self.client.models.generate_content(
-                model=self.model_name, contents=prompt, config={'max_output_tokens': max_length, 'temperature': 0.3}, stream=True
-            )
-            return (chunk.text for chunk in response)
-
-        response = self.client.models.generate_content(
-            model=self.model_name, contents=prompt, config={'max_output_tokens': max_length, 'temperature': 0.3}
-        )
-        return response.text
-        
-    def summarize_iterative(self, text: str, chunk_size: int = 500000, max_new_tokens: int = 2048, progress_callback=None, focus_instruction: str = None, delay: int = 0, language: str = "es", stream: bool = False) -> dict:
-        chunks = self._split_text(text, chunk_size)
-        if not chunks: return ""
-        if len(chunks) == 1:
-            return self.summarize(text, max_length=max_new_tokens, focus_instruction=focus_instruction)
-        
-        chunk_summaries = []
-        accumulated_summary = ""
-        
-        for i, chunk in enumerate(chunks):
-            if delay > 0 and i > 0: time.sleep(delay)
-            if progress_callback: progress_callback(i + 1, len(chunks))
-            
-            prompt = self._build_gemini_prompt(i, chunk, accumulated_summary, focus_instruction, language)
-            
-            response = self.client.models.generate_content(
-                model=self.model_name, contents=prompt, config={'max_output_tokens': max_new_tokens, 'temperature': 0.3}
-            )
-            
-            chunk_summary = response.text
-            chunk_summaries.append({ 'chunk_number': i + 1, 'text_preview': chunk[:200] + "...", 'summary': chunk_summary })
-            accumulated_summary = chunk_summary
-            
-        return {
-            "summary": f"# Resumen Completo\n\n{accumulated_summary}",
-            "chunks": chunk_summaries
-        }
-
-    def _build_gemini_prompt(self, index, chunk, prev_summary, focus, language):
-        focus_text = f" Focus: {focus}" if focus else ""
-        if index == 0:
-            return f"Resume en detalle.{focus_text}\n\nTexto:\n{chunk}"
-        return f"Resumen Actual:\n{prev_summary}\n\nNuevo Texto:\n{chunk}\n\nActualiza el resumen.{focus_text}"
-
-    def generate_title(self, text: str) -> str:
-        prompt = f"Título corto (max 5 palabras):\n\n{text[:2000]}"
-        response = self.client.models.generate_content(model=self.model_name, contents=prompt, config={'max_output_tokens': 20})
-        return response.text.strip().strip('"')
-    
-    def generate_tags(self, text: str) -> list[str]:
-        prompt = f"3-5 etiquetas (csv):\n\n{text[:2000]}"
-        response = self.client.models.generate_content(model=self.model_name, contents=prompt, config={'max_output_tokens': 40, 'temperature': 0.3})
-        return [t.strip().strip('.') for t in response.text.replace('\n', ',').replace('-', '').split(',') if t.strip()][:5]
-    
-    def _split_text(self, text: str, chunk_size: int) -> list[str]:
-        return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
\ No newline at end of file
+    def generate_metadata(self, summaries: List[str], language: str = "es") -> Dict[str, Any]:
+        """
+        Título y etiquetas ({"title", "tags"}) a partir de los resúmenes de
+        chunk ya hechos, no del texto original. Los proveedores con modelo
+        los piden en una sola generación; por defecto son dos llamadas.
+        """
+        text = metadata_source(summaries)
+        return {"title": self.generate_title(text), "tags": self.generate_tags(text)}
+
+    @property
+    def tokenizer(self):
+        """Tokenizer local del modelo, o None si el proveedor no tiene uno."""
+        return None
+
+    @property
+    def model_id(self) -> str:
+        """Modelo y configuración que determinan la salida; identifica las entradas de la caché."""
+        return self.model_name
+
+    def _checkpoint_key(self, text: str, **settings) -> str:
+        """Identifica un resumen iterativo por proveedor, modelo, configuración y documento."""
+        payload = json.dumps([type(self).__name__, self.model_id, settings], sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(payload.encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _record_call(self, **metrics):
+        """Anota una llamada (ver `telemetry.call_metrics`) si el proveedor está midiendo."""
+        if self.telemetry is not None:
+            self.telemetry.record(call_metrics(**metrics))
+
+    def _cache_key(self, prompt: str, params: dict) -> Optional[str]:
+        return GenerationCache.make_key(self.model_id, prompt, params) if self.cache else None
+
+    def _cached_generate(self, prompt: str, params: dict, generate_fn) -> str:
+        """Devuelve la generación cacheada para (modelo, prompt, parámetros) o la calcula."""
+        key = self._cache_key(prompt, params)
+        if key:
+            start = time.perf_counter()
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._record_call(prompt_tokens=None, generated_tokens=None, wall_seconds=time.perf_counter() - start, cached=True)
+                return cached
+        result = generate_fn()
+        if key and result:
+            self.cache.put(key, result, self.model_id)
+        return result
+
+    def _cached_stream(self, prompt: str, params: dict, stream_fn) -> Generator[str, None, None]:
+        """Versión en streaming de `_cached_generate`: un acierto se emite de una vez."""
+        key = self._cache_key(prompt, params)
+        if key:
+            start = time.perf_counter()
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._record_call(prompt_tokens=None, generated_tokens=None, wall_seconds=time.perf_counter() - start, cached=True)
+                yield cached
+                return
+        parts = []
+        for part in stream_fn():
+            parts.append(part)
+            yield part
+        result = "".join(parts)
+        if key and result:
+            self.cache.put(key, result, self.model_id)
+
+
+def metadata_source(summaries: List[str], max_chars: int = METADATA_MAX_CHARS) -> str:
+    """Los primeros resúmenes de chunk, hasta `max_chars` caracteres."""
+    return "\n\n".join(summary.strip() for summary in summaries if summary and summary.strip())[:max_chars]
+
+
+def split_tags(text: str) -> List[str]:
+    """Etiquetas (como mucho 5) de una respuesta separada por comas o líneas."""
+    return [t.strip().strip('.') for t in text.replace('\n', ',').replace('-', '').split(',') if t.strip()][:5]
+
+
+def parse_metadata(text: str) -> Dict[str, Any]:
+    """
+    Título y etiquetas de una respuesta "Título: ...\nEtiquetas: a, b, c".
+    La etiqueta del título es opcional (el prompt puede terminar en
+    "Título:"); sin "Etiquetas:", valen las líneas siguientes al título.
+    """
+    lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+    if not lines:
+        return {"title": "", "tags": []}
+    title, rest = lines[0], lines[1:]
+    # Respuestas en una sola línea: "El título Etiquetas: a, b"
+    lowered = title.lower()
+    for label in _TAGS_LABELS:
+        position = lowered.find(label)
+        if position > 0:
+            title, rest = title[:position], [title[position:]] + rest
+            break
+    if title.lower().startswith(_TITLE_LABELS):
+        title = title.split(":", 1)[1]
+    tags = next((line for line in rest if line.lower().startswith(_TAGS_LABELS)), None)
+    tags = tags.split(":", 1)[1] if tags is not None else "\n".join(rest)
+    return {"title": title.strip().strip('"*').strip(), "tags": split_tags(tags)}
+
+
+def register_provider(name: str, target: str):
+    """Registra (o reemplaza) un proveedor: `target` es "módulo:Clase"."""
+    PROVIDER_REGISTRY[name] = target
+
+
+def provider_names() -> List[str]:
+    return list(PROVIDER_REGISTRY)
+
+
+def get_provider_class(name: str) -> type:
+    """Importa (la primera vez) y devuelve la clase registrada como `name`."""
+    if name not in PROVIDER_REGISTRY:
+        raise ValueError(f"Proveedor desconocido: {name!r} (disponibles: {', '.join(PROVIDER_REGISTRY)})")
+    module_name, class_name = PROVIDER_REGISTRY[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def __getattr__(name: str):
+    if name in _MOVED:
+        return getattr(importlib.import_module(_MOVED[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Códigos HTTP que merecen reintento: cuota agotada y errores transitorios del servidor
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token bucket que se rellena a `rate_per_minute` y admite ráfagas de `capacity`.
+
+    El estado se protege con un lock de hilos, así que un mismo bucket
+    sirve para varios event loops (una sesión de Streamlit por hilo).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute debe ser mayor que 0")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, amount: float) -> float:
+        """Consume `amount` si hay saldo; si no, devuelve cuántos segundos esperar."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    async def acquire(self, amount: float = 1):
+        # Una petición más grande que la capacidad nunca cabría: se limita a la capacidad
+        amount = min(amount, self.capacity)
+        while True:
+            wait = self._take(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Límite combinado de peticiones por minuto y tokens por minuto.
+
+    Los buckets admiten ráfagas de `burst_seconds` segundos de cuota: con la
+    cuota entera de golpe, una fase map de cientos de chunks agotaría el
+    minuto en el primer segundo y el resto serían 429.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, burst_seconds: float = 10.0):
+        self.requests = TokenBucket(requests_per_minute, max(1.0, requests_per_minute * burst_seconds / 60)) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, max(1.0, tokens_per_minute * burst_seconds / 60)) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int = 0):
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens and tokens:
+            await self.tokens.acquire(tokens)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, maximum: float = 60.0) -> float:
+    """Espera exponencial con 'full jitter': uniforme entre 0 y base * 2^intento."""
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+async def retry_async(fn: Callable[[], Awaitable[T]],
+                      status_of: Callable[[BaseException], Optional[int]],
+                      retry_after_of: Callable[[BaseException], Optional[float]] = lambda exc: None,
+                      max_retries: int = 5,
+                      base_delay: float = 1.0,
+                      max_delay: float = 60.0,
+                      on_retry: Callable[[int, BaseException, float], None] = None) -> T:
+    """
+    Ejecuta `fn` reintentando los errores con un código de RETRYABLE_STATUS.
+
+    `status_of` extrae el código HTTP de la excepción (None si no es un error
+    HTTP: entonces se propaga sin reintentar). Si el servidor indica
+    Retry-After, se espera al menos eso.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as exc:
+            if status_of(exc) not in RETRYABLE_STATUS or attempt >= max_retries:
+                raise
+            delay = max(backoff_delay(attempt, base_delay, max_delay), retry_after_of(exc) or 0)
+            if on_retry:
+                on_retry(attempt, exc, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
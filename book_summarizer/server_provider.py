@@ -0,0 +1,111 @@
+"""
+Proveedor "server": Gemma a través del servidor de modelo compartido
+(`python -m book_summarizer.model_server`).
+
+No importa torch ni transformers: las plantillas y el resumen iterativo son
+los de `GemmaPromptMixin` y cada generación es un POST a /generate. Varios
+workers, sesiones de la app o procesos de la CLI usan así un único modelo
+cargado, y el servidor agrupa sus peticiones concurrentes en batches.
+"""
+import http.client
+import json
+import os
+import socket
+from typing import Dict, Generator, Optional
+from urllib.parse import urlsplit
+
+from .gemma_prompts import GemmaPromptMixin
+from .generation_cache import GenerationCache
+from .providers import SummarizationProvider
+
+# Dirección del servidor si no se indica otra
+SERVER_URL_ENV = "BOOK_SUMMARIZER_MODEL_SERVER"
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+
+
+class ModelServerProvider(GemmaPromptMixin, SummarizationProvider):
+    # El servidor hace los batches: el map-reduce le manda las peticiones en paralelo con hilos
+    supports_batching = False
+
+    def __init__(self, url: Optional[str] = None, client_id: Optional[str] = None,
+                 cache: Optional[GenerationCache] = None, timeout: float = 600):
+        """
+        `client_id` identifica a quien pide en el reparto por turnos del
+        servidor; por defecto, máquina y proceso.
+        """
+        self.url = (url or os.environ.get(SERVER_URL_ENV) or DEFAULT_SERVER_URL).rstrip("/")
+        self.client_id = client_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.timeout = timeout
+        info = self._request("GET", "/health")
+        super().__init__(info["model"], cache)
+        self.precision = info.get("precision")
+        self._model_id = info["model_id"]
+
+    @property
+    def model_id(self) -> str:
+        # El del modelo del servidor: comparte entradas de caché con el proveedor "gemma" equivalente
+        return self._model_id
+
+    def _generate(self, prompt: str, **generation_kwargs) -> str:
+        def run():
+            response = self._request("POST", "/generate", self._payload(prompt, generation_kwargs))
+            for metrics in response["metrics"]:
+                self._record_call(**metrics)
+            return response["text"].strip()
+        return self._cached_generate(prompt, generation_kwargs, run)
+
+    def _generate_stream(self, prompt: str, **generation_kwargs) -> Generator[str, None, None]:
+        def run():
+            payload = dict(self._payload(prompt, generation_kwargs), stream=True)
+            for line in self._stream("/generate", payload):
+                if "text" in line:
+                    yield line["text"]
+                else:
+                    for metrics in line["metrics"]:
+                        self._record_call(**metrics)
+        return self._cached_stream(prompt, generation_kwargs, run)
+
+    def _split_text(self, text: str, chunk_size: int) -> list[str]:
+        # Con el tokenizer del servidor: los mismos chunks que el proveedor "gemma"
+        return self._request("POST", "/split", {"text": text, "chunk_size": chunk_size})["chunks"]
+
+    def _payload(self, prompt: str, params: Dict) -> Dict:
+        return {"prompt": prompt, "params": params, "client": self.client_id}
+
+    def _connect(self, method: str, path: str, payload: Optional[Dict] = None) -> http.client.HTTPResponse:
+        parts = urlsplit(self.url)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=self.timeout)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        try:
+            connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            return connection.getresponse()
+        except OSError as e:
+            connection.close()
+            raise ConnectionError(f"No se pudo conectar con el servidor de modelo en {self.url} "
+                                  f"(python -m book_summarizer.model_server): {e}") from e
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        response = self._connect(method, path, payload)
+        try:
+            result = json.loads(response.read())
+        finally:
+            response.close()
+        if response.status != 200:
+            raise RuntimeError(f"Servidor de modelo: {result.get('error', response.status)}")
+        return result
+
+    def _stream(self, path: str, payload: Dict) -> Generator[Dict, None, None]:
+        """Líneas JSON de una respuesta en streaming, hasta la de las métricas."""
+        response = self._connect("POST", path, payload)
+        try:
+            if response.status != 200:
+                raise RuntimeError(f"Servidor de modelo: {json.loads(response.read()).get('error', response.status)}")
+            for raw in response:
+                line = json.loads(raw)
+                if "error" in line:
+                    raise RuntimeError(f"Servidor de modelo: {line['error']}")
+                yield line
+                if line.get("done"):
+                    return
+        finally:
+            response.close()
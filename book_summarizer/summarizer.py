@@ -1,34 +1,208 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from .incremental import Match, align_chunks
 from .providers import SummarizationProvider
+from .telemetry import stage
+from .text_splitter import TokenTextSplitter
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+import time
+
+# Chunks que se resumen a la vez en la fase map cuando el texto llega por partes;
+# limita cuántos fragmentos del libro hay en memoria al mismo tiempo
+MAP_WINDOW = 64
+
+# Reduce jerárquico: como mucho REDUCE_FAN_IN resúmenes parciales por llamada,
+# y prompts de como mucho REDUCE_MAX_TOKENS tokens (dentro del contexto de Gemma)
+REDUCE_FAN_IN = 8
+REDUCE_MAX_TOKENS = 2048
+
+def _iter_chunks(splitter: TokenTextSplitter, long_text: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Admite el texto completo o un iterable de partes (ver `file_processor.iter_text`)."""
+    if isinstance(long_text, str):
+        return iter(splitter.split_text(long_text))
+    return splitter.split_stream(long_text)
+
+def _windows(chunks: Iterator[str], size: int) -> Iterator[List[str]]:
+    while True:
+        window = list(islice(chunks, size))
+        if not window:
+            return
+        yield window
 
 def generate_summary_map_reduce(
     provider: SummarizationProvider,
-    long_text: str,
+    long_text: Union[str, Iterable[str]],
     *,
-    chunk_size: int = 1000,
-
-    chunk_overlap: int = 100,
-    language: str = "es"
+    chunk_size: int = 256,
+    chunk_overlap: int = 25,
+    focus_instruction: str = None,
+    language: str = "es",
+    reduce_fan_in: int = REDUCE_FAN_IN,
+    reduce_max_tokens: int = REDUCE_MAX_TOKENS,
+    max_levels: Optional[int] = None,
+    level_timings: Optional[List[Dict]] = None,
+    chunk_callback: Optional[Callable[[Dict], None]] = None,
+    previous: Optional[Dict] = None
 ) -> str:
     """
     Genera un resumen usando la estrategia Map-Reduce.
     
     Primero resume cada fragmento de forma independiente (map) y luego
-    combina los resúmenes de los fragmentos en un resumen final (reduce).
+    combina los resúmenes por niveles (reduce): agrupa los resúmenes
+    consecutivos en grupos de como mucho `reduce_fan_in` elementos y
+    `reduce_max_tokens` tokens, resume los grupos en paralelo y repite hasta
+    que todo cabe en un único prompt final. Con `max_levels` el último nivel
+    intermedio permitido da paso directamente al resumen final.
+    `chunk_size` y `chunk_overlap` se expresan en tokens.
+
+    Si se pasa una lista en `level_timings`, se le añade un dict por nivel
+    ('level', 'inputs', 'outputs', 'seconds'); el nivel 0 es el map.
+    `chunk_callback` recibe el registro ('chunk_number', 'text_preview',
+    'summary', 'chunk_hash') de cada chunk de la fase map en cuanto termina
+    su ventana, antes del reduce.
+
+    Con `previous` (ver `incremental.previous_document`) y el texto
+    completo, los chunks que no cambiaron reutilizan su resumen map (marcados
+    con 'reused'); los niveles reduce se generan de nuevo.
     """
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = text_splitter.split_text(long_text)
-    if not chunks:
+    text_splitter = TokenTextSplitter(chunk_size, chunk_overlap, tokenizer=provider.tokenizer)
+    settings = dict(chunk_size=chunk_size, chunk_overlap=chunk_overlap, focus_instruction=focus_instruction,
+                    language=language, stage="map")
+
+    def chunk_key(chunk: str) -> str:
+        return provider._checkpoint_key(chunk, **settings)
+
+    if previous and isinstance(long_text, str):
+        aligned, matches = align_chunks(long_text, previous, text_splitter.split_text, chunk_key)
+        chunks, matches = iter(aligned), iter(matches)
+    else:
+        chunks, matches = _iter_chunks(text_splitter, long_text), None
+    chunk_summaries = []
+    total_chunks = 0
+    start = time.perf_counter()
+    with stage(provider, "map"):
+        for window in _windows(chunks, MAP_WINDOW):
+            window_matches: List[Match] = list(islice(matches, len(window))) if matches else [None] * len(window)
+            pending = [chunk for chunk, match in zip(window, window_matches) if match is None]
+            generated = iter(_map_chunks(provider, pending, focus_instruction, language))
+            for chunk, match in zip(window, window_matches):
+                total_chunks += 1
+                summary = match[1]["summary"] if match else next(generated)
+                if not summary:
+                    continue
+                chunk_summaries.append(summary)
+                if chunk_callback:
+                    record = {"chunk_number": total_chunks, "text_preview": chunk[:200] + "...",
+                              "summary": summary, "chunk_hash": chunk_key(chunk)}
+                    if match:
+                        record["reused"] = True
+                    chunk_callback(record)
+    _record_level(level_timings, 0, total_chunks, len(chunk_summaries), start)
+    if not total_chunks:
         return ""
 
+    if total_chunks == 1:
+        return "\n".join(chunk_summaries)
+
+    summaries = chunk_summaries
+    level = 1
+    while True:
+        start = time.perf_counter()
+        groups = _group_summaries(summaries, reduce_fan_in, reduce_max_tokens, text_splitter.count_tokens)
+        if len(groups) <= 1 or (max_levels is not None and level > max_levels):
+            with stage(provider, "reduce final"):
+                final_summary = provider.summarize(
+                    _reduce_prompt(summaries, language, final=True),
+                    max_length=500,
+                    min_length=150,
+                    language=language
+                )
+            _record_level(level_timings, level, len(summaries), 1, start)
+            return final_summary
+
+        with stage(provider, f"reduce {level}"):
+            reduced = _reduce_groups(provider, groups, language)
+        _record_level(level_timings, level, len(summaries), len(reduced), start)
+        if not reduced:
+            return ""
+        summaries = reduced
+        level += 1
+
+def _record_level(level_timings: Optional[List[Dict]], level: int, inputs: int, outputs: int, start: float):
+    if level_timings is not None:
+        level_timings.append({
+            "level": level,
+            "inputs": inputs,
+            "outputs": outputs,
+            "seconds": time.perf_counter() - start,
+        })
+
+def _group_summaries(summaries: List[str], fan_in: int, max_tokens: int, count_tokens: Callable[[str], int]) -> List[List[str]]:
+    """
+    Agrupa resúmenes consecutivos sin pasar de `fan_in` elementos ni de
+    `max_tokens` tokens por grupo.
+
+    Cada grupo lleva al menos dos resúmenes (aunque juntos superen el
+    presupuesto) para que cada nivel reduzca el número de resúmenes.
+    """
+    fan_in = max(2, fan_in)
+    groups = []
+    group, group_tokens = [], 0
+    for summary in summaries:
+        tokens = count_tokens(summary)
+        if len(group) >= 2 and (len(group) >= fan_in or group_tokens + tokens > max_tokens):
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append(summary)
+        group_tokens += tokens
+    if group:
+        if len(group) == 1 and groups:
+            groups[-1].append(group[0])
+        else:
+            groups.append(group)
+    return groups
+
+def _reduce_prompt(summaries: List[str], language: str, final: bool) -> str:
+    combined = "\n".join(summaries)
+    if final:
+        if language == "es":
+            return f"Crea un resumen final coherente a partir de los siguientes resúmenes parciales:\n\n{combined}"
+        return f"Create a coherent final summary from the following partial summaries:\n\n{combined}"
+    if language == "es":
+        return f"Combina los siguientes resúmenes parciales consecutivos en uno solo, conservando los hechos principales y su orden:\n\n{combined}"
+    return f"Combine the following consecutive partial summaries into one, keeping the main events and their order:\n\n{combined}"
+
+def _reduce_groups(provider: SummarizationProvider, groups: List[List[str]], language: str) -> List[str]:
+    """Resume cada grupo de un nivel intermedio (en paralelo) y conserva el orden."""
+    prompts = [_reduce_prompt(group, language, final=False) for group in groups]
+    if provider.supports_batching:
+        results = provider.summarize_batch(prompts, max_length=300, min_length=80, language=language)
+        return [r for r in results if r]
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(provider.summarize, prompt, max_length=300, min_length=80, language=language) for prompt in prompts]
+        results = []
+        for i, future in enumerate(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error reducing group {i}: {e}")
+                results.append("")
+        return [r for r in results if r]
+
+def _map_chunks(provider: SummarizationProvider, chunks: List[str], focus_instruction: str, language: str) -> List[str]:
+    """Resume cada chunk por separado (fase map); los que fallaron quedan como "" en su posición."""
+    if not chunks:
+        return []
+    if provider.supports_batching:
+        # El proveedor decodifica varios chunks en una sola llamada al modelo
+        return provider.summarize_batch(chunks, max_length=150, min_length=30, focus_instruction=focus_instruction, language=language)
+
     # Parallelize map phase
-    chunk_summaries = []
-    # Use max_workers=5 to avoid hitting rate limits too hard with external APIs, 
-    # though valid for local models too if memory permits.
+    # Use max_workers=5 to avoid hitting rate limits too hard with external APIs.
     with ThreadPoolExecutor(max_workers=5) as executor:
         future_to_chunk = {
-            executor.submit(provider.summarize, chunk, max_length=150, min_length=30, language=language): i 
+            executor.submit(provider.summarize, chunk, max_length=150, min_length=30, focus_instruction=focus_instruction, language=language): i 
             for i, chunk in enumerate(chunks)
         }
         
@@ -41,26 +215,14 @@ def generate_summary_map_reduce(
                 print(f"Error processing chunk {index}: {e}")
                 results[index] = "" 
         
-        chunk_summaries = [r for r in results if r]
-    
-    combined_summaries = "\n".join(chunk_summaries)
-    if len(chunks) == 1:
-        return combined_summaries
-
-    final_summary = provider.summarize(
-        f"Crea un resumen final coherente a partir de los siguientes resúmenes parciales:\n\n{combined_summaries}" if language == "es" else f"Create a coherent final summary from the following partial summaries:\n\n{combined_summaries}",
-        max_length=500,
-        min_length=150,
-        language=language
-    )
-    return final_summary
+        return results
 
 def generate_summary_incremental(
     provider: SummarizationProvider,
-    long_text: str,
+    long_text: Union[str, Iterable[str]],
     *,
-    chunk_size: int = 4000,
-    chunk_overlap: int = 200,
+    chunk_size: int = 1024,
+    chunk_overlap: int = 50,
     focus_instruction: str = None,
     language: str = "es"
 ) -> dict:
@@ -69,14 +231,19 @@ def generate_summary_incremental(
     
     Si el provider tiene método iterativo (como GemmaBookSumProvider),
     usa esa implementación. Sino, usa la estrategia Refine tradicional.
+    `chunk_size` y `chunk_overlap` se expresan en tokens.
     Devuelve un diccionario con 'summary' y 'chunks'.
     """
     if hasattr(provider, 'summarize_iterative'):
+        # Los checkpoints de summarize_iterative se identifican por el texto completo
+        if not isinstance(long_text, str):
+            long_text = "".join(long_text)
         return provider.summarize_iterative(long_text, chunk_size, focus_instruction=focus_instruction, language=language)
     
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    chunks = text_splitter.split_text(long_text)
-    if not chunks:
+    text_splitter = TokenTextSplitter(chunk_size, chunk_overlap, tokenizer=provider.tokenizer)
+    chunks = _iter_chunks(text_splitter, long_text)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
         return {"summary": "", "chunks": []}
 
     chunk_summaries = []
@@ -88,16 +255,16 @@ def generate_summary_incremental(
         else:
             base_instruction += f" following this instruction: {focus_instruction}"
     
-    initial_prompt = f'{base_instruction}:\n\n"{chunks[0]}"'
+    initial_prompt = f'{base_instruction}:\n\n"{first_chunk}"'
     running_summary = provider.summarize(initial_prompt, max_length=400, min_length=100, language=language)
     
     chunk_summaries.append({
         'chunk_number': 1,
-        'text_preview': chunks[0][:200] + "..." if len(chunks[0]) > 200 else chunks[0],
+        'text_preview': first_chunk[:200] + "..." if len(first_chunk) > 200 else first_chunk,
         'summary': running_summary
     })
     
-    for i, chunk in enumerate(chunks[1:]):
+    for i, chunk in enumerate(chunks):
         if language == "es":
             refine_prompt = f"""
             Resumen existente:
@@ -0,0 +1,179 @@
+"""
+Métricas de cada llamada al modelo: tokens del prompt y generados, tiempo de
+tokenización, tiempo hasta el primer token (TTFT), tokens/s de decodificación
+y tiempo total.
+
+Un proveedor sólo mide si tiene un `TelemetryRecorder` en su atributo
+`telemetry`; `pipeline.summarize_document` le asigna uno durante cada
+documento y guarda las llamadas con el resumen. Cada llamada queda asociada
+a la etapa en curso ("chunk", "map", "reduce 1", "title"...) y, en el método
+iterativo, al número de chunk. Una etapa que se solapa con otras (título y
+etiquetas mientras siguen los chunks) se marca sólo en su propio hilo con
+`concurrent=True`. Con un modelo de borrador (decodificación
+asistida) se anotan además los tokens propuestos y aceptados.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional
+
+METRIC_FIELDS = ["prompt_tokens", "generated_tokens", "tokenize_seconds", "ttft_seconds",
+                 "decode_tokens_per_second", "wall_seconds", "batch_size", "cached",
+                 "draft_tokens", "accepted_tokens", "acceptance_rate"]
+
+# Etapa propia del hilo o tarea actual: (recorder, etapa, chunk). Las variables de
+# contexto pasan también a las corrutinas lanzadas con `run_coroutine_threadsafe`
+_concurrent_stage: ContextVar[Optional[tuple]] = ContextVar("telemetry_concurrent_stage", default=None)
+
+
+def call_metrics(prompt_tokens: Optional[int],
+                 generated_tokens: Optional[int],
+                 wall_seconds: float,
+                 tokenize_seconds: Optional[float] = None,
+                 ttft_seconds: Optional[float] = None,
+                 batch_size: int = 1,
+                 cached: bool = False,
+                 draft_tokens: Optional[int] = None,
+                 accepted_tokens: Optional[int] = None) -> Dict:
+    """
+    Métricas de una llamada. Los tokens/s de decodificación cuentan los
+    tokens tras el primero entre el TTFT y el final; sin TTFT no se calculan.
+    La tasa de aceptación es la fracción de tokens del borrador que el modelo
+    principal dio por buenos.
+    """
+    decode_tokens_per_second = None
+    if ttft_seconds is not None and generated_tokens and generated_tokens > batch_size:
+        decode_seconds = wall_seconds - ttft_seconds
+        if decode_seconds > 0:
+            decode_tokens_per_second = (generated_tokens - batch_size) / decode_seconds
+    return {
+        "prompt_tokens": prompt_tokens,
+        "generated_tokens": generated_tokens,
+        "tokenize_seconds": tokenize_seconds,
+        "ttft_seconds": ttft_seconds,
+        "decode_tokens_per_second": decode_tokens_per_second,
+        "wall_seconds": wall_seconds,
+        "batch_size": batch_size,
+        "cached": cached,
+        "draft_tokens": draft_tokens,
+        "accepted_tokens": accepted_tokens,
+        "acceptance_rate": accepted_tokens / draft_tokens if draft_tokens else None,
+    }
+
+
+class TelemetryRecorder:
+    """Lista (segura entre hilos) de las llamadas hechas durante un resumen."""
+
+    def __init__(self):
+        self.calls: List[Dict] = []
+        # La etapa es común a todos los hilos: las fases del resumen son secuenciales
+        # y dentro de cada una los hilos del map o el event loop de Gemini la comparten
+        self.current_stage: Optional[str] = None
+        self.current_chunk: Optional[int] = None
+        self._lock = Lock()
+
+    @contextmanager
+    def stage(self, name: str, chunk_number: Optional[int] = None, concurrent: bool = False):
+        if concurrent:
+            token = _concurrent_stage.set((self, name, chunk_number))
+            try:
+                yield
+            finally:
+                _concurrent_stage.reset(token)
+            return
+        previous = self.current_stage, self.current_chunk
+        self.current_stage, self.current_chunk = name, chunk_number
+        try:
+            yield
+        finally:
+            self.current_stage, self.current_chunk = previous
+
+    def record(self, metrics: Dict) -> Dict:
+        override = _concurrent_stage.get()
+        with self._lock:
+            if override is not None and override[0] is self:
+                metrics = dict(metrics, stage=override[1], chunk_number=override[2])
+            else:
+                metrics = dict(metrics, stage=self.current_stage, chunk_number=self.current_chunk)
+            self.calls.append(metrics)
+        return metrics
+
+
+@contextmanager
+def stage(provider, name: str, chunk_number: Optional[int] = None, concurrent: bool = False):
+    """
+    Asocia las llamadas de `provider` a una etapa; no hace nada si no está
+    midiendo. Con `concurrent` la etapa sólo vale para el hilo actual.
+    """
+    recorder = getattr(provider, "telemetry", None)
+    if recorder is None:
+        yield
+        return
+    with recorder.stage(name, chunk_number, concurrent):
+        yield
+
+
+class FirstTokenTimer:
+    """
+    Streamer de `generate` que sólo anota cuándo llega el primer token nuevo,
+    cuántos se generan y en cuántos pasos del modelo (la primera llamada a
+    `put` trae el prompt). En la decodificación asistida cada paso entrega los
+    tokens aceptados del borrador más uno del modelo principal.
+    """
+
+    def __init__(self):
+        self.first_token_at: Optional[float] = None
+        self.tokens = 0
+        self.steps = 0
+        # Tokens propuestos por el modelo de borrador (None sin borrador)
+        self.draft_tokens: Optional[int] = None
+        self._prompt_seen = False
+
+    def put(self, value):
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += value.numel()
+        self.steps += 1
+
+    def end(self):
+        pass
+
+
+def aggregate(calls: List[Dict]) -> Dict:
+    """
+    Totales de un resumen: llamadas, tokens, tiempo de modelo por etapa, TTFT
+    medio, tokens/s de decodificación ponderados por tokens y tasa de
+    aceptación del borrador.
+    """
+    generated = [c for c in calls if not c.get("cached")]
+    ttfts = [c["ttft_seconds"] for c in generated if c.get("ttft_seconds") is not None]
+    decode_tokens = 0
+    decode_seconds = 0.0
+    for call in generated:
+        rate = call.get("decode_tokens_per_second")
+        if rate:
+            tokens = call["generated_tokens"] - call.get("batch_size", 1)
+            decode_tokens += tokens
+            decode_seconds += tokens / rate
+    drafted = [c for c in generated if c.get("draft_tokens")]
+    draft_tokens = sum(c["draft_tokens"] for c in drafted)
+    stages: Dict[str, float] = {}
+    for call in calls:
+        name = call.get("stage") or "other"
+        stages[name] = stages.get(name, 0.0) + call["wall_seconds"]
+    return {
+        "model_calls": len(calls),
+        "cached_calls": len(calls) - len(generated),
+        "prompt_tokens": sum(c.get("prompt_tokens") or 0 for c in calls),
+        "generated_tokens": sum(c.get("generated_tokens") or 0 for c in calls),
+        "tokenize_seconds": sum(c.get("tokenize_seconds") or 0 for c in calls),
+        "generation_seconds": sum(c["wall_seconds"] for c in calls),
+        "ttft_seconds": sum(ttfts) / len(ttfts) if ttfts else None,
+        "decode_tokens_per_second": decode_tokens / decode_seconds if decode_seconds else None,
+        "acceptance_rate": sum(c["accepted_tokens"] for c in drafted) / draft_tokens if draft_tokens else None,
+        "stage_seconds": stages,
+    }
@@ -0,0 +1,4 @@
+"""
+Proveedores falsos y datos sintéticos compartidos por los tests y los
+benchmarks: sin modelo, sin red y deterministas.
+"""
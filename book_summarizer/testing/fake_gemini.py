@@ -0,0 +1,143 @@
+"""
+Servidor HTTP local que imita `models/{modelo}:generateContent` de la API de
+Gemini, con latencia configurable y errores 429/503 inyectados.
+
+Se usa en los tests y benchmarks de `AsyncGeminiProvider` para medir
+throughput y latencias de cola sin red:
+
+    with FakeGeminiServer(latency=0.2, requests_per_minute=120) as server:
+        provider = AsyncGeminiProvider("clave", base_url=server.url)
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PATH_RE = re.compile(r"/models/(?P<model>[^/:]+):generateContent$")
+
+
+class FakeGeminiServer:
+    def __init__(self,
+                 latency: float = 0.05,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 requests_per_minute: int = None,
+                 burst: int = None,
+                 retry_after: float = None,
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Cuota como token bucket: requests_per_minute/60 por segundo, ráfagas de
+        # hasta `burst` peticiones (por defecto, 10 segundos de cuota)
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst or max(1, (requests_per_minute or 60) // 6)
+        self._allowance = float(self.burst)
+        self._last = time.monotonic()
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                match = _PATH_RE.search(self.path.split("?")[0])
+                if not match:
+                    return self._reply(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+                status = fake._admit()
+                if status == 429:
+                    headers = {"Retry-After": str(fake.retry_after)} if fake.retry_after else {}
+                    return self._reply(429, {"error": {"code": 429, "message": "Resource has been exhausted",
+                                                       "status": "RESOURCE_EXHAUSTED"}}, headers)
+                try:
+                    time.sleep(max(0.0, fake.latency + fake._rng.uniform(-fake.jitter, fake.jitter)))
+                    if status == 503:
+                        return self._reply(503, {"error": {"code": 503, "message": "The model is overloaded",
+                                                           "status": "UNAVAILABLE"}})
+                    request = json.loads(body or b"{}")
+                    prompt = "".join(part.get("text", "")
+                                     for content in request.get("contents", [])
+                                     for part in content.get("parts", []))
+                    self._reply(200, {
+                        "candidates": [{
+                            "content": {"role": "model", "parts": [{"text": f"Resumen de {len(prompt)} caracteres."}]},
+                            "finishReason": "STOP",
+                        }],
+                        "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": 5},
+                        "modelVersion": match.group("model"),
+                    })
+                finally:
+                    fake._release()
+
+            def _reply(self, code, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _admit(self) -> int:
+        """Decide si la petición se atiende (200), se limita (429) o falla (503)."""
+        with self._lock:
+            self.requests += 1
+            if self.requests_per_minute:
+                now = time.monotonic()
+                self._allowance = min(self.burst, self._allowance + (now - self._last) * self.requests_per_minute / 60)
+                self._last = now
+                if self._allowance < 1:
+                    self.rate_limited += 1
+                    return 429
+                self._allowance -= 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            if self._rng.random() < self.error_rate:
+                self.server_errors += 1
+                return 503
+            return 200
+
+    def _release(self):
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
@@ -0,0 +1,115 @@
+"""
+Proveedores falsos y deterministas para tests y benchmarks: sin modelo ni red.
+
+`FakeProvider` simula la latencia de un modelo a partir de los tokens del
+prompt (prefill) y de la respuesta (decodificación); con latencias 0 sólo
+queda el coste de la orquestación. `FakeIterativeProvider` reutiliza el
+`summarize_iterative` real de Gemma (`GemmaPromptMixin`) con la misma
+simulación en lugar del modelo.
+
+    provider = FakeProvider(decode_seconds_per_token=0.002)
+    generate_summary_map_reduce(provider, libro)
+"""
+import hashlib
+import time
+from threading import Lock
+from typing import Generator
+
+from book_summarizer.gemma_prompts import GemmaPromptMixin
+from book_summarizer.providers import SummarizationProvider, metadata_source
+from book_summarizer.text_splitter import estimate_tokens
+
+
+class FakeProvider(SummarizationProvider):
+    def __init__(self,
+                 prefill_seconds_per_token: float = 0.0,
+                 decode_seconds_per_token: float = 0.0,
+                 output_tokens: int = 60,
+                 supports_batching: bool = False):
+        super().__init__("fake")
+        self.prefill_seconds_per_token = prefill_seconds_per_token
+        self.decode_seconds_per_token = decode_seconds_per_token
+        self.output_tokens = output_tokens
+        self.supports_batching = supports_batching
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self._lock = Lock()
+
+    def summarize(self, text: str, max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", stream: bool = False):
+        prompt = f"{focus_instruction or ''}\n{text}"
+        if stream:
+            return self._fake_stream(prompt, max_length)
+        return "".join(self._fake_stream(prompt, max_length))
+
+    def summarize_batch(self, texts: list[str], max_length: int = 500, min_length: int = 50, focus_instruction: str = None, language: str = "es", batch_size: int = None) -> list[str]:
+        if not self.supports_batching:
+            return SummarizationProvider.summarize_batch(self, texts, max_length, min_length, focus_instruction, language, batch_size)
+        # Un batch cuesta el prefill de todos los prompts y la decodificación del más largo
+        start = time.perf_counter()
+        outputs = [self._fake_text(f"{focus_instruction or ''}\n{text}", max_length) for text in texts]
+        prompt_tokens = sum(estimate_tokens(text) for text in texts)
+        longest = max((len(words) for words in outputs), default=0)
+        generated_tokens = sum(len(words) for words in outputs)
+        self._account(prompt_tokens, generated_tokens)
+        self._sleep(prompt_tokens * self.prefill_seconds_per_token + self.decode_seconds_per_token)
+        first_token_at = time.perf_counter()
+        self._sleep((longest - 1) * self.decode_seconds_per_token)
+        self._record_call(prompt_tokens=prompt_tokens, generated_tokens=generated_tokens,
+                          wall_seconds=time.perf_counter() - start, tokenize_seconds=0.0,
+                          ttft_seconds=first_token_at - start, batch_size=len(texts))
+        return [" ".join(words) for words in outputs]
+
+    def generate_title(self, text: str) -> str:
+        return "".join(self._fake_stream(text, 5)).capitalize()
+
+    def generate_tags(self, text: str) -> list[str]:
+        return sorted(set("".join(self._fake_stream(text, 8)).split()))[:3]
+
+    def generate_metadata(self, summaries: list[str], language: str = "es") -> dict:
+        # Una sola generación, como los proveedores reales
+        words = "".join(self._fake_stream(metadata_source(summaries), 13)).split()
+        return {"title": " ".join(words[:5]).capitalize(), "tags": sorted(set(words[5:]))[:3]}
+
+    def _fake_text(self, prompt: str, max_tokens: int) -> list:
+        # Palabras del propio prompt elegidas con su hash: misma entrada, misma salida
+        words = prompt.split() or ["vacío"]
+        seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "little")
+        count = min(self.output_tokens, max_tokens)
+        return [words[(seed + i * 7919) % len(words)] for i in range(count)]
+
+    def _fake_stream(self, prompt: str, max_tokens: int) -> Generator[str, None, None]:
+        start = time.perf_counter()
+        words = self._fake_text(prompt, max_tokens)
+        prompt_tokens = estimate_tokens(prompt)
+        self._account(prompt_tokens, len(words))
+        self._sleep(prompt_tokens * self.prefill_seconds_per_token)
+        first_token_at = None
+        for i, word in enumerate(words):
+            self._sleep(self.decode_seconds_per_token)
+            first_token_at = first_token_at or time.perf_counter()
+            yield word if i == 0 else " " + word
+        self._record_call(prompt_tokens=prompt_tokens, generated_tokens=len(words),
+                          wall_seconds=time.perf_counter() - start, tokenize_seconds=0.0,
+                          ttft_seconds=first_token_at - start if first_token_at else None)
+
+    def _account(self, prompt_tokens: int, generated_tokens: int):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.generated_tokens += generated_tokens
+
+    @staticmethod
+    def _sleep(seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FakeIterativeProvider(FakeProvider, GemmaPromptMixin):
+    """El `summarize_iterative` de Gemma con la generación de `FakeProvider`."""
+
+    def _generate(self, prompt: str, **generation_kwargs) -> str:
+        return "".join(self._fake_stream(prompt, generation_kwargs.get("max_new_tokens", 500)))
+
+    def _generate_stream(self, prompt: str, **generation_kwargs) -> Generator[str, None, None]:
+        return self._fake_stream(prompt, generation_kwargs.get("max_new_tokens", 500))
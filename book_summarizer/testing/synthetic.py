@@ -0,0 +1,179 @@
+"""
+Datos sintéticos para tests y benchmarks: libros, documentos (PDF, EPUB,
+DOCX) y checkpoints de Gemma con pesos aleatorios, sin descargar nada.
+"""
+import random
+
+_WORDS = (
+    "el la los las un una de del en con por para que como pero porque cuando "
+    "rey reina guerra paz ciudad campo soldado filósofo carta memoria sombra "
+    "camino verdad razón destino tiempo palabra silencio libro capítulo noche "
+    "caminaba pensaba escribía recordaba miraba decía sabía temía buscaba"
+).split()
+
+
+def synthetic_book(size_bytes: int = 1_000_000, seed: int = 0) -> str:
+    """Genera un texto con párrafos y oraciones de longitud variable."""
+    rng = random.Random(seed)
+    paragraphs = []
+    size = 0
+    while size < size_bytes:
+        sentences = []
+        for _ in range(rng.randint(2, 9)):
+            words = rng.choices(_WORDS, k=rng.randint(6, 30))
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!", ";"]))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph.encode("utf-8")) + 2
+    return "\n\n".join(paragraphs)
+
+
+def synthetic_pdf(path: str, pages: int = 100, chars_per_page: int = 3000, seed: int = 0):
+    """Escribe un PDF mínimo con texto extraíble (una fuente Helvetica, líneas de ~90 caracteres)."""
+    text = synthetic_book(pages * chars_per_page, seed).replace("\n", " ")
+    offsets = []
+    with open(path, "wb") as pdf:
+        def obj(number: int, body: bytes):
+            offsets.append(pdf.tell())
+            pdf.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        pdf.write(b"%PDF-1.4\n")
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(pages))
+        obj(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages))
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        for i in range(pages):
+            page_text = text[i * chars_per_page:(i + 1) * chars_per_page]
+            lines = [page_text[j:j + 90] for j in range(0, len(page_text), 90)]
+            ops = [b"BT /F1 9 Tf 11 TL 40 800 Td"]
+            for line in lines:
+                escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+                ops.append(b"(" + escaped.encode("cp1252", errors="replace") + b") '")
+            ops.append(b"ET")
+            stream = b"\n".join(ops)
+            obj(4 + 2 * i, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                           b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i))
+            obj(5 + 2 * i, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        xref = pdf.tell()
+        pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        for offset in offsets:
+            pdf.write(b"%010d 00000 n \n" % offset)
+        pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(offsets) + 1, xref))
+
+
+def synthetic_epub(path: str, chapters: int = 30, chars_per_chapter: int = 50_000, seed: int = 0):
+    """Escribe un EPUB 3 (con nav y NCX) con zipfile, como lo haría un editor."""
+    import zipfile
+    from xml.sax.saxutils import escape
+
+    names = [f"cap_{i + 1}" for i in range(chapters)]
+    titles = [f"Capítulo {i + 1}" for i in range(chapters)]
+    xhtml = ('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+             '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="es">'
+             '<head><title>{title}</title></head><body>{body}</body></html>')
+    manifest = "".join(f'<item id="{name}" href="text/{name}.xhtml" media-type="application/xhtml+xml"/>'
+                       for name in names)
+    spine = "".join(f'<itemref idref="{name}"/>' for name in names)
+    opf = ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">'
+           '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+           f'<dc:identifier id="id">sintetico-{seed}</dc:identifier><dc:title>Libro sintético</dc:title>'
+           '<dc:language>es</dc:language></metadata>'
+           '<manifest><item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+           f'<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>{manifest}</manifest>'
+           f'<spine toc="ncx"><itemref idref="nav"/>{spine}</spine></package>')
+    nav = xhtml.format(title="Índice", body='<nav epub:type="toc"><ol>' + "".join(
+        f'<li><a href="text/{name}.xhtml">{title}</a></li>' for name, title in zip(names, titles)) + "</ol></nav>")
+    ncx = ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1"><head/>'
+           '<docTitle><text>Libro sintético</text></docTitle><navMap>' + "".join(
+               f'<navPoint id="{name}"><navLabel><text>{title}</text></navLabel><content src="text/{name}.xhtml"/></navPoint>'
+               for name, title in zip(names, titles)) + "</navMap></ncx>")
+    container = ('<?xml version="1.0" encoding="utf-8"?>\n'
+                 '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0"><rootfiles>'
+                 '<rootfile full-path="EPUB/content.opf" media-type="application/oebps-package+xml"/>'
+                 '</rootfiles></container>')
+
+    with zipfile.ZipFile(path, "w") as archive:
+        # El mimetype va primero y sin comprimir
+        archive.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr("META-INF/container.xml", container, compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("EPUB/content.opf", opf, compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("EPUB/nav.xhtml", nav, compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("EPUB/toc.ncx", ncx, compress_type=zipfile.ZIP_DEFLATED)
+        for i, (name, title) in enumerate(zip(names, titles)):
+            paragraphs = synthetic_book(chars_per_chapter, seed * 1000 + i).split("\n\n")
+            body = f"<h1>{title}</h1>" + "".join(f"<p>{escape(p)}</p>" for p in paragraphs)
+            archive.writestr(f"EPUB/text/{name}.xhtml", xhtml.format(title=title, body=body),
+                             compress_type=zipfile.ZIP_DEFLATED)
+
+
+def synthetic_causal_lm(path: str, hidden_size: int = 512, layers: int = 8, vocab_size: int = 8000, seed: int = 0,
+                        tie_word_embeddings: bool = True):
+    """
+    Guarda en `path` un modelo Gemma con pesos aleatorios y un tokenizer BPE
+    entrenado con `synthetic_book`.
+
+    Sirve para medir costes de prefill y decodificación sin descargar el
+    modelo real; el texto que genera no tiene sentido. Con los embeddings
+    atados (por defecto) repite casi siempre el último token; sin atarlos
+    genera tokens variados.
+    """
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import AutoModelForCausalLM, GemmaConfig, PreTrainedTokenizerFast
+
+    special = ["<pad>", "<eos>", "<bos>", "<unk>"]
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=vocab_size, special_tokens=special,
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    tokenizer.train_from_iterator(synthetic_book(500_000, seed).split("\n\n"), trainer)
+    fast = PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token="<pad>", eos_token="<eos>",
+                                   bos_token="<bos>", unk_token="<unk>")
+    fast.save_pretrained(path)
+
+    torch.manual_seed(seed)
+    heads = max(1, hidden_size // 64)
+    config = GemmaConfig(vocab_size=len(fast), hidden_size=hidden_size, intermediate_size=hidden_size * 4,
+                         num_hidden_layers=layers, num_attention_heads=heads, num_key_value_heads=1,
+                         head_dim=hidden_size // heads, pad_token_id=0, eos_token_id=1, bos_token_id=2,
+                         tie_word_embeddings=tie_word_embeddings)
+    AutoModelForCausalLM.from_config(config).save_pretrained(path)
+
+
+def synthetic_draft_lm(target_path: str, path: str, layers: int = 1, independent: bool = False,
+                       hidden_size: int = 256, seed: int = 1):
+    """
+    Guarda en `path` un modelo de borrador para el checkpoint de `target_path`
+    (mismo tokenizer y vocabulario): sus primeras `layers` capas o, con
+    `independent`, un modelo aleatorio propio de `hidden_size` x `layers`.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    AutoTokenizer.from_pretrained(target_path).save_pretrained(path)
+    target = AutoModelForCausalLM.from_pretrained(target_path)
+    if not independent:
+        target.model.layers = target.model.layers[:layers]
+        target.config.num_hidden_layers = layers
+        target.save_pretrained(path)
+        return
+    torch.manual_seed(seed)
+    config = target.config.__class__(**dict(target.config.to_dict(), hidden_size=hidden_size,
+                                            intermediate_size=hidden_size * 4, num_hidden_layers=layers,
+                                            num_attention_heads=max(1, hidden_size // 64),
+                                            head_dim=hidden_size // max(1, hidden_size // 64)))
+    AutoModelForCausalLM.from_config(config).save_pretrained(path)
+
+
+def synthetic_docx(path: str, paragraphs: int = 2000, seed: int = 0):
+    """Escribe un DOCX con `paragraphs` párrafos de `synthetic_book` usando python-docx."""
+    from docx import Document
+
+    document = Document()
+    text = synthetic_book(paragraphs * 600, seed).split("\n\n")
+    for paragraph in text[:paragraphs]:
+        document.add_paragraph(paragraph)
+    document.save(path)
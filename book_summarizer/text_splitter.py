@@ -0,0 +1,179 @@
+import bisect
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Aproximación de tokens cuando no hay tokenizer disponible (p. ej. Gemini):
+# palabras troceadas cada 5 caracteres y cada signo de puntuación por separado.
+_APPROX_TOKEN_RE = re.compile(r"\w{1,5}|[^\w\s]")
+
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…;:])[\"'»”)\]]*\s+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+Span = Tuple[int, int]
+
+# Tamaño del búfer de `split_stream` y margen que se deja sin cortar al final
+# del búfer, donde la tokenización aún puede cambiar con el texto siguiente
+STREAM_BUFFER_CHARS = 1024 * 1024
+_STREAM_MARGIN = 256
+
+
+class TokenTextSplitter:
+    """
+    Divide documentos en fragmentos con un presupuesto máximo de tokens.
+
+    El documento se tokeniza una sola vez conservando los offsets de cada
+    token, y los cortes se hacen preferentemente en límites de párrafo,
+    luego de oración y por último de palabra.
+    """
+
+    def __init__(self, max_tokens: int = 1024, overlap_tokens: int = 0, tokenizer=None):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens debe ser mayor que 0")
+        if overlap_tokens < 0 or overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens debe estar entre 0 y max_tokens - 1")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokenizer = tokenizer
+
+    def token_offsets(self, text: str) -> List[Span]:
+        """Devuelve los offsets (inicio, fin) en caracteres de cada token."""
+        if self._has_offsets():
+            encoding = self.tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                return_attention_mask=False,
+                verbose=False,
+            )
+            return [(start, end) for start, end in encoding["offset_mapping"] if end > start]
+        return [m.span() for m in _APPROX_TOKEN_RE.finditer(text)]
+
+    def count_tokens(self, text: str) -> int:
+        if self._has_offsets():
+            return len(self.token_offsets(text))
+        return sum(1 for _ in _APPROX_TOKEN_RE.finditer(text))
+
+    def split_spans(self, text: str) -> List[Span]:
+        """Calcula los rangos (inicio, fin) de cada fragmento dentro de `text`."""
+        starts = self._token_starts(text)
+        if not starts:
+            return []
+        if len(starts) <= self.max_tokens:
+            span = _strip_span(text, 0, len(text))
+            return [span] if span else []
+        spans, _ = self._consume(text, starts, final=True)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_stream(self, pieces: Iterable[str], buffer_chars: int = STREAM_BUFFER_CHARS) -> Iterator[str]:
+        """
+        Trocea un texto que llega por partes (páginas, bloques de un TXT...).
+
+        Sólo se mantiene en memoria un búfer de unos `buffer_chars`
+        caracteres: cada vez que se llena se emiten los fragmentos cuyo corte
+        ya no depende del texto que falta por llegar, y el resto se conserva.
+        """
+        buffered: List[str] = []
+        size = 0
+        threshold = buffer_chars
+        for piece in pieces:
+            buffered.append(piece)
+            size += len(piece)
+            if size < threshold:
+                continue
+            text = "".join(buffered)
+            spans, pos = self._consume(text, self._token_starts(text), final=False)
+            for start, end in spans:
+                yield text[start:end]
+            rest = text[pos:]
+            buffered, size = [rest], len(rest)
+            # Si no cupo ni un fragmento completo, esperar a tener más texto
+            threshold = size + buffer_chars
+        yield from self.split_text("".join(buffered))
+
+    def _consume(self, text: str, starts: List[int], final: bool) -> Tuple[List[Span], int]:
+        """
+        Corta `text` en fragmentos y devuelve también dónde empieza lo no procesado.
+
+        Con `final=False` (texto incompleto) se detiene antes de cualquier
+        fragmento cuyo corte pueda cambiar con el texto que aún no ha llegado.
+        """
+        spans = []
+        pos = 0
+        while pos < len(text):
+            first = bisect.bisect_left(starts, pos)
+            if first >= len(starts):
+                pos = len(text)
+                break
+            limit_index = first + self.max_tokens
+            if not final and (limit_index + 1 >= len(starts) or starts[limit_index] > len(text) - _STREAM_MARGIN):
+                break
+            if limit_index >= len(starts):
+                end = len(text)
+            else:
+                # Primer token que ya no cabe: el corte debe quedar antes de él
+                end = _best_boundary(text, pos, starts[limit_index])
+
+            span = _strip_span(text, pos, end)
+            if span:
+                spans.append(span)
+            if end >= len(text):
+                pos = len(text)
+                break
+            pos = self._next_start(text, pos, end, starts)
+        return spans, pos
+
+    def _has_offsets(self) -> bool:
+        # Sólo los tokenizers "fast" de Hugging Face devuelven offsets
+        return self.tokenizer is not None and getattr(self.tokenizer, "is_fast", False)
+
+    def _token_starts(self, text: str) -> List[int]:
+        if self._has_offsets():
+            return [start for start, _ in self.token_offsets(text)]
+        return [m.start() for m in _APPROX_TOKEN_RE.finditer(text)]
+
+    def _next_start(self, text: str, pos: int, end: int, starts: List[int]) -> int:
+        if not self.overlap_tokens:
+            return end
+        end_index = bisect.bisect_left(starts, end)
+        back = max(bisect.bisect_right(starts, pos), end_index - self.overlap_tokens)
+        candidate = starts[back] if back < len(starts) else end
+        # Empezar el solapamiento en un inicio de palabra para no partir tokens
+        if candidate > 0 and not text[candidate - 1].isspace():
+            match = _WHITESPACE_RE.search(text, candidate, end)
+            candidate = match.end() if match else end
+        return candidate if pos < candidate < end else end
+
+
+def _best_boundary(text: str, pos: int, limit: int) -> int:
+    """Busca el mejor punto de corte en (pos, limit], priorizando párrafos y oraciones."""
+    # Párrafos y oraciones sólo si el fragmento queda al menos a medio llenar
+    min_fill = pos + (limit - pos) // 2
+    for pattern, lower in ((_PARAGRAPH_RE, min_fill), (_SENTENCE_RE, min_fill), (_WHITESPACE_RE, pos + 1)):
+        boundary = None
+        for match in pattern.finditer(text, lower, limit):
+            boundary = match.end()
+        if boundary is not None:
+            return boundary
+    return limit
+
+
+def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if end > start else None
+
+
+def split_text(text: str, max_tokens: int = 1024, overlap_tokens: int = 0, tokenizer=None) -> List[str]:
+    """Atajo para dividir un texto con un `TokenTextSplitter` temporal."""
+    return TokenTextSplitter(max_tokens, overlap_tokens, tokenizer).split_text(text)
+
+
+def estimate_tokens(text: str, tokenizer=None) -> int:
+    """Cuenta (o estima, sin tokenizer) el número de tokens de un texto."""
+    return TokenTextSplitter(tokenizer=tokenizer).count_tokens(text)
@@ -0,0 +1,228 @@
+"""
+Worker de la cola de trabajos: reclama trabajos de `JobQueue`, los resume con
+su propio proveedor y guarda el resultado en `SummaryDatabase`.
+
+Uso:
+    python -m book_summarizer.worker [--db summary_history.db] [--max-running 1]
+
+Se pueden lanzar varios workers sobre la misma base; entre todos no pasan de
+`--max-running` trabajos a la vez. La API key de Gemini se lee de
+GOOGLE_API_KEY (o GEMINI_API_KEY) y nunca se guarda en la cola. El modelo
+de borrador para la decodificación asistida de Gemma lo fija el servidor con
+BOOK_SUMMARIZER_DRAFT_MODEL; los trabajos no pueden elegirlo.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from .database import SummaryDatabase
+from .job_queue import DEFAULT_MAX_RUNNING, JobCancelled, JobQueue
+from .incremental import find_previous
+from .pipeline import create_provider, method_label, summarize_document
+from .providers import SummarizationProvider
+
+# Cada cuánto se vuelca a la cola el texto generado en streaming
+FLUSH_SECONDS = 0.5
+# Latido del worker (y del trabajo en curso) mientras el modelo está generando
+HEARTBEAT_SECONDS = 10
+
+# (proveedor, use_cache, **opciones del trabajo) -> proveedor
+ProviderFactory = Callable[..., SummarizationProvider]
+# Opciones del payload que configuran el proveedor (ver `pipeline.create_provider`)
+PROVIDER_OPTIONS = ("precision",)
+
+
+def default_providers(gemini_api_key: Optional[str] = None) -> List[str]:
+    """Proveedores que puede atender un worker: Gemini sólo si tiene API key."""
+    return ["gemma", "server", "gemini"] if gemini_api_key else ["gemma", "server"]
+
+
+def default_provider_factory(db_path: str, gemini_api_key: Optional[str] = None,
+                             draft_model: Optional[str] = None) -> ProviderFactory:
+    def create(provider_name: str, use_cache: bool, precision: Optional[str] = None) -> SummarizationProvider:
+        return create_provider(provider_name, db_path, use_cache, gemini_api_key, precision, draft_model)
+    return create
+
+
+class Worker:
+    def __init__(self,
+                 db_path: str = "summary_history.db",
+                 provider_factory: Optional[ProviderFactory] = None,
+                 max_running: int = DEFAULT_MAX_RUNNING,
+                 poll_interval: float = 1.0,
+                 worker_id: Optional[str] = None,
+                 providers: Optional[List[str]] = None):
+        self.queue = JobQueue(db_path, max_running=max_running)
+        self.database = SummaryDatabase(db_path)
+        self.provider_factory = provider_factory or default_provider_factory(db_path)
+        self.poll_interval = poll_interval
+        # Proveedores cuyos trabajos reclama este worker (None = todos)
+        self.providers = providers
+        self.worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # El worker es dueño de sus proveedores: el modelo se carga una vez por proceso
+        # Un proveedor por tipo: provider_name -> (configuración, proveedor)
+        self._providers: Dict[str, tuple] = {}
+        self._current_job: Optional[int] = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self, until_empty: bool = False):
+        """Atiende trabajos hasta `stop()` (o hasta vaciar la cola con `until_empty`)."""
+        self.queue.register_worker(self.worker_id, self.providers)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        try:
+            while not self._stop.is_set():
+                if self.run_once():
+                    continue
+                if until_empty and not self.queue.list_jobs(["queued", "running"], limit=1):
+                    break
+                self._stop.wait(self.poll_interval)
+        finally:
+            self._stop.set()
+            self.queue.unregister_worker(self.worker_id)
+
+    def run_once(self) -> bool:
+        """Procesa el siguiente trabajo disponible; devuelve False si no había ninguno."""
+        job = self.queue.claim(self.worker_id, self.providers)
+        if job is None:
+            return False
+        self._current_job = job["id"]
+        try:
+            self.process(job)
+        except BaseException:
+            # Parado a mitad de un trabajo (Ctrl+C, SIGTERM): otro worker lo retoma desde sus checkpoints
+            self.queue.release(job["id"])
+            raise
+        finally:
+            self._current_job = None
+        return True
+
+    def process(self, job: Dict):
+        job_id = job["id"]
+        payload = job["payload"]
+        pending = []
+        last_flush = time.monotonic()
+        current = 0.0
+
+        def flush(progress: float = None, message: str = None):
+            nonlocal last_flush, current
+            if progress is not None:
+                current = progress
+            text = "".join(pending)
+            pending.clear()
+            last_flush = time.monotonic()
+            self.queue.update_progress(job_id, current, message, append_text=text)
+
+        def on_text(part: str):
+            pending.append(part)
+            if time.monotonic() - last_flush >= FLUSH_SECONDS:
+                flush()
+
+        try:
+            # La app encola el texto ya extraído: aquí no hay extracción que hacer en streaming
+            text = self.queue.get_job_text(job_id)
+            if text is None:
+                raise ValueError("El trabajo no tiene texto")
+            options = {name: payload[name] for name in PROVIDER_OPTIONS if payload.get(name)}
+            provider = self._provider(payload.get("provider", "gemma"), payload.get("use_cache", True), options)
+            method = method_label(payload.get("method", "unknown"), provider)
+            # Si el archivo ya se resumió antes, sólo se regenera lo que cambió
+            previous = find_previous(self.database, payload.get("source_name"), method) if payload.get("use_cache", True) else None
+            result = summarize_document(
+                provider,
+                text,
+                payload.get("method"),
+                provider_name=payload.get("provider", "gemma"),
+                focus_instruction=payload.get("focus_instruction"),
+                language=payload.get("language", "es"),
+                checkpoint_db=self.database,
+                progress_callback=lambda fraction, message: flush(fraction, message),
+                text_callback=on_text,
+                previous=previous,
+            )
+            if provider.cache:
+                # Aciertos y fallos a la base de datos, donde los lee la app
+                provider.cache.flush()
+            flush(0.99, "Guardando")
+            summary_id = self.database.save_summary(
+                original_text=text,
+                summary=result["summary"],
+                word_count=len(text.split()),
+                char_count=len(text),
+                processing_time=result["processing_time"],
+                method=method,
+                chunks_data=json.dumps(result["chunks"]) if result["chunks"] else None,
+                title=result["title"],
+                tags=result["tags"],
+                source_name=payload.get("source_name"),
+                document_hash=payload.get("document_hash"),
+                metrics=result["metrics"]
+            )
+            # Limpiar resúmenes antiguos (mantener últimos 100)
+            self.database.cleanup_old_summaries(keep_last=100)
+            self.queue.complete(job_id, summary_id, {
+                "reduce_levels": result["reduce_levels"],
+                "processing_time": result["processing_time"],
+                "telemetry": result["telemetry"],
+                "reused_chunks": result["reused_chunks"],
+                "time_saved": result["time_saved"],
+            })
+        except JobCancelled:
+            self.queue.mark_cancelled(job_id)
+        except Exception as e:
+            print(f"Error processing job {job_id}: {e}")
+            self.queue.fail(job_id, f"{type(e).__name__}: {e}")
+
+    def _provider(self, provider_name: str, use_cache: bool, options: Optional[Dict] = None) -> SummarizationProvider:
+        options = options or {}
+        key = (use_cache, tuple(sorted(options.items())))
+        if self._providers.get(provider_name, (None,))[0] != key:
+            # Otra configuración (p. ej. otra precisión): el proveedor anterior y su modelo
+            # se sueltan antes de crear el nuevo, para no tener dos copias en memoria
+            self._providers.pop(provider_name, None)
+            # Las opciones sólo se pasan si el trabajo las fija: las fábricas simples reciben dos argumentos
+            self._providers[provider_name] = (key, self.provider_factory(provider_name, use_cache, **options))
+        return self._providers[provider_name][1]
+
+    def _heartbeat_loop(self):
+        # Una generación larga no llama a ningún callback: el latido sale de otro hilo
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            self.queue.register_worker(self.worker_id, self.providers)
+            job_id = self._current_job
+            if job_id is not None:
+                self.queue.heartbeat(job_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="summary_history.db", help="Base de datos de la app (y de la cola)")
+    parser.add_argument("--max-running", type=int, default=DEFAULT_MAX_RUNNING,
+                        help="Trabajos en ejecución a la vez entre todos los workers")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--until-empty", action="store_true", help="Salir cuando no queden trabajos")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
+    draft_model = os.environ.get("BOOK_SUMMARIZER_DRAFT_MODEL") or None
+    worker = Worker(args.db, default_provider_factory(args.db, api_key, draft_model), max_running=args.max_running,
+                    poll_interval=args.poll_interval, providers=default_providers(api_key))
+    # SIGTERM sale como Ctrl+C: el trabajo en curso vuelve a la cola
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Worker {worker.worker_id} atendiendo {args.db}")
+    try:
+        worker.run_forever(until_empty=args.until_empty)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import time
+
+from book_summarizer.gemini_provider import AsyncGeminiProvider
+from book_summarizer.rate_limiting import TokenBucket
+from book_summarizer.testing.fake_gemini import FakeGeminiServer
+
+
+def _provider(server, **kwargs):
+    settings = dict(requests_per_minute=None, tokens_per_minute=None, base_delay=0.01, max_delay=0.05)
+    settings.update(kwargs)
+    return AsyncGeminiProvider("clave", model_name="gemini-test", base_url=server.url, **settings)
+
+
+def test_batch_fans_out_up_to_the_concurrency_limit():
+    with FakeGeminiServer(latency=0.1) as server:
+        provider = _provider(server, max_concurrency=4)
+        start = time.perf_counter()
+        summaries = provider.summarize_batch([f"texto {i}" for i in range(12)])
+        elapsed = time.perf_counter() - start
+
+    assert len(summaries) == 12 and all(s.startswith("Resumen") for s in summaries)
+    assert server.max_in_flight == 4
+    # 12 peticiones de 0.1 s de 4 en 4: ~0.3 s, no 1.2 s
+    assert elapsed < 0.9
+
+
+def test_rate_limits_and_server_errors_are_retried():
+    with FakeGeminiServer(latency=0.01, error_rate=0.3, requests_per_minute=1200, burst=2) as server:
+        provider = _provider(server, max_concurrency=8, max_retries=20)
+        summaries = provider.summarize_batch([f"texto {i}" for i in range(10)])
+
+    assert all(summaries)
+    assert server.rate_limited + server.server_errors > 0
+    assert provider.retries == server.rate_limited + server.server_errors
+
+
+def test_client_errors_are_not_retried():
+    with FakeGeminiServer() as server:
+        provider = _provider(server)
+        provider.model_name = "modelo/invalido"
+        assert provider.summarize_batch(["texto"]) == [""]
+        assert provider.retries == 0
+
+
+def test_token_bucket_spaces_out_requests():
+    import asyncio
+
+    bucket = TokenBucket(600, capacity=1)
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    start = time.perf_counter()
+    asyncio.run(take(4))
+    # 10 por segundo con capacidad 1: la primera es inmediata y las otras tres esperan 0.1 s
+    assert time.perf_counter() - start >= 0.28
+
+
+def test_calls_record_token_usage():
+    from book_summarizer.telemetry import TelemetryRecorder, stage
+
+    with FakeGeminiServer(latency=0.01) as server:
+        provider = _provider(server)
+        provider.telemetry = TelemetryRecorder()
+        with stage(provider, "map"):
+            provider.summarize_batch(["texto uno", "texto dos"])
+        provider.generate_title("texto")
+
+    calls = provider.telemetry.calls
+    assert [c["stage"] for c in calls] == ["map", "map", None]
+    assert all(c["generated_tokens"] == 5 and c["prompt_tokens"] > 0 for c in calls)
+    assert all(c["ttft_seconds"] == c["wall_seconds"] >= 0.01 for c in calls)
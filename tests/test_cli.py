@@ -0,0 +1,72 @@
+import io
+import os
+
+from book_summarizer import cli
+from book_summarizer.database import SummaryDatabase
+from book_summarizer.pipeline import METHOD_MAP_REDUCE
+from book_summarizer.providers import SummarizationProvider
+
+
+class EchoProvider(SummarizationProvider):
+    def __init__(self):
+        super().__init__("echo")
+        self.calls = 0
+
+    def summarize(self, text, max_length=500, min_length=50, focus_instruction=None, language="es", stream=False):
+        self.calls += 1
+        return "Resumen: " + " ".join(text.split()[:5])
+
+
+def _write_books(directory):
+    os.makedirs(os.path.join(directory, "sub"))
+    for i, name in enumerate(["uno.txt", "sub/dos.txt"]):
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(f"Libro {i}. " + "El rey caminaba por la ciudad en silencio. " * 300)
+    with open(os.path.join(directory, "notas.csv"), "w") as f:
+        f.write("no,es,un,libro")
+
+
+def test_collect_files_filters_and_deduplicates(tmp_path):
+    _write_books(str(tmp_path))
+    files = cli.collect_files([str(tmp_path), str(tmp_path / "*.txt")])
+    assert [os.path.relpath(f, tmp_path) for f in files] == ["uno.txt", os.path.join("sub", "dos.txt")]
+
+
+def test_batch_writes_markdown_and_skips_done_files(tmp_path):
+    books = tmp_path / "libros"
+    _write_books(str(books))
+    database = SummaryDatabase(str(tmp_path / "history.db"))
+    output_dir = str(tmp_path / "salida")
+    provider = EchoProvider()
+    paths = cli.collect_files([str(books)])
+
+    stats = cli.run(paths, provider, database, output_dir, METHOD_MAP_REDUCE, out=io.StringIO())
+    assert (stats["done"], stats["skipped"], stats["failed"]) == (2, 0, 0)
+    assert stats["chunks"] >= 2 and stats["tokens"] > 0
+    with open(os.path.join(output_dir, "uno.md"), encoding="utf-8") as f:
+        markdown = f.read()
+    assert "**Archivo:** uno.txt" in markdown and "Resumen:" in markdown
+    with open(paths[0], "rb") as f:
+        key = cli.document_key(f.read(), "txt")
+    assert database.find_by_document_hash(key, METHOD_MAP_REDUCE)["source_name"] == "uno.txt"
+
+    # Segunda pasada: nada que resumir, y el Markdown borrado se vuelve a exportar
+    os.remove(os.path.join(output_dir, "dos.md"))
+    calls = provider.calls
+    stats = cli.run(paths, provider, database, output_dir, METHOD_MAP_REDUCE, out=io.StringIO())
+    assert (stats["done"], stats["skipped"]) == (0, 2)
+    assert provider.calls == calls
+    assert os.path.exists(os.path.join(output_dir, "dos.md"))
+    # Con otro método sí se resume
+    stats = cli.run(paths[:1], provider, database, output_dir, "Iterativo", out=io.StringIO())
+    assert stats["done"] == 1
+
+
+def test_main_prints_the_stored_method(tmp_path, monkeypatch, capsys):
+    books = tmp_path / "libros"
+    _write_books(str(books))
+    monkeypatch.setattr(cli, "create_provider", lambda *args: EchoProvider())
+    cli.main([str(books), "--method", "map-reduce", "--db", str(tmp_path / "history.db"),
+              "--output-dir", str(tmp_path / "salida")])
+    # La consola muestra el método tal como se guarda (y se busca para saltar archivos)
+    assert f"método {METHOD_MAP_REDUCE}\n" in capsys.readouterr().out
@@ -0,0 +1,220 @@
+from book_summarizer.database import SummaryDatabase
+
+
+def test_checkpoint_resumes_from_first_unfinished_chunk(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    db.start_checkpoint("job", total_chunks=4)
+    db.save_checkpoint_chunk("job", 0, "resumen 0", "contexto 0")
+    db.save_checkpoint_chunk("job", 1, "resumen 1", "contexto 1")
+    db.save_checkpoint_chunk("job", 3, "resumen 3", "contexto 3")
+
+    chunks = db.get_checkpoint_chunks("job")
+    assert [c['chunk_index'] for c in chunks] == [0, 1]
+    assert chunks[-1]['context'] == "contexto 1"
+
+
+def test_finished_checkpoint_is_removed(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    db.start_checkpoint("job", total_chunks=2)
+    db.save_checkpoint_chunk("job", 0, "resumen 0", "contexto 0")
+    db.finish_checkpoint("job")
+
+    assert db.get_checkpoint_chunks("job") == []
+
+
+def _save(db, title, summary, tags="", original_text="texto"):
+    return db.save_summary(original_text, summary, 10, 50, 1.0, title=title, tags=tags)
+
+
+def test_search_ranks_title_matches_first(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    _save(db, "Notas varias", "Un ensayo que menciona la guerra una vez.")
+    best = _save(db, "El arte de la guerra", "Estrategia militar de Sun Tzu.")
+
+    results = db.search_summaries("guerra")
+    assert [r['id'] for r in results][0] == best
+    assert "**" in results[0]['snippet']
+
+
+def test_search_matches_prefixes_and_requires_all_terms(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    meditations = _save(db, "Meditaciones", "Marco Aurelio y el estoicismo.")
+    _save(db, "Mil novecientos ochenta y cuatro", "Orwell y la vigilancia.")
+
+    assert [r['id'] for r in db.search_summaries("estoic aurel")] == [meditations]
+    assert db.search_summaries("estoicismo vigilancia") == []
+
+
+def test_index_follows_deletes(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    summary_id = _save(db, "Meditaciones", "Marco Aurelio.")
+    db.delete_summary(summary_id)
+
+    assert db.search_summaries("Aurelio") == []
+
+
+def test_like_fallback_without_fts(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    db.fts_enabled = False
+    summary_id = _save(db, "Meditaciones", "Marco Aurelio.", tags="filosofía")
+
+    assert [r['id'] for r in db.filter_summaries("Aurelio", tags=["filosofía"])] == [summary_id]
+
+
+def test_tag_filter_matches_whole_tags_only(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    art = _save(db, "El arte de la guerra", "Estrategia.", tags="Art, estrategia")
+    _save(db, "Smart", "Negocios.", tags="smartphones, negocios")
+
+    assert [r['id'] for r in db.filter_summaries(tags=["art"])] == [art]
+    assert db.filter_summaries(tags=["art", "negocios"]) == []
+
+
+def test_tag_counts_follow_saves_and_deletes(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    first = _save(db, "Uno", "a", tags="filosofía, ensayo")
+    _save(db, "Dos", "b", tags="Filosofía")
+
+    assert db.get_tag_counts() == {"ensayo": 1, "filosofía": 2}
+    db.delete_summary(first)
+    assert db.get_all_tags() == ["filosofía"]
+
+
+def test_listings_skip_documents_until_opened(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    summary_id = db.save_summary("texto original " * 100, "resumen", 200, 1500, 1.0,
+                                 chunks_data='[{"chunk_number": 1}]', title="Libro")
+
+    listed = db.get_recent_summaries()[0]
+    assert 'original_text' not in listed and 'summary' not in listed
+
+    full = db.get_summary_by_id(summary_id)
+    assert full['original_text'] == "texto original " * 100
+    assert full['chunks_data'] == '[{"chunk_number": 1}]'
+    assert db.search_summaries("original")[0]['id'] == summary_id
+
+
+def test_legacy_rows_are_moved_to_documents(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "history.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL,
+                original_text TEXT NOT NULL, summary TEXT NOT NULL, word_count INTEGER,
+                char_count INTEGER, processing_time REAL, method TEXT DEFAULT 'unknown',
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP, chunks_data TEXT, title TEXT, tags TEXT
+            )
+        """)
+        conn.execute("""
+            INSERT INTO summaries (timestamp, original_text, summary, word_count, char_count, chunks_data, title, tags)
+            VALUES ('2024-01-01', 'Había una vez un dragón', 'Cuento', 5, 23, '[]', 'Dragones', 'fantasía')
+        """)
+
+    db = SummaryDatabase(path)
+    full = db.get_summary_by_id(1)
+    assert full['original_text'] == 'Había una vez un dragón'
+    assert full['chunks_data'] == '[]'
+    assert db.search_summaries("dragon")[0]['id'] == 1
+    assert db.get_tag_counts() == {'fantasía': 1}
+
+    db.delete_summary(1)
+    assert db.search_summaries("dragon") == []
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM summary_documents").fetchone()[0] == 0
+
+
+def test_migrations_are_recorded_once(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "history.db")
+    with sqlite3.connect(path) as conn:
+        # Esquema de las primeras versiones: sin title, tags ni chunks_data
+        conn.execute("""
+            CREATE TABLE summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL,
+                original_text TEXT NOT NULL, summary TEXT NOT NULL, word_count INTEGER,
+                char_count INTEGER, processing_time REAL, method TEXT DEFAULT 'unknown',
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("INSERT INTO summaries (timestamp, original_text, summary) VALUES ('2024-01-01', 'texto', 'resumen')")
+
+    SummaryDatabase(path).close()
+    db = SummaryDatabase(path)
+    with sqlite3.connect(path) as conn:
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations")]
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert versions == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert journal_mode == "wal"
+    assert db.get_summary_by_id(1)['original_text'] == 'texto'
+
+
+def test_concurrent_sessions_save_and_browse(tmp_path):
+    import threading
+
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    errors = []
+
+    def session(n):
+        try:
+            for i in range(20):
+                _save(db, f"Sesión {n} libro {i}", "resumen", tags=f"sesion{n}")
+                db.get_recent_summaries(limit=5)
+                db.filter_summaries(query="libro", limit=20)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert db.get_statistics()['total_summaries'] == 120
+    assert db.get_tag_counts()['sesion3'] == 20
+
+
+def test_connections_of_finished_threads_are_closed(tmp_path):
+    import sqlite3
+    import threading
+
+    import pytest
+
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    opened = []
+
+    def rerun():
+        opened.append(db._connect())
+        db.get_recent_summaries(limit=1)
+
+    # Streamlit ejecuta cada rerun en un hilo nuevo
+    for _ in range(50):
+        thread = threading.Thread(target=rerun)
+        thread.start()
+        thread.join()
+    db.get_recent_summaries(limit=1)
+
+    assert db.connections.open_connections() <= 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+
+
+def test_failed_core_migration_is_not_ignored(tmp_path):
+    import sqlite3
+
+    import pytest
+
+    from book_summarizer.connection import ConnectionManager
+
+    def broken(conn):
+        conn.execute("ALTER TABLE no_existe ADD COLUMN x TEXT")
+
+    manager = ConnectionManager(str(tmp_path / "history.db"))
+    with pytest.raises(sqlite3.OperationalError):
+        manager.migrate([(1, "broken", broken)])
+    # Una migración opcional que falla queda pendiente sin impedir las demás
+    applied = manager.migrate([(1, "broken", broken), (2, "ok", lambda conn: None)], optional=[1])
+    assert applied == [2]
@@ -0,0 +1,41 @@
+from book_summarizer.document_cache import DocumentCache, document_key
+from book_summarizer.text_splitter import TokenTextSplitter
+
+
+def test_extracts_once_per_content():
+    cache = DocumentCache()
+    calls = []
+
+    def extract():
+        calls.append(1)
+        return "uno dos\ntres"
+
+    first = cache.get_or_extract(b"archivo", "txt", extract)
+    second = cache.get_or_extract(b"archivo", "txt", extract)
+    assert len(calls) == 1
+    assert second['text'] == "uno dos\ntres"
+    assert first['stats']['words'] == 3 and first['stats']['lines'] == 2
+
+
+def test_evicted_entries_spill_to_disk(tmp_path):
+    cache = DocumentCache(max_memory_bytes=30_000, spill_dir=str(tmp_path))
+    keys = [document_key(str(i).encode()) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, f"libro {i} " * 1500)
+
+    stats = cache.stats()
+    assert stats['memory_bytes'] <= 30_000
+    assert stats['disk_bytes'] > 0
+    assert cache.get(keys[0])['text'] == "libro 0 " * 1500
+
+
+def test_chunks_are_cached_per_splitter():
+    cache = DocumentCache()
+    key = document_key(b"x")
+    cache.put(key, "palabra " * 2000)
+
+    splitter = TokenTextSplitter(max_tokens=100)
+    chunks = cache.get_chunks(key, splitter)
+    assert len(chunks) > 1
+    assert cache.get_chunks(key, splitter) is chunks
+    assert cache.get_chunks(key, TokenTextSplitter(max_tokens=200)) is not chunks
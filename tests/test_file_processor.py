@@ -0,0 +1,74 @@
+import io
+
+from book_summarizer import file_processor
+
+
+def test_txt_blocks_do_not_split_multibyte_characters():
+    text = "Había una vez un niño en España. " * 50
+    blocks = list(file_processor.iter_text_from_txt(io.BytesIO(text.encode("utf-8")), block_size=7))
+    assert len(blocks) > 1
+    assert "".join(blocks) == text
+
+
+def test_iter_text_dispatches_by_extension():
+    pieces = file_processor.iter_text(io.BytesIO("hola".encode("utf-8")), ".TXT")
+    assert "".join(pieces) == "hola"
+
+
+def test_parallel_pdf_extraction_keeps_page_order(tmp_path, monkeypatch):
+    from book_summarizer.testing.synthetic import synthetic_pdf
+
+    path = tmp_path / "libro.pdf"
+    synthetic_pdf(str(path), pages=6, chars_per_page=300)
+    monkeypatch.setattr(file_processor, "PARALLEL_PDF_MIN_PAGES", 2)
+
+    serial = list(file_processor.iter_text_from_pdf(open(path, "rb"), workers=1))
+    parallel = list(file_processor.iter_text_from_pdf(open(path, "rb"), workers=2))
+    assert len(serial) == 6
+    assert parallel == serial
+
+
+def _epub2(path):
+    import zipfile
+
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("mimetype", "application/epub+zip")
+        archive.writestr("META-INF/container.xml", """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>""")
+        archive.writestr("OEBPS/content.opf", """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <manifest>
+    <item id="a" href="uno.html" media-type="application/xhtml+xml"/>
+    <item id="b" href="dos%20b.html" media-type="application/xhtml+xml"/>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+  </manifest>
+  <spine toc="ncx"><itemref idref="b"/><itemref idref="a"/></spine>
+</package>""")
+        archive.writestr("OEBPS/toc.ncx", """<?xml version="1.0"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1"><navMap>
+  <navPoint id="p1"><navLabel><text>Prólogo</text></navLabel><content src="dos%20b.html#inicio"/></navPoint>
+</navMap></ncx>""")
+        archive.writestr("OEBPS/dos b.html", "<html><head><title>x</title></head><body><p>Primero.</p><p>Después.</p></body></html>")
+        archive.writestr("OEBPS/uno.html", "<html><body><h2>El regreso</h2><p>Final.</p><script>var a;</script></body></html>")
+
+
+def test_epub_chapters_follow_spine_and_toc(tmp_path):
+    path = tmp_path / "libro.epub"
+    _epub2(path)
+
+    chapters = file_processor.get_chapters_from_epub(open(path, "rb"))
+    assert [c['title'] for c in chapters] == ["Prólogo", "El regreso"]
+    assert chapters[0]['text'] == "Primero.\n\nDespués."
+    assert "var a" not in chapters[1]['text']
+    assert file_processor.get_text_from_epub(open(path, "rb")).startswith("Primero.")
+
+
+def test_epub3_titles_come_from_nav(tmp_path):
+    from book_summarizer.testing.synthetic import synthetic_epub
+
+    path = tmp_path / "libro.epub"
+    synthetic_epub(str(path), chapters=3, chars_per_chapter=500)
+    chapters = file_processor.get_chapters_from_epub(open(path, "rb"))
+    assert [c['title'] for c in chapters] == ["Capítulo 1", "Capítulo 2", "Capítulo 3"]
@@ -0,0 +1,117 @@
+import shutil
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+import torch
+
+from book_summarizer.gemma_provider import GemmaBookSumProvider
+from book_summarizer.testing.synthetic import synthetic_book, synthetic_causal_lm
+
+
+@pytest.fixture(scope="module")
+def tiny_checkpoint(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tiny_gemma"))
+    synthetic_causal_lm(path, hidden_size=32, layers=2, vocab_size=300)
+    return path
+
+
+@pytest.fixture
+def provider(tiny_checkpoint, monkeypatch):
+    # El modelo se guarda en la clase: restaurarlo al terminar el test
+    monkeypatch.setattr(GemmaBookSumProvider, "_tokenizer", None)
+    monkeypatch.setattr(GemmaBookSumProvider, "_models", {})
+    return GemmaBookSumProvider(tiny_checkpoint)
+
+
+def test_generation_records_telemetry(provider):
+    from book_summarizer.telemetry import TelemetryRecorder, stage
+
+    provider.telemetry = TelemetryRecorder()
+    prompt = provider._get_initial_prompt(synthetic_book(400), "es")
+    with stage(provider, "chunk", 1):
+        provider._generate(prompt, max_new_tokens=6, min_new_tokens=6)
+    "".join(provider._generate_stream(prompt, max_new_tokens=5, min_new_tokens=5))
+    provider._generate_batch([prompt, prompt[:200]], max_new_tokens=4, min_new_tokens=4)
+
+    single, streamed, batch = provider.telemetry.calls
+    assert (single["stage"], single["chunk_number"]) == ("chunk", 1)
+    assert streamed["stage"] is None
+    prompt_tokens = len(provider.tokenizer(prompt)["input_ids"])
+    assert single["prompt_tokens"] == streamed["prompt_tokens"] == prompt_tokens
+    assert (single["generated_tokens"], streamed["generated_tokens"], batch["generated_tokens"]) == (6, 5, 8)
+    assert batch["batch_size"] == 2 and batch["prompt_tokens"] < 2 * prompt_tokens
+    for call in (single, streamed, batch):
+        assert 0 <= call["tokenize_seconds"] <= call["ttft_seconds"] <= call["wall_seconds"]
+        assert call["decode_tokens_per_second"] > 0
+
+
+def test_precision_modes(provider, tiny_checkpoint):
+    from book_summarizer.pipeline import method_label
+
+    int8 = GemmaBookSumProvider(tiny_checkpoint, precision="int8")
+    # Cada precisión se carga una vez y tiene sus propias entradas de caché
+    assert GemmaBookSumProvider(tiny_checkpoint, precision="int8")._model is int8._model
+    bf16 = GemmaBookSumProvider(tiny_checkpoint, precision="bf16")
+    # Otra precisión sustituye a la anterior: un solo modelo principal cargado por proceso
+    assert [key for key in GemmaBookSumProvider._models if len(key) == 2] == [(tiny_checkpoint, "bf16")]
+    linears = [m for m in provider._model.modules() if isinstance(m, torch.nn.Linear)]
+    assert linears and not any(isinstance(m, torch.nn.Linear) for m in int8._model.modules())
+    assert next(bf16._model.parameters()).dtype == torch.bfloat16
+    assert provider.model_id == tiny_checkpoint and int8.model_id == f"{tiny_checkpoint}@int8"
+    assert method_label("Iterativo", int8) == "Iterativo (int8)"
+    assert method_label("Iterativo", provider) == "Iterativo"
+
+    prompt = provider._get_initial_prompt(synthetic_book(400), "es")
+    for quantized in (int8, bf16):
+        assert isinstance(quantized._generate(prompt, max_new_tokens=4, min_new_tokens=4, top_k=1), str)
+    with pytest.raises(ValueError):
+        GemmaBookSumProvider(tiny_checkpoint, precision="fp8")
+
+
+def test_assisted_decoding_records_acceptance(provider, tiny_checkpoint, tmp_path):
+    from book_summarizer.telemetry import TelemetryRecorder, stage
+
+    # Un borrador idéntico (otra copia del checkpoint) acepta todo y, con top_k=1, genera lo mismo
+    draft_path = str(tmp_path / "draft")
+    shutil.copytree(tiny_checkpoint, draft_path)
+    assisted = GemmaBookSumProvider(tiny_checkpoint, draft_model=draft_path)
+    assert assisted._draft_model is not provider._model
+    assisted.telemetry = TelemetryRecorder()
+    prompt = provider._get_initial_prompt(synthetic_book(400), "es")
+    params = dict(max_new_tokens=10, min_new_tokens=10, top_k=1)
+    expected = provider._generate(prompt, **params)
+    with stage(assisted, "chunk", 1):
+        assert assisted._generate(prompt, **params) == expected
+    with stage(assisted, "chunk", 2):
+        assert "".join(assisted._generate_stream(prompt, **params)) == expected
+
+    for number, call in enumerate(assisted.telemetry.calls, 1):
+        assert call["chunk_number"] == number and call["generated_tokens"] == 10
+        assert call["draft_tokens"] > 0 and call["acceptance_rate"] == 1.0
+    # Sin borrador no hay tasa de aceptación
+    provider.telemetry = TelemetryRecorder()
+    provider._generate(prompt, **params)
+    assert provider.telemetry.calls[0]["acceptance_rate"] is None
+
+
+def test_batch_halves_on_cpu_allocation_failure(provider, monkeypatch):
+    sizes = []
+    generate_batch = provider._generate_batch
+
+    def failing(prompts, max_new_tokens, min_new_tokens):
+        sizes.append(len(prompts))
+        if len(prompts) > 1:
+            raise RuntimeError("[enforce fail at alloc_cpu.cpp:117] DefaultCPUAllocator: can't allocate memory")
+        return generate_batch(prompts, max_new_tokens, min_new_tokens)
+
+    monkeypatch.setattr(provider, "_generate_batch", failing)
+    texts = [synthetic_book(200, seed) for seed in range(2)]
+    assert len(provider.summarize_batch(texts, max_length=3, min_length=3, batch_size=2)) == 2
+    assert sizes == [2, 1, 1]
+
+    monkeypatch.setattr(provider, "_generate_batch", lambda *args: (_ for _ in ()).throw(RuntimeError("otro error")))
+    with pytest.raises(RuntimeError, match="otro error"):
+        provider.summarize_batch(texts, batch_size=2)
@@ -0,0 +1,70 @@
+from book_summarizer.generation_cache import TOUCH_BATCH, GenerationCache
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = GenerationCache(str(tmp_path / "cache.db"))
+    key = GenerationCache.make_key("gemma", "Resume: hola", {"temperature": 0.4})
+
+    assert cache.get(key) is None
+    cache.put(key, "un resumen")
+    assert cache.get(key) == "un resumen"
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_key_depends_on_every_input():
+    base = GenerationCache.make_key("gemma", "prompt", {"temperature": 0.4, "max_new_tokens": 600})
+    assert base == GenerationCache.make_key("gemma", "prompt", {"max_new_tokens": 600, "temperature": 0.4})
+    assert base != GenerationCache.make_key("gemini", "prompt", {"temperature": 0.4, "max_new_tokens": 600})
+    assert base != GenerationCache.make_key("gemma", "prompt!", {"temperature": 0.4, "max_new_tokens": 600})
+    assert base != GenerationCache.make_key("gemma", "prompt", {"temperature": 0.5, "max_new_tokens": 600})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = GenerationCache(str(tmp_path / "cache.db"), max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    cache.get("a")  # "b" pasa a ser la menos usada
+    cache.put("c", "z" * 10)
+
+    assert cache.get("a") == "x" * 10
+    assert cache.get("b") is None
+    assert cache.get("c") == "z" * 10
+
+
+def test_reads_batch_their_last_access_updates(tmp_path):
+    cache = GenerationCache(str(tmp_path / "cache.db"))
+    cache.put("a", "x")
+    conn = cache.connections.connection()
+    written = conn.execute("SELECT last_access FROM generation_cache").fetchone()[0]
+
+    cache.get("a")
+    assert conn.execute("SELECT last_access FROM generation_cache").fetchone()[0] == written
+    for _ in range(TOUCH_BATCH - 1):
+        cache.get("a")
+    assert conn.execute("SELECT last_access FROM generation_cache").fetchone()[0] > written
+
+
+def test_running_total_follows_replacements(tmp_path):
+    cache = GenerationCache(str(tmp_path / "cache.db"), max_bytes=25)
+    for _ in range(5):
+        cache.put("a", "x" * 20)  # reemplazarla no cuenta dos veces su tamaño
+    cache.put("b", "y" * 5)
+    assert cache.get("a") and cache.get("b")
+    cache.put("c", "z")
+    assert cache.get("a") is None and cache.stats()["bytes"] == 6
+
+
+def test_stats_are_shared_between_processes(tmp_path):
+    # El worker genera y la app muestra los contadores: cada uno con su instancia
+    worker = GenerationCache(str(tmp_path / "cache.db"))
+    app = GenerationCache(str(tmp_path / "cache.db"))
+    worker.get("a")
+    worker.put("a", "x")
+    worker.get("a")
+    worker.flush()
+    assert (app.stats()['hits'], app.stats()['misses']) == (1, 1)
+
+    app.clear()
+    assert (worker.stats()['hits'], worker.stats()['misses']) == (0, 0)
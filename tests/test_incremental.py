@@ -0,0 +1,80 @@
+import json
+import re
+
+from book_summarizer.database import SummaryDatabase
+from book_summarizer.incremental import align_chunks, find_previous, reused_prefix, same_context
+from book_summarizer.pipeline import METHOD_ITERATIVE, METHOD_MAP_REDUCE, summarize_document
+from book_summarizer.testing.fake_provider import FakeIterativeProvider, FakeProvider
+from book_summarizer.testing.synthetic import synthetic_book
+
+
+def paragraphs(text):
+    return re.findall(r"[^\n]+\n*", text)
+
+
+def edit_middle(text):
+    parts = text.split("\n\n")
+    parts[len(parts) // 2] = "Un párrafo nuevo sobre el rey. " + parts[len(parts) // 2]
+    return "\n\n".join(parts)
+
+
+def test_align_chunks_resyncs_after_an_edit():
+    old = "uno\n\ndos\n\ntres\n\ncuatro\n\n"
+    previous = {"text": old, "chunks": [{"chunk_number": i + 1, "chunk_hash": chunk, "summary": chunk.strip()}
+                                        for i, chunk in enumerate(paragraphs(old))]}
+
+    chunks, matches = align_chunks("uno\n\ndos\n\nnuevo\n\ntres\n\ncuatro\n\n", previous, paragraphs, lambda c: c)
+    assert chunks == ["uno\n\n", "dos\n\n", "nuevo\n\n", "tres\n\n", "cuatro\n\n"]
+    # Tras el párrafo insertado los chunks antiguos vuelven a coincidir
+    assert [match and match[0] for match in matches] == [0, 1, None, 2, 3]
+    assert reused_prefix(matches) == 2
+
+    # Con otra configuración (otro hash) no se reutiliza nada
+    _, matches = align_chunks(old, previous, paragraphs, lambda c: "otro" + c)
+    assert matches == [None] * 4
+
+
+def test_same_context_requires_identical_summaries():
+    records = [{"summary": summary} for summary in ("a", "b", "c")]
+    matches = [(j, record) for j, record in enumerate(records)]
+    assert same_context(2, matches, ["a", "b"], 1000)
+    # "b" se regeneró con otro resultado: "c" ya no tiene el contexto de entonces
+    assert not same_context(2, matches, ["a", "b2"], 1000)
+    # Fuera de la ventana de contexto un resumen distinto no importa
+    assert same_context(2, matches, ["a2", "b"], 1)
+
+
+def test_iterative_summary_reuses_chunks_before_the_edit(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    text = synthetic_book(60_000)
+    first = summarize_document(FakeIterativeProvider(decode_seconds_per_token=0.0001), text, METHOD_ITERATIVE)
+    db.save_summary(text, first["summary"], 10, len(text), first["processing_time"], method=METHOD_ITERATIVE,
+                    chunks_data=json.dumps(first["chunks"]), source_name="libro.txt", metrics=first["metrics"])
+    previous = find_previous(db, "libro.txt", METHOD_ITERATIVE)
+    assert previous["seconds_per_chunk"] > 0 and find_previous(db, "otro.txt", METHOD_ITERATIVE) is None
+
+    unchanged = summarize_document(FakeIterativeProvider(), text, METHOD_ITERATIVE, previous=previous)
+    assert unchanged["summary"] == first["summary"]
+    assert unchanged["reused_chunks"] == len(first["chunks"])
+
+    edited = summarize_document(FakeIterativeProvider(), edit_middle(text), METHOD_ITERATIVE, previous=previous)
+    reused = [bool(chunk.get("reused")) for chunk in edited["chunks"]]
+    generated = reused.index(False)
+    # Antes de la edición se reutiliza; después, el contexto contiene resúmenes nuevos y se regenera
+    assert 0 < generated < len(reused) and not any(reused[generated:])
+    assert len([m for m in edited["metrics"] if m["stage"] == "chunk"]) == reused.count(False)
+    assert edited["reused_chunks"] == reused.count(True)
+    assert edited["time_saved"] > 0
+
+
+def test_map_reduce_reuses_unchanged_map_summaries():
+    text = synthetic_book(20_000)
+    first = summarize_document(FakeProvider(), text, METHOD_MAP_REDUCE)
+    previous = {"id": 1, "text": text, "chunks": first["chunks"]}
+    assert [chunk["chunk_number"] for chunk in first["chunks"]] == list(range(1, first["chunk_count"] + 1))
+
+    edited = summarize_document(FakeProvider(), edit_middle(text), METHOD_MAP_REDUCE, previous=previous)
+    map_calls = [m for m in edited["metrics"] if m["stage"] == "map"]
+    assert 0 < len(map_calls) <= 2
+    assert edited["reused_chunks"] == edited["chunk_count"] - len(map_calls)
+    assert edited["summary"] != first["summary"]
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from book_summarizer.job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobCancelled, JobQueue
+from book_summarizer.providers import SummarizationProvider
+from book_summarizer.worker import Worker
+
+
+class EchoProvider(SummarizationProvider):
+    def summarize(self, text, max_length=500, min_length=50, focus_instruction=None, language="es", stream=False):
+        return "Resumen: " + " ".join(text.split()[:5])
+
+
+def _payload(method="Map Reduce", provider="gemma"):
+    return {"method": method, "provider": provider, "language": "es", "use_cache": False}
+
+
+def test_claim_follows_priority_and_caps_running_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_running=2)
+    low = queue.submit("uno", _payload(), priority=-10)
+    normal = queue.submit("dos", _payload())
+    high = queue.submit("tres", _payload(), priority=10)
+    assert queue.queue_position(high) == 0
+    assert queue.queue_position(low) == 2
+
+    assert queue.claim("a")["id"] == high
+    assert queue.claim("b")["id"] == normal
+    # Ya hay dos en ejecución
+    assert queue.claim("c") is None
+    queue.complete(high, summary_id=1)
+    assert queue.claim("c")["id"] == low
+    assert queue.get_job(high)["status"] == DONE
+    assert queue.get_job_text(high) is None
+
+
+def test_claim_only_takes_jobs_for_the_worker_providers(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_running=5)
+    gemini = queue.submit("uno", _payload(provider="gemini"), priority=10)
+    gemma = queue.submit("dos", _payload())
+    assert queue.claim("local", ["gemma"])["id"] == gemma
+    assert queue.claim("local", ["gemma"]) is None
+    assert queue.claim("cloud", ["gemma", "gemini"])["id"] == gemini
+
+
+def test_cancel_and_stale_requeue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_running=5)
+    queued = queue.submit("uno", _payload())
+    running = queue.submit("dos", _payload())
+    assert queue.claim("a")["id"] == queued
+    assert queue.claim("a")["id"] == running
+    queue.release(queued)
+    assert queue.cancel(queued)
+    assert queue.get_job(queued)["status"] == CANCELLED
+
+    # Un worker que deja de latir devuelve su trabajo a la cola
+    assert queue.requeue_stale(stale_seconds=-1) == 1
+    job = queue.get_job(running)
+    assert job["status"] == QUEUED and job["attempts"] == 1
+    assert queue.claim("b")["id"] == running
+    assert queue.cancel(running)
+    assert queue.get_job(running)["status"] == RUNNING
+    with pytest.raises(JobCancelled):
+        queue.update_progress(running, 0.5, "Chunk 2/4")
+
+
+def test_worker_processes_jobs_and_saves_summaries(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    worker = Worker(db_path, provider_factory=lambda name, use_cache: EchoProvider("echo"), poll_interval=0.01)
+    text = "\n\n".join(f"Capítulo {i}. " + "El rey caminaba por la ciudad. " * 40 for i in range(20))
+    ok = worker.queue.submit(text, _payload())
+    failing = worker.queue.submit("", {"method": "Map Reduce"})
+    worker.queue.connections.connection().execute("DELETE FROM job_inputs WHERE job_id = ?", (failing,))
+    worker.queue.connections.connection().commit()
+
+    start = time.time()
+    worker.run_forever(until_empty=True)
+    assert time.time() - start < 30
+
+    job = worker.queue.get_job(ok)
+    assert job["status"] == DONE
+    assert job["result"]["reduce_levels"][0]["level"] == 0
+    saved = worker.database.get_summary_by_id(job["summary_id"])
+    assert saved["summary"].startswith("Resumen:")
+    assert saved["original_text"] == text
+    assert saved["method"] == "Map Reduce"
+    assert worker.queue.get_job(failing)["status"] == FAILED
+    assert worker.queue.active_workers() == []
+
+
+def test_jobs_cannot_choose_the_draft_model(tmp_path):
+    created = []
+
+    def factory(name, use_cache, **options):
+        created.append(options)
+        return EchoProvider("echo")
+
+    worker = Worker(str(tmp_path / "jobs.db"), provider_factory=factory, poll_interval=0.01)
+    worker.queue.submit("El rey caminaba por la ciudad. " * 40,
+                        dict(_payload(), precision="int8", draft_model="alguien/codigo-remoto"))
+    worker.run_forever(until_empty=True)
+    # El borrador lo fija el servidor (BOOK_SUMMARIZER_DRAFT_MODEL), no el payload
+    assert created == [{"precision": "int8"}]
+
+
+def test_worker_keeps_one_provider_per_type(tmp_path):
+    worker = Worker(str(tmp_path / "jobs.db"), provider_factory=lambda name, use_cache, **options: EchoProvider(name),
+                    poll_interval=0.01)
+    fp32 = worker._provider("gemma", True)
+    assert worker._provider("gemma", True) is fp32
+    int8 = worker._provider("gemma", True, {"precision": "int8"})
+    worker._provider("gemini", True)
+    # La precisión nueva sustituye a la anterior en lugar de sumar otro modelo
+    assert [provider for _, provider in worker._providers.values()][0] is int8
+    assert len(worker._providers) == 2 and int8 is not fp32
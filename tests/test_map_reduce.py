@@ -0,0 +1,64 @@
+from threading import Lock
+
+from book_summarizer.providers import SummarizationProvider
+from book_summarizer.summarizer import _group_summaries, generate_summary_map_reduce
+
+
+class RecordingProvider(SummarizationProvider):
+    """Devuelve un resumen corto y registra el tamaño de cada prompt."""
+
+    def __init__(self):
+        super().__init__("fake")
+        self.prompts = []
+        self._lock = Lock()
+
+    def summarize(self, text, max_length=500, min_length=50, focus_instruction=None, language="es", stream=False):
+        with self._lock:
+            self.prompts.append(text)
+            return f"resumen {len(self.prompts)} " + "palabra " * 20
+
+
+def _book(paragraphs):
+    return "\n\n".join(f"Párrafo {i}. " + "El rey caminaba por la ciudad en silencio. " * 10 for i in range(paragraphs))
+
+
+def test_group_summaries_respects_fan_in_and_budget():
+    summaries = [f"s{i}" for i in range(20)]
+    groups = _group_summaries(summaries, fan_in=6, max_tokens=10_000, count_tokens=lambda s: 1)
+    assert [len(g) for g in groups] == [6, 6, 6, 2]
+    assert sum(groups, []) == summaries
+
+    groups = _group_summaries(summaries, fan_in=6, max_tokens=3, count_tokens=lambda s: 1)
+    assert all(len(g) <= 3 for g in groups)
+    # Un resumen que no cabe solo en el presupuesto se agrupa igualmente de dos en dos
+    groups = _group_summaries(summaries[:5], fan_in=6, max_tokens=1, count_tokens=lambda s: 5)
+    assert [len(g) for g in groups] == [2, 3]
+
+
+def test_tree_reduce_keeps_prompts_under_budget():
+    provider = RecordingProvider()
+    timings = []
+    summary = generate_summary_map_reduce(provider, _book(120), chunk_size=100, chunk_overlap=0,
+                                          reduce_fan_in=4, reduce_max_tokens=400, level_timings=timings)
+    assert summary.startswith("resumen")
+    chunks = timings[0]["inputs"]
+    assert chunks > 16
+    assert [t["level"] for t in timings] == list(range(len(timings)))
+    assert len(timings) >= 4
+    # Cada nivel intermedio reduce; el último produce un único resumen
+    for previous, current in zip(timings, timings[1:]):
+        assert current["inputs"] == previous["outputs"]
+        assert current["outputs"] < current["inputs"]
+    assert timings[-1]["outputs"] == 1
+    assert timings[-1]["inputs"] <= 4
+    reduce_prompts = provider.prompts[chunks:]
+    assert all(len(p.split()) < 4 * 30 + 30 for p in reduce_prompts)
+
+
+def test_max_levels_limits_depth():
+    provider = RecordingProvider()
+    timings = []
+    generate_summary_map_reduce(provider, _book(120), chunk_size=100, chunk_overlap=0,
+                                reduce_fan_in=4, max_levels=1, level_timings=timings)
+    assert [t["level"] for t in timings] == [0, 1, 2]
+    assert timings[-1]["outputs"] == 1
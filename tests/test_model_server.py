@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from book_summarizer.model_server import BatchScheduler
+from book_summarizer.telemetry import TelemetryRecorder
+from book_summarizer.testing.synthetic import synthetic_book
+
+
+def test_batches_share_slots_round_robin_between_clients():
+    scheduler = BatchScheduler(provider=None, max_batch_size=3)
+    params = {"max_new_tokens": 8}
+    book = [scheduler.submit(f"libro {i}", params, "libro") for i in range(5)]
+    other = scheduler.submit("otro", {"max_new_tokens": 16}, "sesión")
+    note = scheduler.submit("nota", params, "nota")
+
+    # Un cliente con muchas peticiones no llena el batch él solo
+    assert scheduler._take_batch() == [book[0], note, book[1]]
+    # El siguiente batch lo abre otro cliente, con sus propios parámetros
+    assert scheduler._take_batch() == [other]
+    assert scheduler._take_batch() == book[2:]
+    assert scheduler.pending() == {}
+
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from book_summarizer.gemma_provider import GemmaBookSumProvider
+from book_summarizer.model_server import ModelServer
+from book_summarizer.server_provider import ModelServerProvider
+from book_summarizer.testing.synthetic import synthetic_causal_lm
+
+
+@pytest.fixture(scope="module")
+def tiny_checkpoint(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tiny_gemma"))
+    synthetic_causal_lm(path, hidden_size=32, layers=2, vocab_size=300)
+    return path
+
+
+@pytest.fixture
+def server(tiny_checkpoint, monkeypatch):
+    monkeypatch.setattr(GemmaBookSumProvider, "_tokenizer", None)
+    monkeypatch.setattr(GemmaBookSumProvider, "_models", {})
+    server = ModelServer(GemmaBookSumProvider(tiny_checkpoint), port=0, max_batch_size=4, max_wait=0.5).start()
+    yield server
+    server.shutdown()
+
+
+def test_client_generates_through_the_server(server):
+    client = ModelServerProvider(server.url, client_id="test")
+    assert client.model_id == server.provider.model_id
+    assert client.tokenizer is None
+
+    client.telemetry = TelemetryRecorder()
+    text = client._generate("Resume el siguiente texto:\n\nHola", max_new_tokens=6, min_new_tokens=6)
+    streamed = "".join(client._generate_stream("Hola", max_new_tokens=6, min_new_tokens=6))
+    assert text and streamed
+    assert [call["generated_tokens"] for call in client.telemetry.calls] == [6, 6]
+    assert all(call["batch_size"] == 1 for call in client.telemetry.calls)
+
+    book = synthetic_book(3000)
+    assert client._split_text(book, 128) == server.provider._split_text(book, 128)
+    assert client._request("POST", "/title", {"text": "Hola"})["title"]
+    metadata = client._request("POST", "/metadata", {"summaries": ["Un resumen."], "language": "en"})
+    assert metadata.keys() >= {"title", "tags", "metrics"}
+
+
+def test_concurrent_requests_are_batched(server):
+    clients = [ModelServerProvider(server.url, client_id=f"sesión {i}") for i in range(3)]
+    results = [None] * len(clients)
+
+    def run(i):
+        clients[i].telemetry = TelemetryRecorder()
+        results[i] = "".join(clients[i]._generate_stream(f"Texto {i}", max_new_tokens=5, min_new_tokens=5))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(clients))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results)
+    calls = [client.telemetry.calls[0] for client in clients]
+    assert [call["batch_size"] for call in calls] == [3, 3, 3]
+    assert all(call["generated_tokens"] == 5 and call["ttft_seconds"] is not None for call in calls)
+    assert server.scheduler.batches == 1
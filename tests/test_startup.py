@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.bench_startup import MODULES, import_cost
+from book_summarizer import providers
+from book_summarizer.pipeline import create_provider
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_entry_modules_do_not_import_heavy_dependencies(module):
+    assert import_cost(module)["heavy"] == []
+
+
+def test_provider_registry(tmp_path, monkeypatch):
+    monkeypatch.setitem(providers.PROVIDER_REGISTRY, "fake", "book_summarizer.testing.fake_provider:FakeProvider")
+    assert "fake" in providers.provider_names()
+    with pytest.raises(ValueError):
+        providers.get_provider_class("inexistente")
+    with pytest.raises(ValueError):
+        create_provider("gemini", str(tmp_path / "cache.db"))
+
+    from book_summarizer.testing.fake_provider import FakeProvider
+    assert providers.get_provider_class("fake") is FakeProvider
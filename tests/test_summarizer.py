@@ -1,13 +1,63 @@
-from summarizer import generate_summary
+import threading
 
-class DummyPipeline:
-    def __call__(self, text, max_length=None, min_length=None, truncation=True):
-        return [{"summary_text": text[: min(50, len(text))] + "..."}]
+from book_summarizer.pipeline import METADATA_AFTER_CHUNKS, METHOD_ITERATIVE, summarize_document
+from book_summarizer.providers import parse_metadata
+from book_summarizer.summarizer import generate_summary_incremental, generate_summary_map_reduce
+from book_summarizer.testing.fake_provider import FakeIterativeProvider, FakeProvider
+from book_summarizer.testing.synthetic import synthetic_book
 
 
-def test_generate_summary_simple(monkeypatch):
-    monkeypatch.setattr("summarizer._get_pipeline", lambda: DummyPipeline())
-    long_text = "This is a test. " * 200
-    summary = generate_summary(long_text)
-    assert isinstance(summary, str)
-    assert len(summary) > 0
+def test_fake_provider_is_deterministic():
+    text = synthetic_book(20_000)
+    first = generate_summary_map_reduce(FakeProvider(), text)
+    assert first and first == generate_summary_map_reduce(FakeProvider(), text)
+    # El batch simulado devuelve lo mismo que las llamadas una a una
+    assert generate_summary_map_reduce(FakeProvider(supports_batching=True), text) == first
+
+
+def test_generate_summary_incremental_refines_each_chunk():
+    provider = FakeProvider()
+    result = generate_summary_incremental(provider, synthetic_book(30_000), chunk_size=512, chunk_overlap=0)
+    assert isinstance(result["summary"], str) and result["summary"]
+    assert len(result["chunks"]) == provider.calls > 1
+    assert [c["chunk_number"] for c in result["chunks"]] == list(range(1, provider.calls + 1))
+
+
+def test_generate_summary_incremental_uses_summarize_iterative():
+    provider = FakeIterativeProvider()
+    result = generate_summary_incremental(provider, iter([synthetic_book(30_000)]), chunk_size=512)
+    assert len(result["chunks"]) == provider.calls > 1
+    assert "Parte 1" in result["summary"]
+
+
+def test_parse_metadata_accepts_labelled_and_bare_answers():
+    assert parse_metadata(" La guerra y la paz\nEtiquetas: historia, Rusia, guerra.") == \
+        {"title": "La guerra y la paz", "tags": ["historia", "Rusia", "guerra"]}
+    assert parse_metadata('Title: "Dune"\nTags: desert, politics') == {"title": "Dune", "tags": ["desert", "politics"]}
+    assert parse_metadata("El viaje Etiquetas: mar, aventura") == {"title": "El viaje", "tags": ["mar", "aventura"]}
+    assert parse_metadata("") == {"title": "", "tags": []}
+
+
+def test_title_and_tags_start_while_chunks_are_still_summarized():
+    class Provider(FakeIterativeProvider):
+        def generate_metadata(self, summaries, language="es"):
+            received.append(len(summaries))
+            started.set()
+            return super().generate_metadata(summaries, language)
+
+        def _generate_stream(self, prompt, **generation_kwargs):
+            # Los chunks que siguen a los primeros esperan a que el título ya esté en marcha
+            if self.calls >= METADATA_AFTER_CHUNKS:
+                overlapped.append(started.wait(5))
+            return super()._generate_stream(prompt, **generation_kwargs)
+
+    received, overlapped, started = [], [], threading.Event()
+    result = summarize_document(Provider(), synthetic_book(30_000), METHOD_ITERATIVE)
+    assert result["chunk_count"] > METADATA_AFTER_CHUNKS
+    # Se lanzó con los primeros resúmenes, antes de acabar los chunks, y en una sola llamada
+    assert received == [METADATA_AFTER_CHUNKS] and overlapped and all(overlapped)
+    assert len([m for m in result["metrics"] if m["stage"] == "metadata"]) == 1
+    assert result["title"] and result["tags"]
+
+    short = summarize_document(FakeIterativeProvider(), synthetic_book(2_000), METHOD_ITERATIVE)
+    assert short["title"] and len([m for m in short["metrics"] if m["stage"] == "metadata"]) == 1
@@ -0,0 +1,51 @@
+from book_summarizer.database import SummaryDatabase
+from book_summarizer.pipeline import METHOD_ITERATIVE, METHOD_MAP_REDUCE, summarize_document
+from book_summarizer.telemetry import aggregate, call_metrics
+from book_summarizer.testing.fake_provider import FakeIterativeProvider, FakeProvider
+from book_summarizer.testing.synthetic import synthetic_book
+
+
+def test_call_metrics_and_aggregate():
+    first = dict(call_metrics(100, 11, wall_seconds=2.0, tokenize_seconds=0.1, ttft_seconds=1.0), stage="chunk")
+    cached = dict(call_metrics(None, None, wall_seconds=0.01, cached=True), stage="title")
+    assert first["decode_tokens_per_second"] == 10.0
+    assert call_metrics(10, 5, wall_seconds=1.0)["decode_tokens_per_second"] is None
+
+    totals = aggregate([first, cached])
+    assert (totals["model_calls"], totals["cached_calls"]) == (2, 1)
+    assert (totals["prompt_tokens"], totals["generated_tokens"]) == (100, 11)
+    assert totals["ttft_seconds"] == 1.0 and totals["decode_tokens_per_second"] == 10.0
+    assert totals["stage_seconds"] == {"chunk": 2.0, "title": 0.01}
+    assert totals["acceptance_rate"] is None
+
+    drafted = call_metrics(100, 20, wall_seconds=1.0, draft_tokens=16, accepted_tokens=12)
+    assert drafted["acceptance_rate"] == 0.75
+    assert aggregate([first, drafted, dict(drafted, draft_tokens=4, accepted_tokens=4)])["acceptance_rate"] == 0.8
+
+
+def test_metrics_are_stored_per_chunk_and_aggregated(tmp_path):
+    db = SummaryDatabase(str(tmp_path / "history.db"))
+    text = synthetic_book(30_000)
+    result = summarize_document(FakeIterativeProvider(decode_seconds_per_token=0.0001), text, METHOD_ITERATIVE)
+    chunk_calls = [m for m in result["metrics"] if m["stage"] == "chunk"]
+    assert [m["chunk_number"] for m in chunk_calls] == list(range(1, result["chunk_count"] + 1))
+    assert result["telemetry"]["stage_seconds"].keys() >= {"chunk", "metadata"}
+
+    summary_id = db.save_summary(text, result["summary"], 10, len(text), result["processing_time"],
+                                 method=METHOD_ITERATIVE, metrics=result["metrics"])
+    stored = db.get_summary_metrics(summary_id)
+    assert [m["chunk_number"] for m in stored if m["stage"] == "chunk"] == list(range(1, result["chunk_count"] + 1))
+    item = db.get_summary_by_id(summary_id)
+    assert item["model_calls"] == len(stored)
+    assert item["generated_tokens"] == sum(m["generated_tokens"] for m in result["metrics"])
+    assert item["decode_tokens_per_second"] > 0
+
+    mapped = summarize_document(FakeProvider(), text, METHOD_MAP_REDUCE)
+    db.save_summary(text, mapped["summary"], 10, len(text), 1.0, method=METHOD_MAP_REDUCE, metrics=mapped["metrics"])
+    stats = db.get_telemetry_statistics()
+    assert stats["measured_summaries"] == 2
+    assert {row["stage"] for row in stats["stages"]} >= {"chunk", "map", "reduce", "metadata"}
+    assert stats["slowest"][0]["id"] == summary_id
+
+    db.delete_summary(summary_id)
+    assert db.get_summary_metrics(summary_id) == []
@@ -0,0 +1,51 @@
+from book_summarizer.text_splitter import TokenTextSplitter, split_text
+
+
+def _book(paragraphs=40):
+    sentence = "The quick brown fox jumps over the lazy dog near the river bank."
+    return "\n\n".join(" ".join([sentence] * 6) for _ in range(paragraphs))
+
+
+def test_chunks_respect_token_budget():
+    splitter = TokenTextSplitter(max_tokens=200)
+    chunks = splitter.split_text(_book())
+    assert len(chunks) > 1
+    assert all(splitter.count_tokens(chunk) <= 200 for chunk in chunks)
+
+
+def test_chunks_end_on_sentence_boundaries():
+    chunks = split_text(_book(), max_tokens=200)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_short_text_is_a_single_chunk():
+    assert split_text("  Hola mundo.  ", max_tokens=50) == ["Hola mundo."]
+    assert split_text("   ", max_tokens=50) == []
+
+
+def test_spans_cover_text_without_overlap():
+    text = _book()
+    spans = TokenTextSplitter(max_tokens=150).split_spans(text)
+    rebuilt = " ".join(text[start:end] for start, end in spans)
+    assert rebuilt.split() == text.split()
+
+
+def test_overlap_repeats_tail_of_previous_chunk():
+    text = _book()
+    spans = TokenTextSplitter(max_tokens=150, overlap_tokens=20).split_spans(text)
+    for (_, prev_end), (start, _) in zip(spans, spans[1:]):
+        assert start < prev_end
+
+
+def test_unbroken_text_is_cut_at_token_limit():
+    splitter = TokenTextSplitter(max_tokens=10)
+    chunks = splitter.split_text("x" * 200)
+    assert "".join(chunks) == "x" * 200
+    assert all(splitter.count_tokens(chunk) <= 10 for chunk in chunks)
+
+
+def test_stream_matches_whole_text_split():
+    text = _book(200)
+    splitter = TokenTextSplitter(max_tokens=150, overlap_tokens=20)
+    pieces = [text[i:i + 700] for i in range(0, len(text), 700)]
+    assert list(splitter.split_stream(pieces, buffer_chars=5000)) == splitter.split_text(text)